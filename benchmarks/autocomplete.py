@@ -0,0 +1,100 @@
+# Measures the memory, load time and latency of the title autocomplete index
+# Usage: python -m benchmarks.autocomplete [titles] [iterations]
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import WORDS
+from endpoints.title_index import TitleIndex
+from models.submission import Submission
+
+
+def main(titles: int = 1_000_000, iterations: int = 2000) -> None:
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/benchmark.db")
+        SQLModel.metadata.create_all(engine, tables=[Submission.__table__])
+
+        now = time.time()
+
+        # Titles only, the selftext is not indexed
+        with Session(engine) as session:
+            for start in range(1, titles + 1, 10_000):
+                session.execute(
+                    insert(Submission.__table__),
+                    [
+                        {
+                            "id": id,
+                            "submission_id": f"s{id:07d}",
+                            "title": "AITA for "
+                            + " ".join(rng.choice(WORDS) for _ in range(8)),
+                            "selftext": "",
+                            "created_utc": now - rng.randint(0, 3 * 365 * 86400),
+                            "permalink": "",
+                            "score": rng.randint(0, 20000),
+                        }
+                        for id in range(start, min(start + 10_000, titles + 1))
+                    ],
+                )
+            session.commit()
+
+        index = TitleIndex(engine, refresh_interval=float("inf"))
+
+        start = time.perf_counter()
+        index.load()
+        load_seconds = time.perf_counter() - start
+
+        # Loaded again to measure its memory, tracing slows the load down
+        tracemalloc.start()
+        traced = TitleIndex(engine)
+        traced.load()
+        index_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced
+
+        # Every prefix of the queries typed key by key, from the first character
+        typed = []
+
+        for _ in range(200):
+            query = " ".join(rng.sample(WORDS, 3))
+            typed.extend(query[:length] for length in range(1, len(query) + 1))
+
+        cold = []
+
+        for query in typed:
+            start = time.perf_counter()
+            index.search(query, 10)
+            cold.append((time.perf_counter() - start) * 1000)
+
+        cycle = iter(typed * (iterations // len(typed) + 2))
+
+        results = {
+            "titles": titles,
+            "load_seconds": load_seconds,
+            "index_mb": index_bytes / 1024 / 1024,
+            "load_peak_mb": peak_bytes / 1024 / 1024,
+            "cached_prefixes": len(index._top),
+            "first_keystroke_ms": {
+                "max": max(cold),
+                "p99": sorted(cold)[int(len(cold) * 0.99)],
+            },
+            "keystroke": measure(
+                lambda: index.search(next(cycle), 10), iterations=iterations
+            ),
+        }
+
+        engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
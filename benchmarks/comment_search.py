@@ -0,0 +1,122 @@
+# Measures the size of the comment search index, the cost it adds to inserts and the latency
+# of searches
+# Usage: python -m benchmarks.comment_search [comments] [iterations]
+import json
+import random
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from sqlalchemy import Engine, insert
+from sqlmodel import Session
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import WORDS, create_synthetic_database
+from endpoints.database_backend import SQLiteBackend
+from endpoints.search_query import parse_search_query
+from models.comment import Comment
+
+COMMENTS_PER_SUBMISSION = 50
+
+
+def _size_mb(engine: Engine, pattern: str) -> float:
+    with engine.connect() as connection:
+        size = connection.exec_driver_sql(
+            "SELECT sum(pgsize) FROM dbstat WHERE name LIKE ?", (pattern,)
+        ).one()[0]
+
+    return (size or 0) / 1024 / 1024
+
+
+def _insert_seconds(engine: Engine, rows: int, first_id: int) -> float:
+    rng = random.Random(first_id)
+    comments = [
+        {
+            "submission_id": "s0000001",
+            "message": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 60))),
+            "comment_id": f"i{first_id + number:08d}",
+            "parent_id": "t3_s0000001",
+            "created_utc": 0,
+            "score": 0,
+        }
+        for number in range(rows)
+    ]
+
+    start = time.perf_counter()
+
+    # In batches of 100, as the crawler inserts the comments of a submission
+    with Session(engine) as session:
+        for batch in range(0, rows, 100):
+            session.execute(insert(Comment.__table__), comments[batch : batch + 100])
+            session.commit()
+
+    return time.perf_counter() - start
+
+
+def main(comments: int = 1_000_000, iterations: int = 50) -> None:
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        engine = create_synthetic_database(
+            f"{directory}/benchmark.db",
+            submissions=comments // COMMENTS_PER_SUBMISSION,
+            comments_per_submission=COMMENTS_PER_SUBMISSION,
+        )
+        results: Dict = {
+            "comments": comments,
+            "database_seconds": time.perf_counter() - start,
+        }
+
+        backend = SQLiteBackend(str(engine.url))
+
+        start = time.perf_counter()
+        backend.create_comment_search_index(engine)
+        results["index_build_seconds"] = time.perf_counter() - start
+
+        results["comment_table_mb"] = _size_mb(engine, "comment")
+        results["index_mb"] = _size_mb(engine, "comment_fts%")
+
+        queries = {
+            "one word": lambda: rng.choice(WORDS),
+            "two words": lambda: f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+            "phrase of two": lambda: f'"{rng.choice(WORDS)} {rng.choice(WORDS)}"',
+            "phrase of three": lambda: '"' + " ".join(rng.sample(WORDS, 3)) + '"',
+            "prefix": lambda: rng.choice(WORDS)[:3] + "*",
+        }
+
+        results["latency"] = {}
+
+        with Session(engine) as session:
+            for kind, query in queries.items():
+
+                def search():
+                    terms = parse_search_query(query())
+                    backend.search_comments(session, terms, 0, 10, 3)
+
+                results["latency"][kind] = measure(
+                    search, iterations=iterations, warmup=2
+                )
+
+        # Inserts with the triggers maintaining the index, then without. Measured last,
+        # the inserted comments would skew the searches
+        with_index = _insert_seconds(engine, 10_000, 0)
+
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP TRIGGER comment_fts_insert")
+
+        without_index = _insert_seconds(engine, 10_000, 10_000)
+
+        results["inserts_per_second"] = {
+            "with_index": 10_000 / with_index,
+            "without_index": 10_000 / without_index,
+        }
+
+        engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
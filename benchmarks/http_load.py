@@ -0,0 +1,126 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from benchmarks.stats import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def uvicorn_server(
+    directory: str, database_url: str, workers: int = 1, timeout: float = 60
+) -> Iterator[str]:
+    """
+    Runs the API through server.py in a subprocess and yields its base URL once it answers.
+    """
+    port = _free_port()
+    environment = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        DATABASE_URL=database_url,
+        PORT=str(port),
+        HOST="127.0.0.1",
+        WEB_CONCURRENCY=str(workers),
+        # Large enough to never reject during a load test
+        RATE_LIMIT="100000000/minute",
+        RATE_LIMIT_STORAGE_URI=f"shm://{directory}/rate-limit",
+    )
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py")],
+        cwd=directory,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"{base_url}/metrics", timeout=1).close()
+                break
+            except OSError:
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"{base_url} did not start in {timeout}s")
+                time.sleep(0.05)
+
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def load(
+    base_url: str, paths: List[str], duration: float = 10, concurrency: int = 8
+) -> Dict:
+    """
+    Requests paths round robin from concurrent keep-alive connections for duration seconds
+    and returns the throughput, latency percentiles and number of failed requests.
+    """
+    host, port = base_url.removeprefix("http://").split(":")
+    samples: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset: int) -> None:
+        connection = http.client.HTTPConnection(host, int(port), timeout=30)
+        local_samples = []
+        local_errors = 0
+        index = offset
+
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            start = time.perf_counter()
+
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                response.read()
+
+                if response.status >= 400:
+                    local_errors += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, int(port), timeout=30)
+                continue
+
+            local_samples.append((time.perf_counter() - start) * 1000)
+
+        connection.close()
+
+        with lock:
+            samples.extend(local_samples)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return dict(summarize(samples, time.perf_counter() - started), errors=errors[0])
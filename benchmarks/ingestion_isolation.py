@@ -0,0 +1,177 @@
+# Measures API throughput over uvicorn with and without an ingestion run in a separate process
+# Usage: python -m benchmarks.ingestion_isolation [duration] [concurrency] [workers]
+#
+# Crawling and OpenAI need network access, the ingestion process replaces them by
+# synthetic stages with the same database writes: new comments queued for analytics, word
+# counting with summary and breakdown upserts, and a full text search rebuild.
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+from benchmarks.http_load import ROOT, load, uvicorn_server
+from benchmarks.synthetic import create_synthetic_database
+
+SUBMISSIONS = 2000
+
+
+def _ingest(duration: float) -> None:
+    from endpoints.breakdown_api import BreakdownAPI
+    from endpoints.comment_api import CommentAPI
+    from endpoints.database_config import DatabaseConfig
+    from endpoints.submission_api import SubmissionAPI
+    from endpoints.summary_api import SummaryAPI
+    from models.breakdown import Breakdown
+    from models.comment import Comment
+    from models.summary import Summary
+    from utils.fts_processor import FTSProcessor
+    from utils.scheduler import Scheduler, Stage, lower_priority
+    from utils.work_queue import ANALYTICS_QUEUE, WorkQueue
+
+    lower_priority()
+
+    engine = DatabaseConfig().get_engine()
+    comment_api = CommentAPI(engine)
+    submission_api = SubmissionAPI(engine)
+    summary_api = SummaryAPI(engine)
+    breakdown_api = BreakdownAPI(engine)
+    queue = WorkQueue(ANALYTICS_QUEUE, engine)
+    rng = random.Random(0)
+
+    async def crawl(run):
+        ids = [rng.randint(1, SUBMISSIONS) for _ in range(50)]
+
+        for id in ids:
+            comment_api.create_comment(
+                Comment(
+                    submission_id=f"s{id:07d}",
+                    message="nta " * rng.randint(1, 50),
+                    comment_id=uuid.uuid4().hex[:12],
+                    parent_id=f"t3_s{id:07d}",
+                    created_utc=int(time.time()),
+                    score=rng.randint(0, 100),
+                )
+            )
+            run.db_writes += 1
+
+        queue.enqueue(ids)
+
+    def analyse(id: int):
+        submission = submission_api.read_submission(id)
+        comments = comment_api.read_comments_by_submission_id(submission.submission_id)
+        words = Counter(
+            word
+            for comment in comments
+            for word in re.findall(r"\w+", comment.message.lower())
+        )
+        counts = {f"{verdict}_count": words[verdict] for verdict in ["nta", "yta"]}
+
+        summary_api.upsert_summary(
+            id,
+            Summary(
+                id=id,
+                afinn=0,
+                emotion={},
+                word_freq=dict(words.most_common(30)),
+                counts=counts,
+            ),
+        )
+        breakdown_api.upsert_breakdown(
+            id,
+            Breakdown(id=id, nta=words["nta"], yta=words["yta"], esh=0, info=0, nah=0),
+        )
+
+    async def analytics(run):
+        await queue.drain(analyse, run, workers=2)
+
+    async def fts(run):
+        FTSProcessor().process(run)
+
+    scheduler = Scheduler(
+        [
+            Stage("crawl", crawl),
+            Stage(
+                "analytics", analytics, ["crawl"], has_input=lambda: queue.ready() > 0
+            ),
+            Stage("fts", fts, ["crawl"]),
+        ]
+    )
+
+    runs = 0
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        asyncio.run(scheduler.run_once())
+        runs += 1
+
+    print(json.dumps({"runs": runs}))
+
+
+def main(duration: float = 10, concurrency: int = 8, workers: int = 1) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        create_synthetic_database(
+            f"{directory}/benchmark.db",
+            submissions=SUBMISSIONS,
+            comments_per_submission=50,
+        )
+        os.makedirs(f"{directory}/database")
+        database_url = f"sqlite:///{directory}/benchmark.db"
+
+        rng = random.Random(0)
+        paths = []
+
+        for _ in range(200):
+            id = rng.randint(1, SUBMISSIONS)
+            paths += [
+                "/api/v2/submissions?limit=20",
+                f"/api/v2/submission/{id}/detail?exclude=selftext,word_freq",
+                f"/api/v2/comments/search?submission_id=s{id:07d}&limit=20",
+                f"/api/v2/summary/{id}",
+            ]
+
+        with uvicorn_server(directory, database_url, workers) as base_url:
+            baseline = load(base_url, paths, duration, concurrency)
+
+            ingestion = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.ingestion_isolation",
+                    "--ingest",
+                    str(duration),
+                ],
+                cwd=directory,
+                env=dict(os.environ, PYTHONPATH=ROOT, DATABASE_URL=database_url),
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            during = load(base_url, paths, duration, concurrency)
+            output, _ = ingestion.communicate()
+
+        results = {
+            "duration": duration,
+            "concurrency": concurrency,
+            "workers": workers,
+            "baseline": baseline,
+            "during_ingestion": during,
+            "ingestion": json.loads(output.splitlines()[-1]),
+            "throughput_ratio": during["throughput"] / baseline["throughput"],
+        }
+
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--ingest"]:
+        _ingest(float(sys.argv[2]))
+    else:
+        main(
+            *[float(arg) for arg in sys.argv[1:2]], *[int(arg) for arg in sys.argv[2:4]]
+        )
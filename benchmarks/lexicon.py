@@ -0,0 +1,153 @@
+# Compares scoring comments with the lexicon scorer against afinn and NRCLex over the
+# concatenated replies of each submission, as the analytics stage did, and measures the
+# sentiment aggregates of /submission/{id}/sentiment
+# Usage: python -m benchmarks.lexicon [submissions] [comments per submission]
+#
+# Comments mix lexicon words, AFINN phrases and other words, with capitals and punctuation.
+# NRCLex tokenizes with TextBlob, which needs the NLTK data of the worker image.
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from afinn import Afinn
+from fastapi.testclient import TestClient
+from nrclex import NRCLex
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import WORDS, create_synthetic_database
+from models.comment import Comment
+from models.comment_sentiment import CommentSentiment
+from models.submission import Submission
+from models.summary import EMOTIONS
+from utils.lexicon import LexiconScorer, sentiment_rows
+
+PHRASES = ["does not work", "can't stand", "no fun", "screwed up", "self-confident"]
+
+
+def _comment(rng: random.Random, lexicon: list) -> str:
+    words = []
+
+    for _ in range(rng.randint(5, 80)):
+        draw = rng.random()
+
+        if draw < 0.2:
+            words.append(rng.choice(lexicon))
+        elif draw < 0.22:
+            words.append(rng.choice(PHRASES))
+        else:
+            words.append(rng.choice(WORDS))
+
+        if rng.random() < 0.05:
+            words[-1] = words[-1].capitalize()
+
+        if rng.random() < 0.1:
+            words[-1] += rng.choice([".", ",", "!", "?"])
+
+    return " ".join(words)
+
+
+def main(submissions: int = 200, comments: int = 100) -> None:
+    rng = random.Random(5)
+    afinn = Afinn()
+    scorer = LexiconScorer()
+    lexicon = sorted(set(afinn._dict) | set(NRCLex.lexicon))
+
+    threads = [
+        [_comment(rng, lexicon) for _ in range(comments)] for _ in range(submissions)
+    ]
+    texts = [text for thread in threads for text in thread]
+    submission_ids = iter(range(submissions))
+    thread_ids = iter(range(submissions))
+
+    # The analytics stage before, once per submission on its concatenated replies
+    def concatenated():
+        replies = "".join(threads[next(submission_ids)])
+
+        return afinn.score(replies), NRCLex(replies).raw_emotion_scores
+
+    def scored():
+        return scorer.score(threads[next(thread_ids)])
+
+    start = time.perf_counter()
+    afinn_scores, emotions, _ = scorer.score(texts)
+    batch_seconds = time.perf_counter() - start
+
+    # Agreement on each comment, NRCLex given lowercase text as the scorer lowercases
+    sample = rng.sample(range(len(texts)), min(2000, len(texts)))
+    same_afinn = sum(afinn_scores[i] == afinn.score(texts[i]) for i in sample)
+    same_emotions = sum(
+        {
+            emotion: count
+            for emotion, count in zip(EMOTIONS, emotions[i].tolist())
+            if count > 0
+        }
+        == NRCLex(texts[i].lower()).raw_emotion_scores
+        for i in sample
+    )
+
+    results = {
+        "comments": len(texts),
+        "concatenated_afinn_and_nrclex_per_submission": measure(
+            concatenated, iterations=submissions, warmup=0
+        ),
+        "lexicon_scorer_per_submission": measure(
+            scored, iterations=submissions, warmup=0
+        ),
+        "lexicon_scorer_comments_per_second": len(texts) / batch_seconds,
+        "same_afinn_as_afinn": same_afinn / len(sample),
+        "same_emotions_as_nrclex_lowercase": same_emotions / len(sample),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("database")
+
+        engine = create_synthetic_database(
+            "database/benchmark.db",
+            submissions=submissions,
+            comments_per_submission=comments,
+        )
+        os.environ["DATABASE_URL"] = "sqlite:///database/benchmark.db"
+        os.environ["RATE_LIMIT"] = "100000000/minute"
+
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Comment.id, Submission.id, Comment.message).join(
+                    Submission, Submission.submission_id == Comment.submission_id
+                )
+            ).all()
+            session.execute(
+                insert(CommentSentiment),
+                sentiment_rows(
+                    [
+                        (comment_id, submission_id)
+                        for comment_id, submission_id, _ in rows
+                    ],
+                    scorer.score([message for _, _, message in rows]),
+                ),
+            )
+            session.commit()
+
+        from main import app
+
+        client = TestClient(app)
+
+        results["sentiment_endpoint"] = measure(
+            lambda: client.get(
+                f"/api/v2/submission/{rng.randint(1, submissions)}/sentiment"
+            ).json(),
+            iterations=200,
+        )
+
+        engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,207 @@
+# Load tests the public endpoints on a synthetic database, in process and over uvicorn
+# Usage: python -m benchmarks.load [--submissions 2000] [--comments 50] [--mode both]
+#                                  [--duration 5] [--concurrency 8] [--output results.json]
+#
+# Results are written as JSON, compare the files of two commits to spot regressions.
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from sqlmodel import Session
+
+from benchmarks.http_load import ROOT, load, uvicorn_server
+from benchmarks.stats import measure
+from benchmarks.synthetic import WORDS, create_synthetic_database
+from endpoints.database_backend import SQLiteBackend
+
+# Spelled as the month enum of /submissions/top
+MONTHS = ["January", "March", "Jun", "September", "December"]
+
+
+def endpoint_paths(submissions: int, seed: int = 0) -> Dict[str, List[str]]:
+    """
+    Returns request paths per endpoint, with ids and queries spread over the database.
+    """
+    rng = random.Random(seed)
+    prefix = "/api/v2"
+    paths = {}
+
+    ids = [rng.randint(1, submissions) for _ in range(200)]
+
+    paths["/submissions"] = [
+        f"{prefix}/submissions?offset={rng.randint(0, 100)}&limit=20&sortBy=score"
+        for _ in range(50)
+    ]
+    paths["/submission/{id}"] = [f"{prefix}/submission/{id}" for id in ids]
+    paths["/submissions/top"] = [
+        f"{prefix}/submissions/top?year=2024&month={month}&type={verdict}"
+        for month in MONTHS + ["allMonths"]
+        for verdict in ["nta", "yta", "esh", "info", "nah"]
+    ]
+    paths["/submissions/fuzzy-search"] = [
+        f"{prefix}/submissions/fuzzy-search?query={rng.choice(WORDS)}&limit=20"
+        for _ in range(50)
+    ]
+    paths["/comments/search"] = [
+        f"{prefix}/comments/search?submission_id=s{id:07d}&limit=50&sortBy=score"
+        for id in ids
+    ]
+    paths["/comments/fuzzy-search"] = [
+        f"{prefix}/comments/fuzzy-search?query=%22{rng.choice(WORDS)}+{rng.choice(WORDS)}%22"
+        for _ in range(50)
+    ]
+    paths["/summaries/"] = [
+        f"{prefix}/summaries/?offset={rng.randint(0, 100)}&limit=20" for _ in range(50)
+    ]
+    paths["/health"] = [f"{prefix}/health"]
+
+    return paths
+
+
+def _create_database(directory: str, submissions: int, comments: int) -> str:
+    path = f"{directory}/benchmark.db"
+    engine = create_synthetic_database(
+        path, submissions=submissions, comments_per_submission=comments
+    )
+
+    backend = SQLiteBackend(str(engine.url))
+
+    with Session(engine) as session:
+        backend.rebuild_search_index(session)
+        session.commit()
+
+    backend.create_comment_search_index(engine)
+
+    engine.dispose()
+
+    return f"sqlite:///{path}"
+
+
+def run_in_process(
+    directory: str, database_url: str, paths: Dict[str, List[str]]
+) -> Dict:
+    """
+    Drives the app through the TestClient, measuring the application without a network.
+    Runs in a subprocess so the app binds to the benchmark database.
+    """
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load", "--in-process-worker"],
+        input=json.dumps(paths),
+        cwd=directory,
+        env=dict(
+            os.environ,
+            PYTHONPATH=ROOT,
+            DATABASE_URL=database_url,
+            RATE_LIMIT="100000000/minute",
+        ),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def _in_process_worker() -> None:
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    paths = json.loads(sys.stdin.read())
+    results = {}
+
+    with TestClient(app) as client:
+        for endpoint, endpoint_paths in paths.items():
+            cycle = itertools.cycle(endpoint_paths)
+
+            def request():
+                response = client.get(next(cycle))
+                assert response.status_code == 200, response.text
+
+            results[endpoint] = measure(request)
+
+    print(json.dumps(results))
+
+
+def run_over_uvicorn(
+    directory: str,
+    database_url: str,
+    paths: Dict[str, List[str]],
+    duration: float,
+    concurrency: int,
+    workers: int,
+) -> Dict:
+    with uvicorn_server(directory, database_url, workers) as base_url:
+        return {
+            endpoint: load(base_url, endpoint_paths, duration, concurrency)
+            for endpoint, endpoint_paths in paths.items()
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AITA API load test")
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=50)
+    parser.add_argument(
+        "--mode", choices=["in-process", "uvicorn", "both"], default="both"
+    )
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="Writes the results to this file")
+    parser.add_argument(
+        "--in-process-worker", action="store_true", help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.in_process_worker:
+        return _in_process_worker()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(f"{directory}/database")
+
+        started = time.perf_counter()
+        database_url = _create_database(directory, args.submissions, args.comments)
+
+        paths = endpoint_paths(args.submissions)
+        results = {
+            "submissions": args.submissions,
+            "comments_per_submission": args.comments,
+            "database_seconds": time.perf_counter() - started,
+        }
+
+        if args.mode in ["in-process", "both"]:
+            results["in_process"] = run_in_process(directory, database_url, paths)
+
+        if args.mode in ["uvicorn", "both"]:
+            results["uvicorn"] = dict(
+                concurrency=args.concurrency,
+                workers=args.workers,
+                endpoints=run_over_uvicorn(
+                    directory,
+                    database_url,
+                    paths,
+                    args.duration,
+                    args.concurrency,
+                    args.workers,
+                ),
+            )
+
+    output = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
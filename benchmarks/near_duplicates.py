@@ -0,0 +1,153 @@
+# Measures near duplicate detection: how many reposts are found, false links, the cost of
+# indexing a crawled submission and the size of the band index
+# Usage: python -m benchmarks.near_duplicates [submissions] [reposts]
+#
+# Reposts copy a random submission with a share of their words replaced, and half of them
+# an added paragraph, as an edit would.
+import json
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, select
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import WORDS, create_synthetic_database
+from models.near_duplicate import MinHashBand, MinHashSignature
+from models.submission import Submission
+from utils.near_duplicates import NearDuplicateIndex
+
+EDITS = [0.01, 0.03, 0.05, 0.1, 0.2]
+
+
+def _repost(rng: random.Random, selftext: str, edits: float) -> str:
+    words = selftext.split()
+
+    for position in rng.sample(range(len(words)), int(len(words) * edits)):
+        words[position] = rng.choice(WORDS)
+
+    if rng.random() < 0.5:
+        words.extend(rng.choice(WORDS) for _ in range(30))
+
+    return " ".join(words)
+
+
+def main(submissions: int = 20000, reposts: int = 1000) -> None:
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_synthetic_database(
+            f"{directory}/benchmark.db",
+            submissions=submissions,
+            comments_per_submission=0,
+        )
+        SQLModel.metadata.create_all(
+            engine, tables=[MinHashSignature.__table__, MinHashBand.__table__]
+        )
+
+        index = NearDuplicateIndex(engine)
+
+        start = time.perf_counter()
+        index.index_missing()
+        backfill_seconds = time.perf_counter() - start
+
+        with Session(engine) as session:
+            texts = dict(session.exec(select(Submission.id, Submission.selftext)).all())
+            falsely_linked = len(
+                session.exec(
+                    select(Submission.id).where(Submission.canonical_id.is_not(None))
+                ).all()
+            )
+
+        # Reposts are indexed one at a time, as the crawler does
+        originals = {}
+        next_id = submissions + 1
+
+        with Session(engine) as session:
+            for number in range(reposts):
+                original = rng.randint(1, submissions)
+                originals[next_id + number] = (original, EDITS[number % len(EDITS)])
+
+            session.execute(
+                insert(Submission.__table__),
+                [
+                    {
+                        "id": id,
+                        "submission_id": f"r{id:07d}",
+                        "title": "AITA repost",
+                        "selftext": _repost(rng, texts[original], edits),
+                        "created_utc": time.time(),
+                        "permalink": "",
+                        "score": 0,
+                    }
+                    for id, (original, edits) in originals.items()
+                ],
+            )
+            session.commit()
+
+            reposted = dict(
+                session.exec(
+                    select(Submission.id, Submission.selftext).where(
+                        Submission.id >= next_id
+                    )
+                ).all()
+            )
+
+        ids = iter(originals)
+
+        def index_next():
+            id = next(ids)
+            index.index(id, reposted[id])
+
+        latency = measure(index_next, iterations=reposts, warmup=0)
+
+        with Session(engine) as session:
+            canonical = dict(
+                session.exec(
+                    select(Submission.id, Submission.canonical_id).where(
+                        Submission.id >= next_id
+                    )
+                ).all()
+            )
+
+        found = {
+            edits: sum(
+                canonical[id] == original
+                for id, (original, repost_edits) in originals.items()
+                if repost_edits == edits
+            )
+            / sum(1 for _, repost_edits in originals.values() if repost_edits == edits)
+            for edits in EDITS
+        }
+
+        with engine.connect() as connection:
+            table_bytes = dict(
+                connection.exec_driver_sql(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                    "('minhash_band', 'sqlite_autoindex_minhash_band_1', "
+                    "'ix_minhash_band_submission_id', 'minhash_signature') GROUP BY name"
+                ).all()
+            )
+
+        engine.dispose()
+
+    results = {
+        "submissions": submissions,
+        "reposts": reposts,
+        "backfill_per_second": submissions / backfill_seconds,
+        "falsely_linked_originals": falsely_linked,
+        "found_by_words_edited": found,
+        "index_one": latency,
+        "index_mb_per_10k": {
+            name: size / 1024 / 1024 * 10_000 / (submissions + reposts)
+            for name, size in table_bytes.items()
+        },
+    }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
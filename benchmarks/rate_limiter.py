@@ -0,0 +1,67 @@
+# Measures the per request overhead of rate limiting on a minimal route
+# Usage: python -m benchmarks.rate_limiter
+import json
+import tempfile
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from slowapi import Limiter
+from slowapi.middleware import SlowAPIMiddleware
+from slowapi.util import get_remote_address
+
+from benchmarks.stats import measure
+from endpoints.rate_limiter import RateLimiter
+
+# Large enough to never reject during the benchmark
+LIMIT = "100000000/minute"
+
+
+def _ping():
+    return {"details": "Pong"}
+
+
+def _app(dependencies=[]) -> FastAPI:
+    app = FastAPI()
+    router = APIRouter()
+    router.add_api_route("/ping", _ping, methods=["GET"])
+    app.include_router(router, dependencies=dependencies)
+    return app
+
+
+def _slowapi_app() -> FastAPI:
+    app = _app()
+    app.state.limiter = Limiter(
+        key_func=get_remote_address, headers_enabled=True, default_limits=[LIMIT]
+    )
+    app.add_middleware(SlowAPIMiddleware)
+    return app
+
+
+def _measure_requests(app: FastAPI) -> dict:
+    with TestClient(app) as client:
+        return measure(lambda: client.get("/ping"), iterations=2000)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        memory = RateLimiter(limit=LIMIT, storage_uri="memory://")
+        shared = RateLimiter(limit=LIMIT, storage_uri=f"shm://{directory}/rate-limit")
+
+        results = {
+            "no_limiter": _measure_requests(_app()),
+            "slowapi_middleware": _measure_requests(_slowapi_app()),
+            "dependency_memory": _measure_requests(_app([Depends(memory)])),
+            "dependency_shm": _measure_requests(_app([Depends(shared)])),
+            "storage_incr_memory": measure(
+                lambda: memory.storage.incr("key", 60), iterations=20000
+            ),
+            "storage_incr_shm": measure(
+                lambda: shared.storage.incr("key", 60), iterations=20000
+            ),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
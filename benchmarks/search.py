@@ -0,0 +1,143 @@
+# Measures the relevance and latency of the submission search on a synthetic corpus
+# Usage: python -m benchmarks.search [submissions] [queries]
+#
+# Every query is made of words of the title of one submission, relevance is how high that
+# submission ranks: the mean reciprocal rank and the share found first or in the top 10.
+import itertools
+import json
+import random
+import sys
+import tempfile
+from typing import Callable, Dict, List
+
+import sqlalchemy
+from sqlmodel import Session
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import create_synthetic_database
+from endpoints.database_backend import SQLiteBackend
+from endpoints.search_query import parse_search_query
+
+LIMIT = 20
+
+
+def _queries(session: Session, count: int, seed: int) -> Dict[str, List[tuple]]:
+    """
+    Returns (query, expected id) pairs per kind of query.
+    """
+    rng = random.Random(seed)
+    titles = session.exec(sqlalchemy.text("SELECT id, title FROM submission")).all()
+
+    queries = {"terms": [], "phrase": [], "prefix": [], "title filter": []}
+
+    for id, title in rng.sample(titles, count):
+        # Without "AITA for", shared by every title
+        words = title.split()[2:]
+        start = rng.randint(0, len(words) - 3)
+        phrase = words[start : start + 3]
+
+        queries["terms"].append((" ".join(word.capitalize() for word in phrase), id))
+        queries["phrase"].append(('"' + " ".join(phrase).upper() + '"', id))
+        queries["prefix"].append((" ".join(word[:4] + "*" for word in phrase), id))
+        queries["title filter"].append(
+            (" ".join(f"title:{word}" for word in phrase), id)
+        )
+
+    return queries
+
+
+def _legacy_search(session: Session, query: str) -> List[int]:
+    """
+    The search before query parsing: punctuation and spaces stripped, matched case
+    sensitively against a trigram index.
+    """
+    statement = sqlalchemy.text(
+        "SELECT id FROM submission_trigram WHERE submission_trigram MATCH :query "
+        "ORDER BY rank LIMIT :limit"
+    )
+
+    try:
+        rows = session.exec(
+            statement,
+            params={
+                "query": "".join(char for char in query if char.isalnum()),
+                "limit": LIMIT,
+            },
+        )
+        return [int(id) for (id,) in rows]
+    except sqlalchemy.exc.OperationalError:
+        return []
+
+
+def _relevance(search: Callable[[str], List[int]], queries: List[tuple]) -> Dict:
+    reciprocal_ranks = []
+
+    for query, expected in queries:
+        ids = search(query)
+        reciprocal_ranks.append(1 / (ids.index(expected) + 1) if expected in ids else 0)
+
+    return {
+        "mrr": sum(reciprocal_ranks) / len(reciprocal_ranks),
+        "hit_at_1": sum(rank == 1 for rank in reciprocal_ranks) / len(reciprocal_ranks),
+        "hit_at_10": sum(rank >= 0.1 for rank in reciprocal_ranks)
+        / len(reciprocal_ranks),
+    }
+
+
+def main(submissions: int = 5000, count: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_synthetic_database(
+            f"{directory}/benchmark.db",
+            submissions=submissions,
+            comments_per_submission=0,
+        )
+
+        backend = SQLiteBackend(str(engine.url))
+        unboosted = SQLiteBackend(str(engine.url))
+        unboosted.TITLE_BOOST = 1.0
+
+        with Session(engine) as session:
+            backend.rebuild_search_index(session)
+            session.exec(
+                sqlalchemy.text(
+                    "CREATE VIRTUAL TABLE submission_trigram "
+                    'USING fts5(id, title, selftext, tokenize="trigram case_sensitive 1")'
+                )
+            )
+            session.exec(
+                sqlalchemy.text(
+                    "INSERT INTO submission_trigram SELECT id, title, selftext FROM submission"
+                )
+            )
+            session.commit()
+
+            queries = _queries(session, count, seed=0)
+
+            def search(backend):
+                return lambda query: backend.search_submission_ids(
+                    session, parse_search_query(query), LIMIT
+                )
+
+            results = {"submissions": submissions, "queries": count, "kinds": {}}
+
+            for kind, kind_queries in queries.items():
+                cycle = itertools.cycle(query for query, _ in kind_queries)
+
+                results["kinds"][kind] = {
+                    "relevance": _relevance(search(backend), kind_queries),
+                    "relevance_without_title_boost": _relevance(
+                        search(unboosted), kind_queries
+                    ),
+                    "relevance_legacy": _relevance(
+                        lambda query: _legacy_search(session, query), kind_queries
+                    ),
+                    "latency": measure(lambda: search(backend)(next(cycle))),
+                }
+
+        engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
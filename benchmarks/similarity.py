@@ -0,0 +1,101 @@
+# Measures the similarity stage: a full build, an incremental add and the endpoint read
+# Usage: python -m benchmarks.similarity [submissions] [added]
+#
+# The incremental neighbors are compared with those of a full build over the same
+# submissions, they differ where the IDF of the full build changed.
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import create_synthetic_database
+from models.pipeline_run import PipelineRun
+
+
+def _neighbors(engine) -> dict:
+    neighbors = {}
+
+    with engine.connect() as connection:
+        for submission_id, similar_id in connection.exec_driver_sql(
+            "SELECT submission_id, similar_id FROM similar_submission"
+        ):
+            neighbors.setdefault(submission_id, set()).add(similar_id)
+
+    return neighbors
+
+
+def main(submissions: int = 20000, added: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("database")
+
+        engine = create_synthetic_database(
+            "database/benchmark.db", submissions=submissions, comments_per_submission=0
+        )
+        os.environ["DATABASE_URL"] = "sqlite:///database/benchmark.db"
+        os.environ["RATE_LIMIT"] = "100000000/minute"
+
+        from main import app
+        from utils.similarity import SimilarityProcessor
+
+        # The last submissions are held back and added by a second run
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE held AS SELECT * FROM submission WHERE id > ?",
+                (submissions - added,),
+            )
+            connection.exec_driver_sql(
+                "DELETE FROM submission WHERE id > ?", (submissions - added,)
+            )
+
+        client = TestClient(app)
+        processor = SimilarityProcessor()
+        results = {"submissions": submissions, "added": added}
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        processor.process(PipelineRun(started_at=0))
+        results["build_seconds"] = time.perf_counter() - start
+        results["build_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+        with engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO submission SELECT * FROM held")
+
+        run = PipelineRun(started_at=0)
+        start = time.perf_counter()
+        processor.process(run)
+        results["add_seconds"] = time.perf_counter() - start
+        results["add_submissions_updated"] = run.items_out
+
+        results["state_file_mb"] = os.path.getsize(processor.state_file) / 1024 / 1024
+
+        ids = iter(range(1, submissions + 1))
+        results["endpoint"] = measure(
+            lambda: client.get(f"/api/v2/submission/{next(ids)}/similar").json(),
+            iterations=min(1000, submissions - 10),
+        )
+
+        incremental = _neighbors(engine)
+
+        os.remove(processor.state_file)
+        processor.process(PipelineRun(started_at=0))
+        full = _neighbors(engine)
+
+        results["incremental_recall"] = sum(
+            len(incremental.get(id, set()) & similar) / len(similar)
+            for id, similar in full.items()
+        ) / len(full)
+
+        engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,139 @@
+# Measures the cold start of the API: import time, memory and time to first response
+# Usage: python -m benchmarks.startup [runs]
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.synthetic import create_synthetic_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the ingestion worker needs these, the API must not import them
+INGESTION_MODULES = ["nltk", "nrclex", "afinn", "asyncpraw", "openai", "textblob"]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "ingestion_modules": sorted(
+        name for name in %r if name in sys.modules
+    ),
+}))
+"""
+
+
+def _environment(directory: str) -> dict:
+    return dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        DATABASE_URL=f"sqlite:///{directory}/benchmark.db",
+    )
+
+
+def _import_profile(directory: str) -> list:
+    """
+    Returns the modules with the largest cumulative import time, from -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=directory,
+        env=_environment(directory),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = []
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+
+        # Only modules imported directly by main, nested ones are part of their total
+        if name.startswith("   ") and not name.startswith("    "):
+            modules.append({"module": name.strip(), "ms": int(cumulative) / 1000})
+
+    return sorted(modules, key=lambda module: module["ms"], reverse=True)[:10]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _time_to_first_response(directory: str, timeout: float = 60) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/v2/health"
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=directory,
+        env=_environment(directory),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+
+        raise TimeoutError(f"No response from {url} after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(runs: int = 5) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        create_synthetic_database(
+            f"{directory}/benchmark.db", submissions=100, comments_per_submission=10
+        )
+
+        probes = []
+        first_responses = []
+
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, "-c", _PROBE % INGESTION_MODULES],
+                cwd=directory,
+                env=_environment(directory),
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            probes.append(json.loads(result.stdout.splitlines()[-1]))
+            first_responses.append(_time_to_first_response(directory))
+
+        results = {
+            "runs": runs,
+            "import_ms": statistics.median(probe["import_ms"] for probe in probes),
+            "max_rss_mb": statistics.median(probe["max_rss_mb"] for probe in probes),
+            "time_to_first_response_ms": statistics.median(first_responses),
+            "ingestion_modules_imported": probes[0]["ingestion_modules"],
+            "slowest_imports": _import_profile(directory),
+        }
+
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
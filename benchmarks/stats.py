@@ -0,0 +1,38 @@
+import statistics
+import time
+from typing import Callable, Dict, List
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict:
+    """
+    Returns the throughput and latency percentiles of samples in milliseconds taken over
+    elapsed seconds
+    """
+    quantiles = statistics.quantiles(samples, n=100)
+
+    return {
+        "iterations": len(samples),
+        "throughput": len(samples) / elapsed,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": quantiles[49],
+        "p95_ms": quantiles[94],
+        "p99_ms": quantiles[98],
+    }
+
+
+def measure(function: Callable, iterations: int = 200, warmup: int = 10) -> Dict:
+    """
+    Calls function repeatedly and returns the throughput and latency percentiles in milliseconds
+    """
+    for _ in range(warmup):
+        function()
+
+    samples = []
+    started = time.perf_counter()
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return summarize(samples, time.perf_counter() - started)
@@ -0,0 +1,86 @@
+# Compares the composite submission detail endpoint against the five call fan-out
+# Usage: python -m benchmarks.submission_detail [submissions] [comments_per_submission]
+import json
+import random
+import sys
+import tempfile
+
+from fastapi import Response
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import create_synthetic_database
+from endpoints.breakdown_api import BreakdownAPI
+from endpoints.comment_api import CommentAPI
+from endpoints.openai_inference_api import OpenAIInferenceAPI
+from endpoints.submission_api import SubmissionAPI
+from endpoints.submission_detail_api import SubmissionDetailAPI
+from endpoints.summary_api import SummaryAPI
+
+
+def main(submissions: int = 2000, comments_per_submission: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_synthetic_database(
+            f"{directory}/benchmark.db",
+            submissions=submissions,
+            comments_per_submission=comments_per_submission,
+        )
+
+        submission_api = SubmissionAPI(engine)
+        breakdown_api = BreakdownAPI(engine)
+        summary_api = SummaryAPI(engine)
+        openai_api = OpenAIInferenceAPI(engine)
+        comment_api = CommentAPI(engine)
+        detail_api = SubmissionDetailAPI(engine)
+
+        rng = random.Random(0)
+
+        def fan_out():
+            id = rng.randint(1, submissions)
+            submission = submission_api.read_submission(id)
+            breakdown_api.read_breakdown(id)
+            summary_api.read_summary(id)
+            openai_api.read_openai_inference(id)
+            comment_api.read_comments_by_submission_id(submission.submission_id)
+
+        def composite(exclude: str = ""):
+            def run():
+                detail_api._load_submission_detail(
+                    rng.randint(1, submissions),
+                    [
+                        "breakdown",
+                        "comments",
+                        "openai_analysis",
+                        "submission",
+                        "summary",
+                    ],
+                    [field for field in exclude.split(",") if field != ""],
+                    10,
+                )
+
+            return run
+
+        def composite_cached():
+            detail_api.read_submission_detail(
+                rng.randint(1, 50),
+                Response(),
+                include="submission,breakdown,summary,openai_analysis,comments",
+                exclude="",
+                comments_limit=10,
+            )
+
+        results = {
+            "submissions": submissions,
+            "comments_per_submission": comments_per_submission,
+            "fan_out": measure(fan_out),
+            "composite": measure(composite()),
+            "composite_without_heavy_fields": measure(
+                composite("selftext,word_freq,message")
+            ),
+            "composite_cached": measure(composite_cached),
+        }
+
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
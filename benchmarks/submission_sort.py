@@ -0,0 +1,126 @@
+# Measures sorting /submissions by verdict counts, total verdicts and controversy over a range
+# of creation times, against joining every breakdown and sorting in Python
+# Usage: python -m benchmarks.submission_sort [submissions]
+#
+# Verdict counts follow a Pareto distribution, most threads get a few and some thousands.
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import bindparam, text, update
+from sqlmodel import Session, select
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import create_synthetic_database
+from models.breakdown import Breakdown, metrics
+from models.submission import Submission
+
+DAY = 24 * 60 * 60
+VERDICTS = ("nta", "yta", "esh", "info", "nah")
+
+
+def main(submissions: int = 50000) -> None:
+    rng = random.Random(4)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("database")
+
+        engine = create_synthetic_database(
+            "database/benchmark.db", submissions=submissions, comments_per_submission=0
+        )
+        os.environ["DATABASE_URL"] = "sqlite:///database/benchmark.db"
+        os.environ["RATE_LIMIT"] = "100000000/minute"
+
+        with Session(engine) as session:
+            rows = []
+
+            for id in range(1, submissions + 1):
+                counts = {
+                    verdict: int(rng.paretovariate(1.2) * 3) for verdict in VERDICTS
+                }
+                rows.append({"breakdown_id": id, **counts, **metrics(**counts)})
+
+            session.execute(
+                update(Breakdown.__table__)
+                .where(Breakdown.__table__.c.id == bindparam("breakdown_id"))
+                .values(
+                    {
+                        name: bindparam(name)
+                        for name in (*VERDICTS, "verdicts", "controversy")
+                    }
+                ),
+                rows,
+            )
+            session.commit()
+            session.exec(text("ANALYZE"))
+
+        from main import app
+
+        client = TestClient(app)
+        now = time.time()
+        ranges = {
+            "all_time": (None, None),
+            "last_year": (now - 365 * DAY, now),
+            "last_week": (now - 7 * DAY, now),
+        }
+        results = {}
+
+        for sort in ("yta", "verdicts", "controversy"):
+            for name, (start, end) in ranges.items():
+                url = f"/api/v2/submissions?sortBy={sort}&orderBy=desc&limit=20"
+
+                if start is not None:
+                    url += f"&start={start}&end={end}"
+
+                def python_sort():
+                    with Session(engine) as session:
+                        rows = session.exec(
+                            select(Submission, Breakdown).join(
+                                Breakdown, Breakdown.id == Submission.id
+                            )
+                        ).all()
+
+                    rows = [
+                        (submission, breakdown)
+                        for submission, breakdown in rows
+                        if start is None or start <= submission.created_utc < end
+                    ]
+                    rows.sort(
+                        key=lambda row: (
+                            (
+                                metrics(
+                                    *(getattr(row[1], verdict) for verdict in VERDICTS)
+                                )[sort]
+                                if sort != "yta"
+                                else row[1].yta
+                            ),
+                            row[0].created_utc,
+                            row[0].id,
+                        ),
+                        reverse=True,
+                    )
+
+                    return [submission.id for submission, _ in rows[:20]]
+
+                endpoint_ids = [
+                    submission["id"] for submission in client.get(url).json()
+                ]
+
+                results[f"{sort}_{name}"] = {
+                    "endpoint": measure(lambda: client.get(url).json(), iterations=100),
+                    "python_sort": measure(python_sort, iterations=5, warmup=1),
+                    "same_result": endpoint_ids == python_sort(),
+                }
+
+        engine.dispose()
+
+    print(json.dumps({"submissions": submissions, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,75 @@
+# Measures filtering and sorting /summaries/ on the indexed metric columns against reading
+# every summary and its JSON in Python, as clients had to
+# Usage: python -m benchmarks.summary_filters [submissions]
+import json
+import os
+import sys
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import create_synthetic_database
+from models.summary import Summary
+
+# Query string, and the same filter and sort over the JSON
+QUERIES = {
+    "most_angry": (
+        "sortBy=anger&orderBy=desc&limit=20",
+        lambda summary: True,
+        lambda summary: (summary.emotion.get("anger", 0), summary.id),
+    ),
+    "most_negative_with_yta": (
+        "sortBy=afinn&orderBy=asc&filter=yta_count>=5&limit=20",
+        lambda summary: summary.counts.get("yta_count", 0) >= 5,
+        lambda summary: (-summary.afinn, summary.id),
+    ),
+    "angry_range_by_id": (
+        "filter=anger>=48&filter=anger<=49&limit=20",
+        lambda summary: 48 <= summary.emotion.get("anger", 0) <= 49,
+        lambda summary: summary.id,
+    ),
+}
+
+
+def main(submissions: int = 50000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("database")
+
+        engine = create_synthetic_database(
+            "database/benchmark.db", submissions=submissions, comments_per_submission=0
+        )
+        os.environ["DATABASE_URL"] = "sqlite:///database/benchmark.db"
+        os.environ["RATE_LIMIT"] = "100000000/minute"
+
+        from main import app
+
+        client = TestClient(app)
+        results = {}
+
+        for name, (query, keep, key) in QUERIES.items():
+            url = f"/api/v2/summaries/?{query}"
+
+            def scan():
+                with Session(engine) as session:
+                    summaries = session.exec(select(Summary)).all()
+
+                return sorted(filter(keep, summaries), key=key, reverse=True)[:20]
+
+            endpoint_ids = [summary["id"] for summary in client.get(url).json()]
+
+            results[name] = {
+                "endpoint": measure(lambda: client.get(url).json(), iterations=200),
+                "json_scan": measure(scan, iterations=10, warmup=1),
+                "same_result": endpoint_ids == [summary.id for summary in scan()],
+            }
+
+        engine.dispose()
+
+    print(json.dumps({"submissions": submissions, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
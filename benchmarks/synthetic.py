@@ -0,0 +1,187 @@
+# Generates a synthetic AITA database for benchmarking
+import os
+import random
+import time
+
+from sqlalchemy import Engine, insert
+from sqlmodel import Session, SQLModel, create_engine
+
+from endpoints.database_backend import backend_for
+from models.breakdown import Breakdown
+from models.breakdown import metrics as breakdown_metrics
+from models.comment import Comment
+from models.openai_analytics import OpenAIAnalysis
+from models.submission import Submission
+from models.summary import Summary, afinn_mean
+from models.summary import metrics as summary_metrics
+from utils.migrator import Migrator
+
+WORDS = [
+    "sister",
+    "wedding",
+    "mother",
+    "brother",
+    "friend",
+    "dog",
+    "cat",
+    "house",
+    "money",
+    "birthday",
+    "party",
+    "dinner",
+    "roommate",
+    "boyfriend",
+    "girlfriend",
+    "husband",
+    "wife",
+    "work",
+    "boss",
+    "vacation",
+    "car",
+    "rent",
+    "kids",
+    "family",
+    "gift",
+    "phone",
+    "school",
+    "told",
+    "refused",
+    "yelled",
+    "asked",
+    "wanted",
+    "said",
+    "left",
+    "paid",
+    "invited",
+    "angry",
+    "upset",
+    "happy",
+    "sorry",
+    "rude",
+    "fair",
+    "wrong",
+    "right",
+    "never",
+    "always",
+]
+
+VERDICTS = ["nta", "yta", "esh", "info", "nah"]
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def create_synthetic_database(
+    path: str,
+    submissions: int = 1000,
+    comments_per_submission: int = 50,
+    reply_probability: float = 0.6,
+    seed: int = 0,
+) -> Engine:
+    """
+    Creates a SQLite database at path filled with synthetic submissions, comments
+    (with reply trees), breakdowns, summaries and OpenAI analyses.
+    """
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}", echo=False)
+    SQLModel.metadata.create_all(engine)
+
+    now = time.time()
+    comment_number = 0
+
+    with Session(engine) as session:
+        for id in range(1, submissions + 1):
+            submission_id = f"s{id:07d}"
+
+            submission = {
+                "id": id,
+                "submission_id": submission_id,
+                "title": f"AITA for {_sentence(rng, 8)}",
+                "selftext": _sentence(rng, rng.randint(100, 600)),
+                "created_utc": now - rng.randint(0, 3 * 365 * 86400),
+                "permalink": f"/r/AmItheAsshole/comments/{submission_id}/",
+                "score": rng.randint(0, 20000),
+            }
+            session.execute(insert(Submission.__table__), [submission])
+
+            counts = {verdict: 0 for verdict in VERDICTS}
+            comments = []
+            comment_ids = []
+
+            for _ in range(comments_per_submission):
+                comment_number += 1
+                comment_id = f"c{comment_number:08d}"
+
+                if len(comment_ids) > 0 and rng.random() < reply_probability:
+                    parent_id = f"t1_{rng.choice(comment_ids)}"
+                else:
+                    parent_id = f"t3_{submission_id}"
+
+                verdict = rng.choice(VERDICTS)
+                counts[verdict] += 1
+
+                comments.append(
+                    {
+                        "submission_id": submission_id,
+                        "message": f"{verdict.upper()} {_sentence(rng, rng.randint(5, 60))}",
+                        "comment_id": comment_id,
+                        "parent_id": parent_id,
+                        "created_utc": int(now - rng.randint(0, 86400)),
+                        "score": rng.randint(-50, 5000),
+                    }
+                )
+                comment_ids.append(comment_id)
+
+            if len(comments) > 0:
+                session.execute(insert(Comment.__table__), comments)
+
+            session.execute(
+                insert(Breakdown.__table__),
+                [
+                    {
+                        "id": id,
+                        **counts,
+                        **breakdown_metrics(**counts),
+                        "created_utc": submission["created_utc"],
+                    }
+                ],
+            )
+            emotion = {"anger": rng.randint(0, 50), "joy": rng.randint(0, 50)}
+            afinn = rng.uniform(-200, 200)
+            verdict_counts = {
+                f"{verdict}_count": count for verdict, count in counts.items()
+            }
+            session.execute(
+                insert(Summary.__table__),
+                [
+                    {
+                        "id": id,
+                        "afinn": afinn,
+                        "afinn_mean": afinn_mean(afinn, len(comments)),
+                        "emotion": emotion,
+                        "word_freq": {
+                            word: rng.randint(1, 40) for word in rng.sample(WORDS, 30)
+                        },
+                        "counts": verdict_counts,
+                        "no_of_replies": len(comments),
+                        **summary_metrics(emotion, verdict_counts),
+                    }
+                ],
+            )
+            session.execute(
+                insert(OpenAIAnalysis.__table__),
+                [{"id": id, "text": _sentence(rng, 80)}],
+            )
+
+        session.commit()
+
+    # The search indexes and trend buckets are built by the migrations, as on a deploy,
+    # the API only checks the schema version when it starts
+    Migrator(
+        engine,
+        backend_for(str(engine.url)),
+        lock_file=os.path.join(os.path.dirname(os.path.abspath(path)), "migrate.lock"),
+    ).upgrade()
+
+    return engine
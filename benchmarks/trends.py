@@ -0,0 +1,132 @@
+# Checks the trend buckets kept by the analytics stage against a full recompute, and
+# measures what they cost on a write and save on a read
+# Usage: python -m benchmarks.trends [submissions] [analyses]
+#
+# Analyses replace the summary and breakdown of random submissions, a quarter of them
+# submissions analysed for the first time, through the analytics stage's own write.
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete, func, select
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import create_synthetic_database
+from models.breakdown import Breakdown
+from models.summary import Summary
+
+
+def main(submissions: int = 20000, analyses: int = 2000) -> None:
+    rng = random.Random(2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("database")
+
+        engine = create_synthetic_database(
+            "database/benchmark.db", submissions=submissions, comments_per_submission=0
+        )
+        os.environ["DATABASE_URL"] = "sqlite:///database/benchmark.db"
+        os.environ["RATE_LIMIT"] = "100000000/minute"
+
+        # A quarter of the submissions are not analysed yet
+        with Session(engine) as session:
+            session.exec(delete(Summary).where(Summary.id > submissions * 3 // 4))
+            session.exec(delete(Breakdown).where(Breakdown.id > submissions * 3 // 4))
+            session.commit()
+
+        from main import app
+        from utils.analytics import AnalyticsProcessor
+        from utils.trends import TrendRollup
+
+        processor = AnalyticsProcessor()
+        rollup = TrendRollup(engine)
+
+        start = time.perf_counter()
+        buckets = rollup.rebuild()
+        rebuild_seconds = time.perf_counter() - start
+
+        # The migrations built the emotion buckets before the summaries were deleted
+        rollup.rebuild_emotions()
+
+        def analyse():
+            id = rng.randint(1, submissions)
+            counts = {
+                verdict: rng.randint(0, 40)
+                for verdict in ("nta", "yta", "esh", "info", "nah")
+            }
+
+            processor._store(
+                id,
+                Summary(
+                    id=id,
+                    afinn=rng.randint(-200, 200),
+                    emotion={},
+                    word_freq={},
+                    counts={},
+                ),
+                Breakdown(id=id, **counts),
+            )
+
+        store = measure(analyse, iterations=analyses)
+
+        differences = rollup.differences()
+
+        # The write before the rollup, two upserts in their own transactions
+        def analyse_without_rollup():
+            id = rng.randint(1, submissions)
+
+            processor.summary_api.upsert_summary(
+                id,
+                Summary(
+                    id=id,
+                    afinn=rng.randint(-200, 200),
+                    emotion={},
+                    word_freq={},
+                    counts={},
+                ),
+            )
+            processor.breakdown_api.upsert_breakdown(
+                id, Breakdown(id=id, nta=1, yta=1, esh=1, info=1, nah=1)
+            )
+
+        store_without_rollup = measure(analyse_without_rollup, iterations=analyses)
+
+        client = TestClient(app)
+        trends = measure(
+            lambda: client.get("/api/v2/trends?unit=week&limit=200").json()
+        )
+
+        # What a client aggregating every summary and breakdown itself would wait for
+        with Session(engine) as session:
+            recompute = measure(
+                lambda: session.exec(rollup._recompute("week")).all(), iterations=20
+            )
+            analysed = session.exec(select(func.count(Summary.id))).one()
+
+        engine.dispose()
+
+    print(
+        json.dumps(
+            {
+                "submissions": submissions,
+                "analysed": analysed,
+                "buckets": buckets,
+                "rebuild_seconds": rebuild_seconds,
+                "buckets_differing_from_recompute": len(differences),
+                "store_analysis": store,
+                "store_analysis_without_rollup": store_without_rollup,
+                "trends_endpoint": trends,
+                "recompute_weeks_in_sql": recompute,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
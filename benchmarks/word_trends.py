@@ -0,0 +1,184 @@
+# Checks the word and emotion buckets kept by the analytics stage against counts over every
+# comment, and compares /trends/words with merging the per submission top words
+# Usage: python -m benchmarks.word_trends [submissions] [comments per submission]
+#
+# Every submission is analysed, then a fifth of them get new comments and are analysed
+# again, as the crawler and analytics stage would. Needs the NLTK data of the worker image.
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session, func, select
+
+from benchmarks.stats import measure
+from benchmarks.synthetic import WORDS, create_synthetic_database
+from models.comment import Comment
+from models.submission import Submission
+from models.summary import Summary
+from models.trend import WordBucket
+
+DAY = 24 * 60 * 60
+
+
+def _exact_counts(engine, processor, backend) -> Counter:
+    """Word counts by (unit, bucket, word) over every comment of analysed submissions"""
+    counts = Counter()
+
+    with Session(engine) as session:
+        for unit in ("day", "month"):
+            rows = session.exec(
+                select(
+                    backend.time_bucket(Submission.created_utc, unit),
+                    Comment.message,
+                )
+                .join(Comment, Comment.submission_id == Submission.submission_id)
+                .join(Summary, Summary.id == Submission.id)
+            )
+
+            for bucket, message in rows:
+                for word in processor._words(message):
+                    counts[(unit, bucket, word)] += 1
+
+    return counts
+
+
+def main(submissions: int = 2000, comments: int = 50) -> None:
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("database")
+
+        engine = create_synthetic_database(
+            "database/benchmark.db",
+            submissions=submissions,
+            comments_per_submission=comments,
+        )
+        os.environ["DATABASE_URL"] = "sqlite:///database/benchmark.db"
+        os.environ["RATE_LIMIT"] = "100000000/minute"
+
+        from main import app
+        from utils.analytics import AnalyticsProcessor
+        from utils.trends import TrendRollup
+
+        processor = AnalyticsProcessor()
+        rollup = TrendRollup(engine)
+
+        start = time.perf_counter()
+
+        for id in range(1, submissions + 1):
+            processor._analyse_submission(processor._get_submission(id))
+
+        analyse_seconds = time.perf_counter() - start
+
+        again = rng.sample(range(1, submissions + 1), submissions // 5)
+
+        with Session(engine) as session:
+            session.execute(
+                insert(Comment.__table__),
+                [
+                    {
+                        "submission_id": f"s{id:07d}",
+                        "message": " ".join(rng.choice(WORDS) for _ in range(20)),
+                        "comment_id": f"n{id:07d}{number}",
+                        "parent_id": f"t3_s{id:07d}",
+                        "created_utc": int(time.time()),
+                        "score": 1,
+                    }
+                    for id in again
+                    for number in range(5)
+                ],
+            )
+            session.commit()
+
+        for id in again:
+            processor._analyse_submission(processor._get_submission(id))
+
+        exact = _exact_counts(engine, processor, rollup.backend)
+
+        with Session(engine) as session:
+            stored = Counter(
+                {
+                    (unit, bucket, word): count
+                    for unit, bucket, word, count in session.exec(
+                        select(
+                            WordBucket.unit,
+                            WordBucket.bucket,
+                            WordBucket.word,
+                            WordBucket.count,
+                        )
+                    )
+                }
+            )
+            word_rows = session.exec(select(func.count()).select_from(WordBucket)).one()
+
+        client = TestClient(app)
+        now = time.time()
+        ranges = {"month": (now - 30 * DAY, now), "year": (now - 365 * DAY, now)}
+        results = {}
+
+        for name, (start, end) in ranges.items():
+            url = f"/api/v2/trends/words?start={start}&end={end}&limit=10"
+            response = client.get(url).json()
+
+            # What clients could do before, merging the top 30 words of every submission
+            def merge_top_words():
+                merged = Counter()
+
+                with Session(engine) as session:
+                    for word_freq in session.exec(
+                        select(Summary.word_freq)
+                        .join(Submission, Submission.id == Summary.id)
+                        .where(
+                            Submission.created_utc >= start // DAY * DAY,
+                            Submission.created_utc < end // DAY * DAY + DAY,
+                        )
+                    ):
+                        merged.update(word_freq)
+
+                return merged.most_common(10)
+
+            merged = merge_top_words()
+
+            results[name] = {
+                "endpoint": measure(lambda: client.get(url).json(), iterations=100),
+                "merging_top_words": measure(merge_top_words, iterations=20),
+                "top_10_shared_with_merged": len(
+                    {entry["word"] for entry in response["words"]}
+                    & {word for word, _ in merged}
+                ),
+            }
+
+        differing_words = [
+            key for key in exact.keys() | stored.keys() if exact[key] != stored[key]
+        ]
+        differing_emotions = [
+            difference for difference in rollup.differences() if len(difference[0]) == 3
+        ]
+
+        engine.dispose()
+
+    print(
+        json.dumps(
+            {
+                "submissions": submissions,
+                "comments": submissions * comments,
+                "analyse_seconds": analyse_seconds,
+                "word_buckets_differing_from_comments": len(differing_words),
+                "emotion_buckets_differing_from_summaries": len(differing_emotions),
+                "word_bucket_rows": word_rows,
+                **results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -1,25 +1,15 @@
 import asyncio
-from utils.analytics import AnalyticsProcessor
-from utils.crawler import Crawler
-from utils.fts_processor import FTSProcessor
 
+from dotenv import find_dotenv, load_dotenv
 
-async def update_submissions() -> None:
-    print("Crawling")
-    crawler = Crawler(verbose=True)
-    await crawler.process()
-
-    ap = AnalyticsProcessor(verbose=True)
-    print("Processing submissions")
-    ap.process()
+from utils.scheduler import Scheduler
 
-    # oap = OpenAIProccessor(verbose=False)
-    # await oap.process()
 
-    fts = FTSProcessor()
-    fts.process()
+async def update_submissions() -> None:
+    # Kept for existing crontab entries, prefer python -m utils.scheduler run-once
+    await Scheduler(verbose=True).run_once()
 
 
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(update_submissions())
+    load_dotenv(find_dotenv())
+    asyncio.run(update_submissions())
@@ -0,0 +1,40 @@
+from typing import List
+
+from fastapi import HTTPException
+
+MAX_BATCH_SIZE = 100
+
+
+def parse_ids(ids: str, max_ids: int = MAX_BATCH_SIZE) -> List[int]:
+    """
+    Parses a comma separated list of ids, e.g. "1,2,3".
+
+    Duplicates are removed while keeping the order in which they were given.
+
+    Raises:
+        HTTPException: 422 if an id is not an integer or too many ids are given.
+    """
+    parsed: List[int] = []
+    seen = set()
+
+    for value in ids.split(","):
+        value = value.strip()
+
+        if value == "":
+            continue
+
+        try:
+            id = int(value)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid id {value}")
+
+        if id not in seen:
+            seen.add(id)
+            parsed.append(id)
+
+    if len(parsed) > max_ids:
+        raise HTTPException(
+            status_code=422, detail=f"At most {max_ids} ids can be requested"
+        )
+
+    return parsed
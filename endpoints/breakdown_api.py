@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import Engine
-from sqlmodel import Session
+from sqlmodel import Session, select
 
+from endpoints.batch import MAX_BATCH_SIZE, parse_ids
 from models.breakdown import Breakdown
 from models.message import Message
 
@@ -14,6 +18,8 @@ class BreakdownAPI:
         self._setup_breakdown_routes()
 
     def _setup_breakdown_routes(self) -> None:
+        oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
         self.router.add_api_route(
             "/breakdown/",
             self.create_breakdown,
@@ -21,8 +27,51 @@ class BreakdownAPI:
             tags=["Breakdown"],
             description="Creates a breakdown",
             status_code=status.HTTP_201_CREATED,
+            dependencies=[Depends(oauth2_scheme)],
+        )
+
+        self.router.add_api_route(
+            "/breakdown/{id}",
+            self.read_breakdown,
+            methods=["GET"],
+            tags=["Breakdown"],
+            description="Gets the verdict breakdown of a submission",
+            responses={status.HTTP_404_NOT_FOUND: {"model": Message}},
         )
-        ...
+
+        self.router.add_api_route(
+            "/breakdowns/batch",
+            self.read_breakdowns_by_ids,
+            methods=["GET"],
+            tags=["Breakdown"],
+            description=f"Gets up to {MAX_BATCH_SIZE} breakdowns by id in one request, keyed by id",
+            responses={status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message}},
+        )
+
+    def read_breakdown(self, id: int) -> Breakdown:
+        with Session(self.engine) as session:
+            breakdown = session.get(Breakdown, id)
+
+            if not breakdown:
+                raise HTTPException(status_code=404, detail="Breakdown not found")
+
+            return breakdown
+
+    def read_breakdowns_by_ids(
+        self,
+        ids: str = Query(description="Comma separated ids, e.g. 1,2,3"),
+    ) -> Dict[int, Breakdown]:
+        breakdown_ids = parse_ids(ids)
+
+        if len(breakdown_ids) == 0:
+            return {}
+
+        with Session(self.engine) as session:
+            breakdowns = session.exec(
+                select(Breakdown).where(Breakdown.id.in_(breakdown_ids))
+            ).all()
+
+            return {breakdown.id: breakdown for breakdown in breakdowns}
 
     def create_breakdown(self, breakdown: Breakdown):
         with Session(self.engine) as session:
@@ -1,37 +1,76 @@
-from typing import List
-from sqlalchemy import Engine
-from dotenv import dotenv_values
-from fastapi import APIRouter, HTTPException
-from sqlmodel import Session, SQLModel, create_engine, select
+import base64
+import json
+from collections import defaultdict
+from enum import Enum
+from typing import Dict, List
 
+import sqlalchemy
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Engine, and_, or_
+from sqlmodel import Session, asc, desc, select
+
+from endpoints.cache import TTLCache
+from endpoints.database_backend import backend_for
+from endpoints.search_query import parse_search_query
 from models.comment import Comment
+from models.comment_search import CommentHit, CommentSearchGroup
+from models.message import Message
+from models.submission import Submission
 
 
 class CommentAPI:
+    _STREAM_BATCH_SIZE = 500
+
     def __init__(self, engine: Engine):
         self.engine = engine
+        self.backend = backend_for(engine.url)
         self.router = APIRouter()
+        # Adjacency maps of recently requested threads keyed by submission id
+        self.thread_cache = TTLCache(maxsize=256, ttl=60 * 60)
         self._setup_comment_routes()
 
-    def _create_db_and_tables(self):
-        SQLModel.metadata.create_all(self.engine)
-
-    def _configure_database(self):
-        config = dotenv_values(".env")
-        self.sqlite_file_name = config.get("DATABASE_NAME")
-        self.sqlite_url = f"sqlite:///database//{self.sqlite_file_name}"
-
-        self.engine = create_engine(self.sqlite_url, echo=False)
-
     def _setup_comment_routes(self) -> None:
         self.router.add_api_route(
             "/comment/{id}", self.read_comment, methods=["GET"], tags=["Comment"]
         )
 
         self.router.add_api_route(
-            "/comments/search", self.search_comments, methods=["GET"], tags=["Comment"]
+            "/comments/search",
+            self.search_comments,
+            methods=["GET"],
+            tags=["Comment"],
+            description="Searches the comments of a submission, sorted and paginated with a cursor",
+        )
+
+        self.router.add_api_route(
+            "/comments/fuzzy-search",
+            self.fuzzy_search,
+            methods=["GET"],
+            tags=["Comment"],
+            description=(
+                "Searches the messages of every comment, ignoring case. Matches are grouped "
+                'by submission. Every term must match, e.g. wedding "best man" bridesm*'
+            ),
+        )
+
+        self.router.add_api_route(
+            "/comments/tree",
+            self.read_comment_tree,
+            methods=["GET"],
+            tags=["Comment"],
+            description="Gets the comments of a submission as a nested tree",
+            responses={404: {"model": Message}},
         )
 
+    class _CommentSortBy(str, Enum):
+        score = "score"
+        created_utc = "new"
+
+    class _OrderBy(str, Enum):
+        asc = "asc"
+        desc = "desc"
+
     def read_comment(self, id: int) -> Comment:
         with Session(self.engine) as session:
             comment = session.get(Comment, id)
@@ -39,12 +78,26 @@ class CommentAPI:
                 raise HTTPException(status_code=404, detail="Comment not found")
             return comment
 
+    def read_comments_by_submission_id(self, submission_id: str) -> List[Comment]:
+        """
+        Reads every comment of a submission. Used by the processors, which need the whole thread.
+        """
+        with Session(self.engine) as session:
+            statement = select(Comment).where(Comment.submission_id == (submission_id))
+            return session.exec(statement).all()
+
+    def read_comment_by_comment_id(self, comment_id: str) -> List[Comment]:
+        with Session(self.engine) as session:
+            statement = select(Comment).where(Comment.comment_id == (comment_id))
+            return session.exec(statement).all()
+
     def create_comment(self, comment: Comment) -> Comment:
         with Session(self.engine) as session:
             comment.id = None
             session.add(comment)
             session.commit()
             session.refresh(comment)
+            self.thread_cache.invalidate(comment.submission_id)
             return comment
 
     def upsert_comment(self, id: int, comment: Comment) -> Comment:
@@ -62,22 +115,312 @@ class CommentAPI:
             session.refresh(db_comment)
             return db_comment
 
+    def _encode_cursor(self, sort_by: str, order_by: str, value, id: int) -> str:
+        # The sort is part of the cursor, its value and id only make sense in that order
+        return base64.urlsafe_b64encode(
+            json.dumps([sort_by, order_by, value, id]).encode()
+        ).decode()
+
+    def _decode_cursor(self, cursor: str, sort_by: str, order_by: str):
+        try:
+            cursor_sort_by, cursor_order_by, value, id = json.loads(
+                base64.urlsafe_b64decode(cursor.encode())
+            )
+            id = int(id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=422, detail="Invalid cursor")
+
+        if (cursor_sort_by, cursor_order_by) != (sort_by, order_by):
+            raise HTTPException(
+                status_code=422,
+                detail="The cursor was returned for another sortBy or orderBy",
+            )
+
+        return value, id
+
     def search_comments(
         self,
+        response: Response,
         submission_id: str = None,
         comment_id: str = None,
+        top_level_only: bool = Query(alias="topLevelOnly", default=False),
+        sort_by: _CommentSortBy = Query(alias="sortBy", default=_CommentSortBy.score),
+        order_by: _OrderBy = Query(alias="orderBy", default=_OrderBy.desc),
+        cursor: str = Query(
+            default=None, description="The X-Next-Cursor header of the previous page"
+        ),
+        limit: int = Query(default=50, ge=1, le=500),
+        stream: bool = Query(
+            default=False,
+            description="Streams every matching comment as newline delimited JSON, ignores limit and cursor",
+        ),
     ) -> List[Comment]:
-        with Session(self.engine) as session:
-            if submission_id is not None:
-                statement = select(Comment).where(
-                    Comment.submission_id == (submission_id)
+        """
+        Searches the comments of a submission.
+
+        Pages are keyset paginated, the X-Next-Cursor header holds the cursor of the next page
+        and is absent on the last page.
+        """
+        if comment_id is not None:
+            return self.read_comment_by_comment_id(comment_id)
+
+        if submission_id is None:
+            return []
+
+        match sort_by:
+            case "score":
+                sort = Comment.score
+            case "new":
+                sort = Comment.created_utc
+            case _:
+                sort = Comment.score
+
+        match order_by:
+            case "desc":
+                order = desc
+            case "asc":
+                order = asc
+            case _:
+                order = desc
+
+        statement = select(Comment).where(Comment.submission_id == (submission_id))
+
+        if top_level_only:
+            # Reddit prefixes submission ids with t3_ and comment ids with t1_
+            statement = statement.where(Comment.parent_id.startswith("t3_"))
+
+        # Ties on the sort key are broken by id so the cursor is stable
+        statement = statement.order_by(order(sort), order(Comment.id))
+
+        if stream:
+            return StreamingResponse(
+                self._stream_comments(statement), media_type="application/x-ndjson"
+            )
+
+        if cursor is not None:
+            value, last_id = self._decode_cursor(cursor, sort_by.value, order_by.value)
+
+            if order == desc:
+                statement = statement.where(
+                    or_(sort < value, and_(sort == value, Comment.id < last_id))
+                )
+            else:
+                statement = statement.where(
+                    or_(sort > value, and_(sort == value, Comment.id > last_id))
                 )
-                results = session.exec(statement).all()
-                return results
 
-            if comment_id is not None:
-                statement = select(Comment).where(Comment.comment_id == (comment_id))
-                results = session.exec(statement).all()
-                return results
+        with Session(self.engine) as session:
+            # Fetch one extra row to know whether there is a next page
+            results = session.exec(statement.limit(limit + 1)).all()
+
+        if len(results) > limit:
+            results = results[:limit]
+            last = results[-1]
+            response.headers["X-Next-Cursor"] = self._encode_cursor(
+                sort_by.value, order_by.value, getattr(last, sort.key), last.id
+            )
+
+        response.headers["X-Limit"] = str(limit)
+
+        return results
+
+    def fuzzy_search(
+        self,
+        response: Response,
+        query: str = Query(max_length=100),
+        offset: int = Query(default=0, ge=0),
+        limit: int = Query(default=10, ge=1, le=50, description="Submissions per page"),
+        per_submission: int = Query(
+            alias="perSubmission",
+            default=3,
+            ge=1,
+            le=20,
+            description="Comments returned for each submission",
+        ),
+    ) -> List[CommentSearchGroup]:
+        """
+        Searches comments, grouped by submission.
+
+        Submissions are ordered by their best matching comment and paginated with offset
+        and limit. Each group holds the total number of matching comments and the best
+        perSubmission of them, with a snippet of each message.
+        """
+        response.headers["X-Limit"] = str(limit)
+        response.headers["X-Offset"] = str(offset)
+
+        terms = parse_search_query(query)
 
+        if len(terms) == 0:
             return []
+
+        with Session(self.engine) as session:
+            matches = self.backend.search_comments(
+                session, terms, offset, limit, per_submission
+            )
+
+            comments = session.exec(
+                select(Comment).where(Comment.id.in_([match[2] for match in matches]))
+            ).all()
+
+        by_id = {comment.id: comment for comment in comments}
+        groups: Dict[str, CommentSearchGroup] = {}
+
+        # Matches are ordered by submission, then by relevance
+        for submission_id, hits, id, relevance, snippet in matches:
+            if submission_id not in groups:
+                groups[submission_id] = CommentSearchGroup(
+                    submission_id=submission_id, hits=hits, rank=relevance, comments=[]
+                )
+
+            comment = by_id[id]
+            groups[submission_id].comments.append(
+                CommentHit(
+                    id=id,
+                    comment_id=comment.comment_id,
+                    parent_id=comment.parent_id,
+                    created_utc=comment.created_utc,
+                    score=comment.score,
+                    rank=relevance,
+                    snippet=snippet,
+                )
+            )
+
+        return list(groups.values())
+
+    def _stream_comments(self, statement):
+        with Session(self.engine) as session:
+            results = session.exec(
+                statement.execution_options(yield_per=self._STREAM_BATCH_SIZE)
+            )
+
+            for comment in results:
+                yield comment.model_dump_json() + "\n"
+
+    def _thread_version(self, session: Session, submission_id: str):
+        # The crawler only ever inserts comments, so the count and the highest id
+        # change exactly when a thread is touched, even from another process. Both are
+        # read from ix_comment_submission_id_score_id without touching the table.
+        return session.exec(
+            select(
+                sqlalchemy.func.count(Comment.id), sqlalchemy.func.max(Comment.id)
+            ).where(Comment.submission_id == (submission_id))
+        ).one()
+
+    def _read_thread(self, submission_id: str) -> Dict[str, List[Dict]]:
+        """
+        Returns the adjacency map of a thread, parent_id to its replies sorted by score.
+        """
+        with Session(self.engine) as session:
+            version = tuple(self._thread_version(session, submission_id))
+
+            # Only a thread without comments may belong to no submission
+            if version[0] == 0:
+                submission = session.exec(
+                    select(Submission.id).where(
+                        Submission.submission_id == submission_id
+                    )
+                ).first()
+
+                if submission is None:
+                    raise HTTPException(status_code=404, detail="Submission not found")
+
+            cached = self.thread_cache.get(submission_id)
+
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            comments = session.exec(
+                select(Comment)
+                .where(Comment.submission_id == (submission_id))
+                .order_by(desc(Comment.score), asc(Comment.id))
+            ).all()
+
+        replies = defaultdict(list)
+
+        # Comments are already sorted by score so every list of replies is as well
+        for comment in comments:
+            replies[comment.parent_id].append(comment.model_dump())
+
+        replies = dict(replies)
+        self.thread_cache.set(submission_id, (version, replies))
+
+        return replies
+
+    def _build_nodes(
+        self,
+        replies: Dict[str, List[Dict]],
+        parent_id: str,
+        depth: int,
+        max_depth: int,
+        max_children: int,
+        offset: int = 0,
+    ) -> Dict:
+        children = replies.get(parent_id, [])
+        page = children[offset : offset + max_children]
+
+        nodes = []
+
+        for child in page:
+            node = dict(child, depth=depth)
+            child_parent_id = f"t1_{child['comment_id']}"
+
+            if depth + 1 < max_depth:
+                node.update(
+                    self._build_nodes(
+                        replies, child_parent_id, depth + 1, max_depth, max_children
+                    )
+                )
+            elif child_parent_id in replies:
+                # Depth limit reached, leave a stub the client can expand later
+                node["replies"] = []
+                node["more"] = {
+                    "parent_id": child_parent_id,
+                    "offset": 0,
+                    "remaining": len(replies[child_parent_id]),
+                }
+            else:
+                node["replies"] = []
+
+            nodes.append(node)
+
+        result = {"replies": nodes}
+
+        remaining = len(children) - offset - len(page)
+
+        if remaining > 0:
+            result["more"] = {
+                "parent_id": parent_id,
+                "offset": offset + len(page),
+                "remaining": remaining,
+            }
+
+        return result
+
+    def read_comment_tree(
+        self,
+        submission_id: str,
+        parent_id: str = Query(
+            alias="parentId",
+            default=None,
+            description="Expands a more stub, defaults to the submission itself",
+        ),
+        offset: int = Query(default=0, ge=0),
+        max_depth: int = Query(alias="maxDepth", default=3, ge=1, le=10),
+        max_children: int = Query(alias="maxChildren", default=10, ge=1, le=100),
+    ) -> Dict:
+        """
+        Reads a thread as a nested tree.
+
+        Replies are sorted by score. Replies past max_children, or below max_depth, are replaced
+        by a "more" stub holding the parentId and offset to request next.
+        """
+        replies = self._read_thread(submission_id)
+
+        if parent_id is None:
+            parent_id = f"t3_{submission_id}"
+
+        tree = self._build_nodes(
+            replies, parent_id, 0, max_depth, max_children, offset=offset
+        )
+
+        return {"submission_id": submission_id, "parent_id": parent_id, **tree}
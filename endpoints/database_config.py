@@ -1,25 +1,58 @@
+import logging
 import os
 
 from dotenv import find_dotenv, load_dotenv
 from sqlalchemy import Engine
-from sqlmodel import SQLModel, create_engine
+
+from endpoints.database_backend import DatabaseBackend, backend_for
+from utils.migrator import Migrator
 
 
 class DatabaseConfig:
     _instance = None
 
     def _setup_database(self):
+        self.backend = backend_for(self.database_url(), **self._pool_options())
+        self.engine = self.backend.create_engine()
+
+        # Checking the version is one query. Upgrades are applied ahead of a deploy, with
+        # python -m utils.migrator upgrade or by the worker image, not by every API worker
+        # racing the others and blocking its startup for the length of the backfills.
+        migrator = Migrator(self.engine, self.backend)
+
+        if not migrator.is_current():
+            logging.getLogger("aita.database").warning(
+                "The schema is at version %s, %s migrations are pending, apply them "
+                "with python -m utils.migrator upgrade",
+                migrator.current_version(),
+                len(migrator.pending()),
+            )
+
+    @staticmethod
+    def database_url() -> str:
         load_dotenv(find_dotenv())
         sqlite_file_name = os.environ.get("DATABASE_NAME")
         sqlite_url = f"sqlite:///database//{sqlite_file_name}"
 
-        self.engine = create_engine(sqlite_url, echo=False)
+        # DATABASE_URL selects the backend, SQLite in database/ is the default
+        return os.environ.get("DATABASE_URL", sqlite_url)
+
+    def _pool_options(self) -> dict:
+        options = {}
 
-        SQLModel.metadata.create_all(self.engine)
+        if "DATABASE_POOL_SIZE" in os.environ:
+            options["pool_size"] = int(os.environ["DATABASE_POOL_SIZE"])
+        if "DATABASE_MAX_OVERFLOW" in os.environ:
+            options["max_overflow"] = int(os.environ["DATABASE_MAX_OVERFLOW"])
+
+        return options
 
     def get_engine(self) -> Engine:
         return self.engine
 
+    def get_backend(self) -> DatabaseBackend:
+        return self.backend
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseConfig, cls).__new__(cls)
@@ -0,0 +1,369 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import Engine, event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = Lock()
+
+    def _labels(self, labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+        pairs = [f'{key}="{value}"' for key, value in labels]
+
+        if extra:
+            pairs.append(extra)
+
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+
+
+class Counter(_Metric):
+    """
+    A counter that is either incremented directly or read from a callback when scraped.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, callback: Callable = None):
+        super().__init__(name, description)
+        self.values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.items())
+
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+
+        if self.callback is not None:
+            return lines + [f"{self.name} {self.callback()}"]
+
+        for labels, value in list(self.values.items()):
+            lines.append(f"{self.name}{self._labels(labels)} {value}")
+
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    A gauge that is either changed directly or read from a callback when scraped.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, callback: Callable = None):
+        super().__init__(name, description)
+        self.value = 0
+        self.callback = callback
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def render(self) -> List[str]:
+        value = self.callback() if self.callback is not None else self.value
+
+        return super().render() + [f"{self.name} {value}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = buckets
+        # labels -> [count per bucket (+Inf last), sum]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.items())
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            entry = self.values.get(key)
+
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+
+        for labels, (counts, total) in list(self.values.items()):
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket = self._labels(labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+
+            lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+
+        return lines
+
+
+class _RequestStats:
+    __slots__ = ("scope", "queries", "query_time")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.queries = 0
+        self.query_time = 0.0
+
+
+# Query statistics of the request being served, shared with the threadpool that runs sync routes
+_request_stats: ContextVar[Optional[_RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_route() -> Optional[str]:
+    """
+    Returns the route template of the request being served, if any.
+    """
+    stats = _request_stats.get()
+
+    if stats is None or stats.scope is None:
+        return None
+
+    route = stats.scope.get("route")
+
+    return route.path_format if route is not None else None
+
+
+class Metrics:
+    """
+    Process wide metrics exposed in the Prometheus text format on /metrics.
+
+    Every worker keeps its own metrics, scrape each worker or run a single worker per
+    container.
+    """
+
+    _instance = None
+
+    def _configure(self):
+        self.metrics: List[_Metric] = []
+        # Called before each scrape, to read what several metrics share once
+        self.collectors: List[Callable] = []
+        self.router = APIRouter()
+
+        self.request_duration = self.register(
+            Histogram(
+                "http_request_duration_seconds",
+                "Request latency by route template",
+            )
+        )
+        self.requests = self.register(
+            Counter("http_requests_total", "Requests by route template and status")
+        )
+        self.in_flight = self.register(
+            Gauge("http_requests_in_flight", "Requests currently being served")
+        )
+        self.queries_per_request = self.register(
+            Histogram(
+                "db_queries_per_request",
+                "SQL statements executed per request",
+                buckets=COUNT_BUCKETS,
+            )
+        )
+        self.query_time_per_request = self.register(
+            Histogram(
+                "db_query_duration_per_request_seconds",
+                "Time spent executing SQL per request",
+            )
+        )
+        self.query_duration = self.register(
+            Histogram("db_query_duration_seconds", "SQL statement latency")
+        )
+        self.pool_wait = self.register(
+            Histogram(
+                "db_pool_checkout_wait_seconds",
+                "Time spent waiting for a pooled connection",
+            )
+        )
+
+        self.router.add_api_route(
+            "/metrics",
+            self.read_metrics,
+            methods=["GET"],
+            tags=["Health"],
+            description="Prometheus metrics for the AITA API",
+            response_class=PlainTextResponse,
+        )
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+            cls._instance._configure()
+
+        return cls._instance
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def register_cache(self, name: str, cache) -> None:
+        """
+        Exposes the hits and misses of a TTLCache.
+        """
+        self.register(
+            Counter(
+                f"cache_{name}_hits_total",
+                f"Hits of the {name} cache",
+                lambda: cache.hits,
+            )
+        )
+        self.register(
+            Counter(
+                f"cache_{name}_misses_total",
+                f"Misses of the {name} cache",
+                lambda: cache.misses,
+            )
+        )
+
+    def register_rate_limiter(self, limiter) -> None:
+        self.register(
+            Counter(
+                "rate_limit_rejections_total",
+                "Requests rejected by the rate limiter",
+                lambda: limiter.rejections,
+            )
+        )
+
+    def register_work_queue(self, queue) -> None:
+        """
+        Exposes the number of items per state of a WorkQueue, counted once per scrape.
+        """
+        snapshot = {}
+        self.collectors.append(lambda: snapshot.update(depth=queue.depth()))
+
+        for status in ["pending", "in_flight", "done", "dead"]:
+            self.register(
+                Gauge(
+                    f"work_queue_{queue.name}_{status}",
+                    f"Items of the {queue.name} queue that are {status}",
+                    lambda status=status: getattr(snapshot["depth"], status),
+                )
+            )
+
+    def instrument_engine(self, engine: Engine) -> None:
+        """
+        Times every statement and pool checkout of the engine.
+        """
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+            conn.info.setdefault("query_start", []).append(perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+            elapsed = perf_counter() - conn.info["query_start"].pop()
+            self.query_duration.observe(elapsed)
+
+            stats = _request_stats.get()
+
+            if stats is not None:
+                stats.queries += 1
+                stats.query_time += elapsed
+
+        pool = engine.pool
+        connect = pool.connect
+
+        def timed_connect():
+            start = perf_counter()
+            connection = connect()
+            self.pool_wait.observe(perf_counter() - start)
+            return connection
+
+        pool.connect = timed_connect
+
+        self.register(
+            Gauge(
+                "db_pool_checked_out",
+                "Connections currently checked out of the pool",
+                lambda: pool.checkedout() if hasattr(pool, "checkedout") else 0,
+            )
+        )
+
+    def read_metrics(self) -> str:
+        lines = []
+
+        for collect in self.collectors:
+            collect()
+
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and SQL statistics per route template.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stats = _RequestStats(scope)
+        token = _request_stats.set(stats)
+        self.metrics.in_flight.inc()
+        start = perf_counter()
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self._record(scope, status[0], perf_counter() - start, stats)
+            _request_stats.reset(token)
+
+    def _record(self, scope, status: int, elapsed: float, stats: _RequestStats):
+        metrics = self.metrics
+        metrics.in_flight.dec()
+
+        # The router stores the matched route in the scope
+        route = scope.get("route")
+        template = route.path_format if route is not None else "unmatched"
+
+        metrics.request_duration.observe(elapsed, route=template)
+        metrics.requests.inc(route=template, method=scope["method"], status=status)
+        metrics.queries_per_request.observe(stats.queries, route=template)
+        metrics.query_time_per_request.observe(stats.query_time, route=template)
@@ -1,9 +1,11 @@
-import logging
+from typing import Dict
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import Engine
-from sqlmodel import Session
+from sqlmodel import Session, select
+
+from endpoints.batch import MAX_BATCH_SIZE, parse_ids
 from models.message import Message
 
 from models.openai_analytics import OpenAIAnalysis
@@ -19,6 +21,15 @@ class OpenAIInferenceAPI:
     def _setup_openai_analysis_routes(self) -> None:
         oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+        self.router.add_api_route(
+            "/openai-analyses/batch",
+            self.read_openai_inferences_by_ids,
+            methods=["GET"],
+            tags=["OpenAI"],
+            description=f"Obtains up to {MAX_BATCH_SIZE} OpenAI inferences by id in one request, keyed by id",
+            responses={status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message}},
+        )
+
         self.router.add_api_route(
             "/openai-analysis/{id}",
             self.read_openai_inference,
@@ -85,6 +96,22 @@ class OpenAIInferenceAPI:
                 )
             return open_ai_inference
 
+    def read_openai_inferences_by_ids(
+        self,
+        ids: str = Query(description="Comma separated ids, e.g. 1,2,3"),
+    ) -> Dict[int, OpenAIAnalysis]:
+        analysis_ids = parse_ids(ids)
+
+        if len(analysis_ids) == 0:
+            return {}
+
+        with Session(self.engine) as session:
+            analyses = session.exec(
+                select(OpenAIAnalysis).where(OpenAIAnalysis.id.in_(analysis_ids))
+            ).all()
+
+            return {analysis.id: analysis for analysis in analyses}
+
     def update_open_ai_analysis(
         self, id: int, open_ai_analysis: OpenAIAnalysis
     ) -> OpenAIAnalysis:
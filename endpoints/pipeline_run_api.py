@@ -0,0 +1,107 @@
+from typing import Dict, List
+
+from fastapi import APIRouter, HTTPException, Query, status
+from sqlalchemy import Engine
+from sqlmodel import Session, desc, select
+
+from models.message import Message
+from models.pipeline_run import PipelineRun
+from models.work_item import QueueDepth
+from utils.scheduler import Scheduler
+from utils.work_queue import ANALYTICS_QUEUE, OPENAI_QUEUE, WorkQueue
+
+
+class PipelineRunAPI:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.router = APIRouter()
+
+        self._setup_pipeline_run_routes()
+
+    def _setup_pipeline_run_routes(self) -> None:
+        self.router.add_api_route(
+            "/pipeline-runs",
+            self.read_pipeline_runs,
+            methods=["GET"],
+            tags=["Pipeline"],
+            description="Gets the timing and throughput of recent ingestion stages",
+        )
+
+        self.router.add_api_route(
+            "/pipeline/status",
+            self.read_pipeline_status,
+            methods=["GET"],
+            tags=["Pipeline"],
+            description="Gets the state of the ingestion scheduler and its latest run",
+        )
+
+        self.router.add_api_route(
+            "/pipeline/queues",
+            self.read_queue_depths,
+            methods=["GET"],
+            tags=["Pipeline"],
+            description="Gets the number of items per state of every work queue",
+        )
+
+        self.router.add_api_route(
+            "/pipeline-runs/{run_id}",
+            self.read_pipeline_run,
+            methods=["GET"],
+            tags=["Pipeline"],
+            description="Gets every stage of one ingestion run",
+            responses={status.HTTP_404_NOT_FOUND: {"model": Message}},
+        )
+
+    def read_pipeline_runs(
+        self,
+        stage: str = None,
+        offset: int = Query(default=0, ge=0),
+        limit: int = Query(default=20, ge=1, le=100),
+    ) -> List[PipelineRun]:
+        statement = select(PipelineRun)
+
+        if stage is not None:
+            statement = statement.where(PipelineRun.stage == stage)
+
+        with Session(self.engine) as session:
+            return session.exec(
+                statement.order_by(desc(PipelineRun.id)).offset(offset).limit(limit)
+            ).all()
+
+    def read_pipeline_status(self) -> Dict:
+        scheduler = Scheduler.read_status()
+
+        with Session(self.engine) as session:
+            latest = session.exec(
+                select(PipelineRun).order_by(desc(PipelineRun.id)).limit(1)
+            ).first()
+
+            stages = []
+
+            if latest is not None:
+                stages = session.exec(
+                    select(PipelineRun)
+                    .where(PipelineRun.run_id == latest.run_id)
+                    .order_by(PipelineRun.id)
+                ).all()
+
+        return {"scheduler": scheduler, "latest_run": stages}
+
+    def read_queue_depths(self) -> List[QueueDepth]:
+        return [
+            WorkQueue(name, self.engine).depth()
+            for name in [ANALYTICS_QUEUE, OPENAI_QUEUE]
+        ]
+
+    def read_pipeline_run(self, run_id: str) -> List[PipelineRun]:
+        with Session(self.engine) as session:
+            stages = session.exec(
+                select(PipelineRun)
+                .where(PipelineRun.run_id == run_id)
+                .order_by(PipelineRun.id)
+            ).all()
+
+            if len(stages) == 0:
+                raise HTTPException(status_code=404, detail="Pipeline run not found")
+
+            return stages
@@ -0,0 +1,234 @@
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from hashlib import blake2b
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import find_dotenv, load_dotenv
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from limits import parse
+from limits.storage import Storage, storage_from_string
+
+# Cost of a request per route, routes that are not listed cost 1
+ROUTE_COSTS: Dict[str, int] = {
+    "/submissions/fuzzy-search": 5,
+    "/submissions/top": 5,
+    "/submissions/random": 2,
+    "/submissions/batch": 2,
+    "/summaries/batch": 2,
+    "/breakdowns/batch": 2,
+    "/openai-analyses/batch": 2,
+    "/submission/{id}/detail": 2,
+    "/comments/search": 2,
+    "/comments/tree": 3,
+    "/health": 2,
+}
+
+
+class RateLimitExceeded(HTTPException):
+    def __init__(self, limit: str, reset: int):
+        super().__init__(status_code=429, detail=limit)
+        self.reset = reset
+
+
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        {"error": f"Rate limit exceeded: {exc.detail}"},
+        status_code=429,
+        headers={"Retry-After": str(max(0, exc.reset - int(time.time())))},
+    )
+
+
+class SharedMemoryStorage(Storage):
+    """
+    Fixed window counters in a memory mapped file, shared by every worker on the host.
+
+    Each slot holds the hash of a key, its expiry and its count. Keys are placed by open
+    addressing, when every probed slot is live the one closest to expiry is evicted.
+
+    URI: shm:///dev/shm/aita-rate-limit?slots=65536
+    """
+
+    STORAGE_SCHEME = ["shm"]
+
+    _SLOT = struct.Struct("<Qdq")
+    _PROBES = 8
+
+    def __init__(self, uri: Optional[str] = None, **options):
+        super().__init__(uri, **options)
+
+        parsed = urlparse(uri or "shm://")
+        query = parse_qs(parsed.query)
+
+        self.path = parsed.path or os.path.join(
+            tempfile.gettempdir(), "aita-rate-limit"
+        )
+        self.slots = int(query.get("slots", [65536])[0])
+
+        size = self.slots * self._SLOT.size
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+
+        self._map = mmap.mmap(self._fd, size)
+
+    def _hash(self, key: str) -> int:
+        # 0 marks an empty slot
+        return (
+            int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        )
+
+    def _find(self, key: str, now: float):
+        """
+        Returns the offset of the slot for key and its current (expiry, count).
+        """
+        key_hash = self._hash(key)
+        start = key_hash % self.slots
+        candidate = None
+        candidate_expiry = None
+
+        for probe in range(self._PROBES):
+            offset = ((start + probe) % self.slots) * self._SLOT.size
+            slot_hash, expiry, count = self._SLOT.unpack_from(self._map, offset)
+
+            if slot_hash == key_hash:
+                if expiry <= now:
+                    return offset, key_hash, 0.0, 0
+                return offset, key_hash, expiry, count
+
+            if slot_hash == 0 or expiry <= now:
+                expiry = 0.0
+
+            if candidate is None or expiry < candidate_expiry:
+                candidate = offset
+                candidate_expiry = expiry
+
+        return candidate, key_hash, 0.0, 0
+
+    @contextmanager
+    def _locked(self):
+        # flock is held per process, the thread lock serialises threads within one
+        with self.lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        now = time.time()
+
+        with self._locked():
+            offset, key_hash, current_expiry, count = self._find(key, now)
+
+            count += amount
+
+            if elastic_expiry or current_expiry == 0.0:
+                current_expiry = now + expiry
+
+            self._SLOT.pack_into(self._map, offset, key_hash, current_expiry, count)
+
+        return count
+
+    def get(self, key: str) -> int:
+        with self._locked():
+            return self._find(key, time.time())[3]
+
+    def get_expiry(self, key: str) -> int:
+        now = time.time()
+
+        with self._locked():
+            expiry = self._find(key, now)[2]
+
+        return int(expiry or now)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> Optional[int]:
+        now = time.time()
+        cleared = 0
+
+        with self._locked():
+            for slot in range(self.slots):
+                offset = slot * self._SLOT.size
+                slot_hash, expiry, _ = self._SLOT.unpack_from(self._map, offset)
+
+                if slot_hash != 0 and expiry > now:
+                    cleared += 1
+
+            self._map[:] = bytes(len(self._map))
+
+        return cleared
+
+    def clear(self, key: str) -> None:
+        with self._locked():
+            offset, key_hash, expiry, _ = self._find(key, time.time())
+
+            if expiry != 0.0:
+                self._SLOT.pack_into(self._map, offset, 0, 0.0, 0)
+
+
+class RateLimiter:
+    """
+    Cost weighted fixed window rate limiter, keyed on the remote address.
+
+    Every client gets one budget per window. Each request spends the cost of its route from
+    the budget, so expensive searches use it up faster than pings. It is used as a router
+    dependency so it runs after routing and the route cost is a dictionary lookup.
+    The storages block, on a file lock or on a Redis round trip, so the dependency is a
+    plain function that FastAPI runs in its threadpool, away from the event loop.
+
+    The storage is selected by URI: memory:// (per worker), shm:// (shared by the workers on
+    a host) or redis://host:port (anything speaking the Redis protocol, needs redis installed).
+    """
+
+    def __init__(
+        self,
+        limit: str = "120/minute",
+        storage_uri: str = "memory://",
+        route_costs: Dict[str, int] = ROUTE_COSTS,
+        prefix: str = "",
+    ):
+        self.limit = parse(limit)
+        self.storage = storage_from_string(storage_uri)
+        self.route_costs = {prefix + path: cost for path, cost in route_costs.items()}
+        self.rejections = 0
+
+        self._expiry = self.limit.get_expiry()
+        self._limit_header = str(self.limit.amount)
+
+    @classmethod
+    def from_env(cls, prefix: str = "") -> "RateLimiter":
+        load_dotenv(find_dotenv())
+
+        return cls(
+            limit=os.environ.get("RATE_LIMIT", "120/minute"),
+            storage_uri=os.environ.get("RATE_LIMIT_STORAGE_URI", "memory://"),
+            prefix=prefix,
+        )
+
+    def __call__(self, request: Request, response: Response) -> None:
+        route = request.scope.get("route")
+        cost = 1 if route is None else self.route_costs.get(route.path_format, 1)
+        client = request.client.host if request.client else "127.0.0.1"
+
+        key = self.limit.key_for(client)
+        count = self.storage.incr(key, self._expiry, amount=cost)
+
+        if count > self.limit.amount:
+            self.rejections += 1
+            raise RateLimitExceeded(str(self.limit), self.storage.get_expiry(key))
+
+        response.headers["X-RateLimit-Limit"] = self._limit_header
+        response.headers["X-RateLimit-Remaining"] = str(self.limit.amount - count)
@@ -0,0 +1,54 @@
+import re
+from typing import List, NamedTuple, Optional
+
+# Columns a term can be restricted to, e.g. title:wedding
+SEARCH_COLUMNS = ("title", "selftext")
+
+# An optional column filter followed by a quoted phrase or a bare term
+_TOKEN = re.compile(r'(?:(?P<column>\w+):)?(?:"(?P<phrase>[^"]*)"?|(?P<term>[^\s"]+))')
+_WORD = re.compile(r"[^\W_]+")
+
+
+class SearchTerm(NamedTuple):
+    """
+    A term of a search query. A term of several words is a phrase, its words must appear
+    next to each other in that order. A prefix term matches any word starting with its
+    last word.
+    """
+
+    words: tuple
+    column: Optional[str] = None
+    prefix: bool = False
+
+
+def parse_search_query(query: str) -> List[SearchTerm]:
+    """
+    Parses a search query into terms, all of which must match, e.g.
+
+        sister wedding          both words, anywhere
+        "my sister's wedding"   the phrase
+        wedd*                   words starting with wedd
+        title:wedding           wedding in the title
+        selftext:"best man"     the phrase in the selftext
+
+    Punctuation is ignored, a bare term such as step-mom is the phrase "step mom". A
+    filter on an unknown column is searched as words. Terms without words are dropped, so
+    no query can be malformed.
+    """
+    terms = []
+
+    for match in _TOKEN.finditer(query):
+        column = match["column"]
+        text = match["phrase"] if match["phrase"] is not None else match["term"]
+        prefix = match["term"] is not None and match["term"].endswith("*")
+
+        if column is not None and column.lower() not in SEARCH_COLUMNS:
+            text = f"{column} {text}"
+            column = None
+
+        words = tuple(_WORD.findall(text))
+
+        if len(words) > 0:
+            terms.append(SearchTerm(words, column and column.lower(), prefix))
+
+    return terms
@@ -0,0 +1,112 @@
+import logging
+from collections import deque
+from datetime import datetime
+from time import perf_counter
+from typing import List
+
+from fastapi import APIRouter, Depends, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import Engine, event
+
+from endpoints.database_backend import backend_for
+from endpoints.metrics import current_route
+from models.message import Message
+from models.slow_query import SlowQuery
+
+
+class SlowQueryLog:
+    """
+    Keeps the statements that ran longer than a threshold, with their parameters, the
+    endpoint that ran them and their query plan, in a fixed size ring buffer.
+    """
+
+    def __init__(self, engine: Engine, threshold_ms: float = 100, size: int = 200):
+        self.engine = engine
+        self.backend = backend_for(engine.url)
+        self.threshold = threshold_ms / 1000
+        self.queries = deque(maxlen=size)
+        self.router = APIRouter()
+        self.logger = logging.getLogger("aita.slow_query")
+
+        self._install()
+        self._setup_slow_query_routes()
+
+    def _setup_slow_query_routes(self) -> None:
+        oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+        self.router.add_api_route(
+            "/admin/slow-queries",
+            self.read_slow_queries,
+            methods=["GET"],
+            tags=["Admin"],
+            description="Gets the most recent slow queries",
+            dependencies=[Depends(oauth2_scheme)],
+            responses={status.HTTP_401_UNAUTHORIZED: {"model": Message}},
+        )
+
+        self.router.add_api_route(
+            "/admin/slow-queries",
+            self.delete_slow_queries,
+            methods=["DELETE"],
+            tags=["Admin"],
+            description="Clears the slow query log",
+            dependencies=[Depends(oauth2_scheme)],
+            responses={status.HTTP_401_UNAUTHORIZED: {"model": Message}},
+        )
+
+    def _install(self) -> None:
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+            conn.info.setdefault("slow_query_start", []).append(perf_counter())
+
+        @event.listens_for(self.engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+            elapsed = perf_counter() - conn.info["slow_query_start"].pop()
+
+            if elapsed >= self.threshold:
+                self._record(cursor, statement, parameters, elapsed, many)
+
+    def _explain(self, cursor, statement: str, parameters, many: bool) -> List[str]:
+        if many:
+            return []
+
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return []
+
+        try:
+            return self.backend.explain(cursor, statement, parameters)
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+
+    def _record(self, cursor, statement, parameters, elapsed: float, many: bool):
+        plan = self._explain(cursor, statement, parameters, many)
+        full_scan = any(self.backend.is_full_scan(line) for line in plan)
+
+        query = SlowQuery(
+            statement=" ".join(statement.split()),
+            parameters=repr(parameters),
+            duration_ms=elapsed * 1000,
+            endpoint=current_route(),
+            plan=plan,
+            full_scan=full_scan,
+            timestamp=datetime.now(),
+        )
+
+        self.queries.append(query)
+
+        self.logger.warning(
+            "Slow query %.1fms%s on %s: %s %s",
+            query.duration_ms,
+            " (full table scan)" if full_scan else "",
+            query.endpoint,
+            query.statement,
+            query.parameters,
+        )
+
+    def read_slow_queries(self) -> List[SlowQuery]:
+        return list(reversed(self.queries))
+
+    def delete_slow_queries(self) -> Message:
+        self.queries.clear()
+
+        return Message(details="Ok")
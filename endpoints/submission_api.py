@@ -1,7 +1,8 @@
-import re
+import calendar
+from datetime import datetime
 from enum import Enum
 from random import randrange
-from typing import List
+from typing import Dict, List, Optional
 
 import sqlalchemy
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
@@ -9,13 +10,27 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import Engine
 from sqlmodel import Session, asc, desc, select
 
+from endpoints.batch import MAX_BATCH_SIZE, parse_ids
+from endpoints.database_backend import backend_for
+from endpoints.search_query import parse_search_query
+from endpoints.title_index import TitleIndex
+from models.breakdown import SORT_COLUMNS, Breakdown
+from models.comment_sentiment import CommentSentiment, SubmissionSentiment
 from models.message import Message
+from models.similar_submission import SimilarSubmission, SimilarSubmissionRead
 from models.submission import Submission
+from models.summary import EMOTIONS
+from models.title_suggestion import TitleSuggestion
 
 
 class SubmissionAPI:
+    # Seconds an autocomplete request waits for the title index to load, before a 503
+    _TITLE_INDEX_WAIT = 5
+
     def __init__(self, engine: Engine):
         self.engine = engine
+        self.backend = backend_for(engine.url)
+        self.title_index = TitleIndex(engine)
         self.router = APIRouter()
 
         self._setup_submission_routes()
@@ -87,6 +102,34 @@ class SubmissionAPI:
             responses={status.HTTP_404_NOT_FOUND: {"model": Message}},
         )
 
+        self.router.add_api_route(
+            "/submission/{id}/similar",
+            self.read_similar_submissions,
+            methods=["GET"],
+            tags=["Submission"],
+            description="Gets the submissions most similar to a submission, most similar first",
+            responses={status.HTTP_404_NOT_FOUND: {"model": Message}},
+        )
+
+        self.router.add_api_route(
+            "/submission/{id}/sentiment",
+            self.read_submission_sentiment,
+            methods=["GET"],
+            tags=["Submission"],
+            description="Gets the mean, median and distribution of the AFINN scores of the "
+            "comments of a submission, and their NRC emotion counts",
+            responses={status.HTTP_404_NOT_FOUND: {"model": Message}},
+        )
+
+        self.router.add_api_route(
+            "/submissions/batch",
+            self.read_submissions_by_ids,
+            methods=["GET"],
+            tags=["Submission"],
+            description=f"Gets up to {MAX_BATCH_SIZE} submissions by id in one request, keyed by id",
+            responses={status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message}},
+        )
+
         self.router.add_api_route(
             "/submisssions/search",
             self.search_submission,
@@ -108,7 +151,31 @@ class SubmissionAPI:
             self.fuzzy_search,
             methods=["GET"],
             tags=["Submission"],
-            description="Performs fuzzy seach on Id and Title",
+            description=(
+                "Searches titles and selftext, ignoring case. Every term must match, "
+                'e.g. sister "best man" wedd* title:wedding selftext:"ruined"'
+            ),
+        )
+
+        self.router.add_api_route(
+            "/submissions/autocomplete",
+            self.autocomplete,
+            methods=["GET"],
+            tags=["Submission"],
+            description=(
+                "Suggests titles starting with the query, best scored first. Served from "
+                "memory, for search boxes querying on every keystroke"
+            ),
+            responses={
+                503: {
+                    "details": "Title index is loading",
+                    "content": {
+                        "application/json": {
+                            "example": {"details": "Title index is loading"},
+                        }
+                    },
+                }
+            },
         )
 
         self.router.add_api_route(
@@ -135,6 +202,13 @@ class SubmissionAPI:
         score = "score"
         title = "title"
         created_utc = "new"
+        nta = "nta"
+        yta = "yta"
+        esh = "esh"
+        info = "info"
+        nah = "nah"
+        verdicts = "verdicts"
+        controversy = "controversy"
 
     class _OrderBy(str, Enum):
         asc = "asc"
@@ -147,6 +221,117 @@ class SubmissionAPI:
                 raise HTTPException(status_code=404, detail="Submission not found")
             return submission
 
+    def read_similar_submissions(
+        self, id: int, limit: int = Query(default=10, ge=1, le=10)
+    ) -> List[SimilarSubmissionRead]:
+        """
+        Neighbors are precomputed by the similarity stage of the ingestion pipeline, new
+        submissions have none until it ran.
+        """
+        with Session(self.engine) as session:
+            similar = session.exec(
+                select(
+                    Submission.id,
+                    Submission.title,
+                    Submission.permalink,
+                    Submission.score,
+                    SimilarSubmission.similarity,
+                )
+                .join(Submission, Submission.id == SimilarSubmission.similar_id)
+                .where(SimilarSubmission.submission_id == id)
+                .order_by(SimilarSubmission.rank)
+                .limit(limit)
+            ).all()
+
+            if len(similar) == 0 and session.get(Submission, id) is None:
+                raise HTTPException(status_code=404, detail="Submission not found")
+
+            return [SimilarSubmissionRead(**row._mapping) for row in similar]
+
+    def read_submission_sentiment(self, id: int) -> SubmissionSentiment:
+        """
+        Comments are scored by the analytics stage, those crawled since it last analysed the
+        submission are left out. Aggregates are read from the index on the submission id
+        and score.
+        """
+        of_submission = CommentSentiment.submission_id == id
+        score_bin = sqlalchemy.case(
+            (CommentSentiment.afinn <= -5, "very_negative"),
+            (CommentSentiment.afinn < 0, "negative"),
+            (CommentSentiment.afinn == 0, "neutral"),
+            (CommentSentiment.afinn < 5, "positive"),
+            else_="very_positive",
+        )
+
+        with Session(self.engine) as session:
+            if session.get(Submission, id) is None:
+                raise HTTPException(status_code=404, detail="Submission not found")
+
+            comments, mean = session.exec(
+                select(
+                    sqlalchemy.func.count(), sqlalchemy.func.avg(CommentSentiment.afinn)
+                ).where(of_submission)
+            ).one()
+
+            # The middle score, or the mean of the two middle ones
+            middle = session.exec(
+                select(CommentSentiment.afinn)
+                .where(of_submission)
+                .order_by(CommentSentiment.afinn)
+                .offset(max(comments - 1, 0) // 2)
+                .limit(2 - comments % 2)
+            ).all()
+
+            distribution = session.exec(
+                select(score_bin, sqlalchemy.func.count())
+                .where(of_submission)
+                .group_by(score_bin)
+            ).all()
+
+            emotions = session.exec(
+                select(
+                    *(
+                        sqlalchemy.func.coalesce(
+                            sqlalchemy.func.sum(getattr(CommentSentiment, emotion)), 0
+                        )
+                        for emotion in EMOTIONS
+                    )
+                ).where(of_submission)
+            ).one()
+
+        return SubmissionSentiment(
+            comments=comments,
+            afinn_mean=mean,
+            afinn_median=sum(middle) / len(middle) if len(middle) > 0 else None,
+            distribution=dict(distribution),
+            emotions={
+                emotion: total
+                for emotion, total in zip(EMOTIONS, emotions)
+                if total > 0
+            },
+        )
+
+    def read_submissions_by_ids(
+        self,
+        ids: str = Query(description="Comma separated ids, e.g. 1,2,3"),
+    ) -> Dict[int, Submission]:
+        """
+        Reads many submissions with a single IN query.
+
+        Ids that do not exist are left out of the result.
+        """
+        submission_ids = parse_ids(ids)
+
+        if len(submission_ids) == 0:
+            return {}
+
+        with Session(self.engine) as session:
+            submissions = session.exec(
+                select(Submission).where(Submission.id.in_(submission_ids))
+            ).all()
+
+            return {submission.id: submission for submission in submissions}
+
     def read_submissions(
         self,
         request: Request,
@@ -157,6 +342,12 @@ class SubmissionAPI:
             alias="sortBy", default=_SubmissionSortBy.id
         ),
         order_by: _OrderBy = Query(alias="orderBy", default=_OrderBy.desc),
+        start: Optional[float] = Query(
+            default=None, description="Unix timestamp, submissions created from it"
+        ),
+        end: Optional[float] = Query(
+            default=None, description="Unix timestamp, submissions created before it"
+        ),
     ) -> List[Submission]:
         """
         Reads the submissions in the database.
@@ -164,7 +355,10 @@ class SubmissionAPI:
         Args:
             offset (int): The offset
             limit (int): The limit
-            sort_by (SubmissionSortBy or str): The sort by
+            sort_by (SubmissionSortBy or str): The sort by, verdict counts, total verdicts
+                and controversy only return analysed submissions
+            start (float): Only submissions created from this time
+            end (float): Only submissions created before this time
 
         Returns:
             List[Submission]: Returns a list of submission. An empty list would  be returned if no results are found.
@@ -172,6 +366,12 @@ class SubmissionAPI:
             Headers: X-Limit - The Limit used
 
         """
+        statement = select(Submission)
+        counted = Submission
+        created_utc = Submission.created_utc
+        filtered = created_utc
+        ties = [Submission.id]
+
         match sort_by:
             case "id":
                 sort = Submission.id
@@ -179,9 +379,32 @@ class SubmissionAPI:
                 sort = Submission.title
             case "score":
                 sort = Submission.score
+            case "new":
+                sort = Submission.created_utc
+            case _ if sort_by.value in SORT_COLUMNS:
+                # Read in order from the breakdown index of the column and created_utc,
+                # the range filtered in the index. Adding 0 keeps the range from being
+                # looked up through the index of another column, which then needs a sort.
+                sort = getattr(Breakdown, sort_by.value)
+                statement = statement.join(Breakdown, Breakdown.id == Submission.id)
+                counted = Breakdown
+                created_utc = Breakdown.created_utc
+                filtered = Breakdown.created_utc + 0
+                ties = [Breakdown.created_utc, Breakdown.id]
             case _:
                 sort = Submission.id
 
+        conditions = []
+        count_conditions = []
+
+        if start is not None:
+            conditions.append(filtered >= start)
+            count_conditions.append(created_utc >= start)
+
+        if end is not None:
+            conditions.append(filtered < end)
+            count_conditions.append(created_utc < end)
+
         match order_by:
             case "desc":
                 order = desc
@@ -192,11 +415,14 @@ class SubmissionAPI:
 
         with Session(self.engine) as session:
             submission_count = session.exec(
-                select(sqlalchemy.func.count(Submission.id))
+                select(sqlalchemy.func.count(counted.id)).where(*count_conditions)
             ).one()
 
             submissions = session.exec(
-                select(Submission).offset(offset).limit(limit).order_by(order(sort))
+                statement.where(*conditions)
+                .offset(offset)
+                .limit(limit)
+                .order_by(order(sort), *(order(tie) for tie in ties))
             ).all()
 
             response.headers["X-Limit"] = str(limit)
@@ -242,41 +468,50 @@ class SubmissionAPI:
 
     def fuzzy_search(
         self,
-        query: str = Query(default="query", max_length=50),
+        query: str = Query(default="query", max_length=100),
         limit: int = Query(default=20, le=100),
     ) -> List[Submission]:
-        if len(query) == 0:
-            return []
-
-        cleaned_query = re.sub("\\W+", "", query)
-
-        try:
-            with Session(self.engine) as session:
-                statement = """
-                    SELECT id FROM submission_fts WHERE submission_fts MATCH '{query}' ORDER BY RANK LIMIT {limit}
-                """.format(
-                    query=cleaned_query, limit=limit
-                )
+        terms = parse_search_query(query)
 
-                sqlText = sqlalchemy.sql.text(statement)
-
-                resultSet = session.exec(sqlText).all()
+        if len(terms) == 0:
+            return []
 
-                results = []
+        with Session(self.engine) as session:
+            ids = self.backend.search_submission_ids(session, terms, limit)
 
-                for record in resultSet:
-                    res = dict()
-                    res["id"] = record[0]
-                    results.append(res)
+            submissions = session.exec(
+                select(Submission).where(Submission.id.in_(ids))
+            ).all()
 
-                ids = [result["id"] for result in results]
+            # Best match first
+            by_id = {submission.id: submission for submission in submissions}
 
-                matched_submissions = [self.read_submission(id) for id in ids]
+            return [by_id[id] for id in ids if id in by_id]
 
-                return matched_submissions
+    def autocomplete(
+        self,
+        query: str = Query(max_length=100),
+        limit: int = Query(default=10, ge=1, le=TitleIndex.MAX_LIMIT),
+    ) -> List[TitleSuggestion]:
+        """
+        Case, punctuation and a leading "AITA for" or "WIBTA if" are ignored, "aita for
+        not" suggests "AITA for not inviting ...". A query ending in a space only matches
+        whole words.
+        """
+        # The index is started with the app, a process serving without it starts it here
+        self.title_index.start()
+
+        if not self.title_index.wait(self._TITLE_INDEX_WAIT):
+            raise HTTPException(
+                status_code=503,
+                detail="Title index is loading",
+                headers={"Retry-After": "10"},
+            )
 
-        except Exception:
-            return []
+        return [
+            TitleSuggestion(id=id, title=title, score=score)
+            for score, id, title in self.title_index.search(query, limit)
+        ]
 
     def search_submission(
         self,
@@ -364,8 +599,7 @@ class SubmissionAPI:
         year_2023 = "2023"
         year_2024 = "2024"
 
-    # Raw SQL Alchemy Query for this. This will deprecate the use of the top.json static implementation
-    # This query could be rewritten to be more database agnostic.
+    # This will deprecate the use of the top.json static implementation
     def top_submission(
         self, year: _YearSelection, month: _MonthSelection, type: _CountTypeSelection
     ) -> List[Submission]:
@@ -399,56 +633,29 @@ class SubmissionAPI:
             case _:
                 selectedMonth = "01"
 
-        with Session(self.engine) as session:
-            if selectedMonth == "allMonths":
-                statement = """
-                    SELECT s.id, s.submission_id, s.title, s.selftext, s.created_utc, s.permalink, s.score FROM (
-                    SELECT s.id, s.submission_id, s.title, s.selftext, s.created_utc, s.permalink, s.score,
-                    strftime('%Y',DATETIME(ROUND(created_utc), 'unixepoch')) AS sub_year,
-                    MAX({type}) AS {type}
-                    FROM submission s
-                    INNER JOIN breakdown ON s.id = breakdown.id
-                    WHERE sub_year = "{year}"
-                    GROUP BY sub_year
-                    ORDER BY sub_year) s
-                """.format(
-                    year=year, type=type
-                )
-            else:
-                statement = """
-                    SELECT s.id, s.submission_id, s.title, s.selftext, s.created_utc, s.permalink, s.score FROM (
-                    SELECT s.id, s.submission_id, s.title, s.selftext, s.created_utc, s.permalink, s.score,
-                    strftime('%m',DATETIME(ROUND(created_utc), 'unixepoch')) AS sub_month,
-                    strftime('%Y',DATETIME(ROUND(created_utc), 'unixepoch')) AS sub_year,
-                    MAX({type}) AS {type}
-                    FROM submission s
-                    INNER JOIN breakdown ON s.id = breakdown.id
-                    WHERE sub_year = "{year}"
-                    AND sub_month = "{month}"
-                    GROUP BY sub_month, sub_year
-                    ORDER BY sub_month, sub_year) s
-                """.format(
-                    year=year, month=selectedMonth, type=type
-                )
-
-            sqlText = sqlalchemy.sql.text(statement)
+        # Ranges on created_utc rather than formatted dates keep this portable and let it
+        # use an index
+        if selectedMonth == "allMonths":
+            start = datetime(int(year), 1, 1)
+            end = datetime(int(year) + 1, 1, 1)
+        else:
+            month_number = int(selectedMonth)
+            start = datetime(int(year), month_number, 1)
+            end = datetime(int(year) + month_number // 12, month_number % 12 + 1, 1)
 
-            resultSet = session.exec(sqlText).all()
+        count = getattr(Breakdown, type)
 
-            results = []
-
-            for record in resultSet:
-                res = dict()
-                res["id"] = record[0]
-                res["submission_id"] = record[1]
-                res["title"] = record[2]
-                res["selftext"] = record[3]
-                res["created_utc"] = record[4]
-                res["permalink"] = record[5]
-                res["score"] = record[6]
-                results.append(res)
+        with Session(self.engine) as session:
+            statement = (
+                select(Submission)
+                .join(Breakdown, Breakdown.id == Submission.id)
+                .where(Submission.created_utc >= calendar.timegm(start.timetuple()))
+                .where(Submission.created_utc < calendar.timegm(end.timetuple()))
+                .order_by(desc(count))
+                .limit(1)
+            )
 
-            return results
+            return session.exec(statement).all()
 
     def upsert_submission(self, id: int, submission: Submission) -> Submission:
         with Session(self.engine) as session:
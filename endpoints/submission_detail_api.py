@@ -0,0 +1,195 @@
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from sqlalchemy import Engine, Select, bindparam, func
+from sqlmodel import Session, SQLModel, desc, select
+
+from endpoints.cache import TTLCache
+from models.breakdown import Breakdown
+from models.comment import Comment
+from models.message import Message
+from models.openai_analytics import OpenAIAnalysis
+from models.submission import Submission
+from models.submission_detail import SubmissionDetail
+from models.summary import Summary
+
+
+class SubmissionDetailAPI:
+    _CACHE_TTL = 60
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.router = APIRouter()
+        self.cache = TTLCache(maxsize=2048, ttl=self._CACHE_TTL)
+
+        # The pipeline writes from another process, entries cannot be dropped as rows
+        # change. A cached detail is served while its version is unchanged instead. Built
+        # once, building it took as long as running it.
+        self._version_query = self._version_statement()
+
+        self._setup_submission_detail_routes()
+
+    def _setup_submission_detail_routes(self) -> None:
+        self.router.add_api_route(
+            "/submission/{id}/detail",
+            self.read_submission_detail,
+            methods=["GET"],
+            tags=["Submission"],
+            description="Gets a submission with its breakdown, summary, OpenAI analysis and top comments",
+            response_model_exclude_none=True,
+            responses={
+                status.HTTP_404_NOT_FOUND: {"model": Message},
+                status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message},
+            },
+        )
+
+    class _Part(str, Enum):
+        submission = "submission"
+        breakdown = "breakdown"
+        summary = "summary"
+        openai_analysis = "openai_analysis"
+        comments = "comments"
+
+    # Fields that are large enough to be worth skipping
+    _EXCLUDABLE_FIELDS = {"selftext", "word_freq", "emotion", "message"}
+
+    def _parse_list(self, value: str, allowed: set, name: str) -> List[str]:
+        values = [v.strip() for v in value.split(",") if v.strip() != ""]
+
+        for v in values:
+            if v not in allowed:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Invalid {name} {v}, expected one of {', '.join(sorted(allowed))}",
+                )
+
+        return sorted(set(values))
+
+    def _dump(self, model: Optional[SQLModel], exclude: List[str]) -> Optional[Dict]:
+        if model is None:
+            return None
+
+        return model.model_dump(exclude=set(exclude))
+
+    def _version_statement(self) -> Select:
+        """
+        Returns the statement reading the values that change as a submission, its analyses
+        or its comments are written. The large columns are only compared by length, an
+        edit that keeps them as long is served from the cache until it expires.
+        """
+        # Comments are only ever inserted, as for the comment tree
+        comments = select(Comment.id).where(
+            Comment.submission_id == Submission.submission_id
+        )
+
+        return (
+            select(
+                Submission.title,
+                Submission.score,
+                func.length(Submission.selftext),
+                Breakdown.nta,
+                Breakdown.yta,
+                Breakdown.esh,
+                Breakdown.info,
+                Breakdown.nah,
+                Summary.afinn,
+                Summary.no_of_replies,
+                func.length(OpenAIAnalysis.text),
+                comments.with_only_columns(func.count(Comment.id)).scalar_subquery(),
+                comments.with_only_columns(func.max(Comment.id)).scalar_subquery(),
+            )
+            .outerjoin(Breakdown, Breakdown.id == Submission.id)
+            .outerjoin(Summary, Summary.id == Submission.id)
+            .outerjoin(OpenAIAnalysis, OpenAIAnalysis.id == Submission.id)
+            .where(Submission.id == bindparam("id"))
+        )
+
+    def _version(self, id: int) -> Optional[Tuple]:
+        """Returns the version of a detail, or None if there is no such submission"""
+        with self.engine.connect() as connection:
+            row = connection.execute(self._version_query, {"id": id}).first()
+
+        return None if row is None else tuple(row)
+
+    def read_submission_detail(
+        self,
+        id: int,
+        response: Response,
+        include: str = Query(
+            default="submission,breakdown,summary,openai_analysis,comments",
+            description="Comma separated parts to return",
+        ),
+        exclude: str = Query(
+            default="",
+            description="Comma separated heavy fields to skip, e.g. selftext,word_freq",
+        ),
+        comments_limit: int = Query(alias="commentsLimit", default=10, ge=0, le=100),
+    ) -> SubmissionDetail:
+        parts = self._parse_list(include, {p.value for p in self._Part}, "part")
+        excluded = self._parse_list(exclude, self._EXCLUDABLE_FIELDS, "field")
+
+        response.headers["Cache-Control"] = f"public, max-age={self._CACHE_TTL}"
+
+        version = self._version(id)
+
+        if version is None:
+            raise HTTPException(status_code=404, detail="Submission not found")
+
+        key = (id, tuple(parts), tuple(excluded), comments_limit)
+        cached = self.cache.get(key)
+
+        if cached is not None and cached[0] == version:
+            response.headers["X-Cache"] = "HIT"
+            return cached[1]
+
+        response.headers["X-Cache"] = "MISS"
+
+        detail = self._load_submission_detail(id, parts, excluded, comments_limit)
+        self.cache.set(key, (version, detail))
+
+        return detail
+
+    def _load_submission_detail(
+        self, id: int, parts: List[str], excluded: List[str], comments_limit: int
+    ) -> SubmissionDetail:
+        with Session(self.engine) as session:
+            # The breakdown, summary and analysis share the submission's id,
+            # so a single outer join fetches all four rows
+            statement = (
+                select(Submission, Breakdown, Summary, OpenAIAnalysis)
+                .outerjoin(Breakdown, Breakdown.id == Submission.id)
+                .outerjoin(Summary, Summary.id == Submission.id)
+                .outerjoin(OpenAIAnalysis, OpenAIAnalysis.id == Submission.id)
+                .where(Submission.id == id)
+            )
+
+            row = session.exec(statement).first()
+
+            if row is None:
+                raise HTTPException(status_code=404, detail="Submission not found")
+
+            submission, breakdown, summary, openai_analysis = row
+
+            detail = SubmissionDetail(id=id)
+
+            if "submission" in parts:
+                detail.submission = self._dump(submission, excluded)
+            if "breakdown" in parts:
+                detail.breakdown = self._dump(breakdown, excluded)
+            if "summary" in parts:
+                detail.summary = self._dump(summary, excluded)
+            if "openai_analysis" in parts:
+                detail.openai_analysis = self._dump(openai_analysis, excluded)
+
+            if "comments" in parts:
+                comments = session.exec(
+                    select(Comment)
+                    .where(Comment.submission_id == submission.submission_id)
+                    .order_by(desc(Comment.score))
+                    .limit(comments_limit)
+                ).all()
+
+                detail.comments = [self._dump(c, excluded) for c in comments]
+
+            return detail
@@ -1,14 +1,28 @@
+import operator
+import re
 from enum import Enum
-from typing import List
+from typing import Dict, List
 
 import sqlalchemy
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, asc, desc, select
+
+from endpoints.batch import MAX_BATCH_SIZE, parse_ids
 from models.message import Message
 
 from models.summary import Summary
 
+_FILTER = re.compile(r"^(\w+)(<=|>=|<|>|=)(-?\d+(?:\.\d+)?)$")
+
+_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+}
+
 
 class SummaryAPI:
     def __init__(self, engine):
@@ -32,6 +46,16 @@ class SummaryAPI:
             self.read_summaries,
             methods=["GET"],
             tags=["Summary"],
+            responses={status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message}},
+        )
+
+        self.router.add_api_route(
+            "/summaries/batch",
+            self.read_summaries_by_ids,
+            methods=["GET"],
+            tags=["Summary"],
+            description=f"Gets up to {MAX_BATCH_SIZE} summaries by id in one request, keyed by id",
+            responses={status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message}},
         )
 
         self.router.add_api_route(
@@ -85,17 +109,89 @@ class SummaryAPI:
                 raise HTTPException(status_code=404, detail="Summary not found")
             return summary
 
+    def read_summaries_by_ids(
+        self,
+        ids: str = Query(description="Comma separated ids, e.g. 1,2,3"),
+    ) -> Dict[int, Summary]:
+        summary_ids = parse_ids(ids)
+
+        if len(summary_ids) == 0:
+            return {}
+
+        with Session(self.engine) as session:
+            summaries = session.exec(
+                select(Summary).where(Summary.id.in_(summary_ids))
+            ).all()
+
+            return {summary.id: summary for summary in summaries}
+
     class _OrderBy(str, Enum):
         asc = "asc"
         desc = "desc"
 
+    class _SummarySortBy(str, Enum):
+        id = "id"
+        afinn = "afinn"
+        afinn_mean = "afinn_mean"
+        no_of_replies = "no_of_replies"
+        anger = "anger"
+        anticipation = "anticipation"
+        disgust = "disgust"
+        fear = "fear"
+        joy = "joy"
+        negative = "negative"
+        positive = "positive"
+        sadness = "sadness"
+        surprise = "surprise"
+        trust = "trust"
+        nta_count = "nta_count"
+        yta_count = "yta_count"
+        esh_count = "esh_count"
+        info_count = "info_count"
+        nah_count = "nah_count"
+
+    def _parse_filters(self, filters: List[str]) -> List:
+        """Returns the conditions of filters such as anger>=10 or afinn<0"""
+        conditions = []
+
+        for text in filters:
+            match = _FILTER.match(text.replace(" ", ""))
+
+            if match is None or match.group(1) not in self._SummarySortBy.__members__:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Invalid filter {text}, expected a column of sortBy, an "
+                    "operator among <, <=, >, >=, = and a number, e.g. anger>=10",
+                )
+
+            name, comparison, value = match.groups()
+            conditions.append(
+                _OPERATORS[comparison](getattr(Summary, name), float(value))
+            )
+
+        return conditions
+
     def read_summaries(
         self,
         response: Response = Response(),
         offset: int = Query(default=0, le=100),
         limit: int = Query(default=10, le=100),
+        sort_by: _SummarySortBy = Query(alias="sortBy", default=_SummarySortBy.id),
         order_by: _OrderBy = Query(alias="orderBy", default=_OrderBy.desc),
+        filters: List[str] = Query(
+            alias="filter",
+            default=[],
+            description="Repeatable conditions on the columns of sortBy, e.g. anger>=10 "
+            "or afinn<0",
+        ),
     ) -> List[Summary]:
+        """
+        Reads the summaries, filtered and sorted by their sentiment, emotion scores, number
+        of replies or verdict counts. Each of these columns is indexed, a filter and sort on
+        the same column is read from one index range.
+        """
+        conditions = self._parse_filters(filters)
+
         match order_by:
             case "desc":
                 order = desc
@@ -106,11 +202,16 @@ class SummaryAPI:
 
         with Session(self.engine) as session:
             summary_count = session.exec(
-                select(sqlalchemy.func.count(Summary.id))
+                select(sqlalchemy.func.count(Summary.id)).where(*conditions)
             ).one()
 
+            # Ties are broken by id, which SQLite indexes hold after the column
             submissions = session.exec(
-                select(Summary).offset(offset).limit(limit).order_by(order(Summary.id))
+                select(Summary)
+                .where(*conditions)
+                .offset(offset)
+                .limit(limit)
+                .order_by(order(getattr(Summary, sort_by.value)), order(Summary.id))
             ).all()
 
             response.headers["X-Limit"] = str(limit)
@@ -0,0 +1,269 @@
+import bisect
+import heapq
+import os
+import re
+import string
+import time
+from array import array
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Engine
+from sqlmodel import or_, select
+
+from models.submission import Submission
+
+_SEPARATORS = re.compile(r"[\W_]+")
+_ASCII_SEPARATORS = str.maketrans({char: " " for char in string.punctuation})
+
+# Leading words most titles share, "AITA for ..." is indexed as "..."
+_LEADING_WORDS = {"aita", "aitah", "wibta", "wibtah", "for", "if"}
+
+
+def normalize_title(title: str) -> str:
+    """
+    Lower cases a title, collapses punctuation into single spaces and drops the leading
+    AITA for / WIBTA if.
+    """
+    title = title.casefold()
+
+    # Translating is faster than the regular expression, which also covers unicode
+    if title.isascii():
+        words = title.translate(_ASCII_SEPARATORS).split()
+    else:
+        words = _SEPARATORS.sub(" ", title).split()
+
+    start = 0
+
+    while start < len(words) and words[start] in _LEADING_WORDS:
+        start += 1
+
+    return " ".join(words[start:])
+
+
+class TitleIndex:
+    """
+    An in memory prefix index over submission titles, for autocomplete.
+
+    Titles are kept sorted by their normalized form, the titles matching a prefix are a
+    contiguous range found with bisect. Ids and scores are parallel arrays of machine
+    integers, and normalized titles are computed during the search instead of stored,
+    which keeps the index at about 130 MB per million titles.
+
+    The best titles of a range small enough are found by scanning it. Short prefixes match
+    large ranges, their best titles are cached and patched as titles are added, the least
+    recently searched prefix is dropped when the cache is full.
+
+    A background thread started by start() loads the index, which takes about 10 seconds
+    per million titles. It then reads the submissions created since, and the recent ones
+    whose score the crawler updates, every refresh_interval seconds. Searches are served
+    from the titles already loaded while it reads.
+    """
+
+    MAX_LIMIT = 20
+
+    # Largest range scanned on every search, and the most larger ones cached
+    _SCAN = 1024
+    _MAX_CACHED = 4096
+
+    # Submissions older than this are no longer crawled, their score does not change
+    _RECENT = 3 * 24 * 60 * 60
+
+    def __init__(self, engine: Engine, refresh_interval: float = None):
+        self.engine = engine
+        self.refresh_interval = (
+            refresh_interval
+            if refresh_interval is not None
+            else float(os.environ.get("TITLE_INDEX_REFRESH", 60))
+        )
+
+        self.titles: List[str] = []
+        self.ids = array("q")
+        self.scores = array("q")
+        self.last_id = 0
+        self.refreshed_at = None
+        self._loaded = Event()
+        self._thread = None
+
+        # Best (score, id, title) of the large ranges, best first, by prefix, least
+        # recently searched first
+        self._top: Dict[str, List[Tuple[int, int, str]]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Waits at most timeout seconds for the index to be loaded, returns whether it is.
+        """
+        return self._loaded.wait(timeout)
+
+    def load(self) -> None:
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(Submission.id, Submission.title, Submission.score)
+            ).all()
+
+        rows.sort(key=lambda row: normalize_title(row[1]))
+
+        with self._lock:
+            self.ids = array("q", (row[0] for row in rows))
+            self.titles = [row[1] for row in rows]
+            self.scores = array("q", (row[2] for row in rows))
+            self.last_id = max(self.ids, default=0)
+            self.refreshed_at = time.monotonic()
+            self._top.clear()
+
+        self._loaded.set()
+
+    def start(self) -> None:
+        """
+        Loads and then keeps refreshing the index in a background thread, once per process.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = Thread(target=self._keep_refreshed, daemon=True)
+
+        self._thread.start()
+
+    def _keep_refreshed(self) -> None:
+        while True:
+            # A failed load or refresh, e.g. while the database restarts, is retried
+            try:
+                if self.ready:
+                    self.refresh()
+                else:
+                    self.load()
+            except Exception as error:
+                print(f"Title index refresh failed: {error}", flush=True)
+
+            time.sleep(self.refresh_interval)
+
+    def refresh(self) -> int:
+        """
+        Adds the submissions created since the last refresh and updates the scores of the
+        recent ones. Returns the number of titles added.
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(Submission.id, Submission.title, Submission.score).where(
+                    or_(
+                        Submission.id > self.last_id,
+                        Submission.created_utc >= time.time() - self._RECENT,
+                    )
+                )
+            ).all()
+
+        added = 0
+
+        with self._lock:
+            for id, title, score in rows:
+                if id > self.last_id:
+                    self._add(id, title, score)
+                    added += 1
+                else:
+                    self._update_score(id, title, score)
+
+            self.last_id = max(self.last_id, *(row[0] for row in rows), 0)
+            self.refreshed_at = time.monotonic()
+
+        return added
+
+    def _range(self, key: str) -> Tuple[int, int]:
+        lo = bisect.bisect_left(self.titles, key, key=normalize_title)
+        hi = bisect.bisect_left(
+            self.titles, key + "\U0010ffff", lo, key=normalize_title
+        )
+
+        return lo, hi
+
+    def _add(self, id: int, title: str, score: int) -> None:
+        key = normalize_title(title)
+        position = bisect.bisect_right(self.titles, key, key=normalize_title)
+
+        self.titles.insert(position, title)
+        self.ids.insert(position, id)
+        self.scores.insert(position, score)
+
+        for prefix, top in self._top.items():
+            if key.startswith(prefix):
+                top.append((score, id, title))
+                top.sort(reverse=True)
+                del top[self.MAX_LIMIT :]
+
+    def _update_score(self, id: int, title: str, score: int) -> None:
+        key = normalize_title(title)
+        lo, hi = self._range(key)
+
+        for position in range(lo, hi):
+            if self.ids[position] == id:
+                previous = self.scores[position]
+                self.scores[position] = score
+                break
+        else:
+            return
+
+        if score == previous:
+            return
+
+        for prefix in list(self._top):
+            if not key.startswith(prefix):
+                continue
+
+            top = [entry for entry in self._top[prefix] if entry[1] != id]
+
+            if score < previous and len(top) < len(self._top[prefix]):
+                # A title of the cache dropped, one outside of it may now rank higher
+                del self._top[prefix]
+                continue
+
+            top.append((score, id, title))
+            top.sort(reverse=True)
+            self._top[prefix] = top[: self.MAX_LIMIT]
+
+    def _best(self, key: str) -> List[Tuple[int, int, str]]:
+        top = self._top.get(key)
+
+        if top is not None:
+            self._top.move_to_end(key)
+            return top
+
+        lo, hi = self._range(key)
+
+        positions = heapq.nlargest(
+            self.MAX_LIMIT, range(lo, hi), key=self.scores.__getitem__
+        )
+        top = [
+            (self.scores[position], self.ids[position], self.titles[position])
+            for position in positions
+        ]
+
+        if hi - lo > self._SCAN:
+            self._top[key] = top
+
+            if len(self._top) > self._MAX_CACHED:
+                self._top.popitem(last=False)
+
+        return top
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, int, str]]:
+        """
+        Returns (score, id, title) of the best scored titles starting with the query,
+        ignoring case, punctuation and a leading AITA for. The index must be loaded.
+        """
+        key = normalize_title(query)
+
+        # A query ending in a space only matches whole words
+        if key != "" and query[-1:].isspace():
+            key += " "
+
+        with self._lock:
+            return self._best(key)[:limit]
@@ -0,0 +1,181 @@
+import calendar
+import time
+from datetime import datetime, timezone
+from enum import Enum
+from typing import List, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, status
+from sqlalchemy import Engine
+from sqlmodel import Session, and_, desc, func, or_, select
+
+from models.message import Message
+from models.trend import (
+    EmotionBucket,
+    TrendBucket,
+    TrendPoint,
+    WordBucket,
+    WordCount,
+    WordTrend,
+)
+
+DAY = 24 * 60 * 60
+
+
+def _day(timestamp: float) -> int:
+    return int(timestamp // DAY * DAY)
+
+
+def _next_month(month: int) -> int:
+    start = datetime.fromtimestamp(month, timezone.utc)
+
+    return calendar.timegm(
+        (start.year + start.month // 12, start.month % 12 + 1, 1, 0, 0, 0)
+    )
+
+
+def range_buckets(start: int, end: int) -> Tuple[List[int], List[int]]:
+    """
+    Returns the fewest (days, months) buckets covering the days from start to end, end
+    excluded, both starts of UTC days: the whole months in the range and the days before
+    and after them.
+    """
+    days = []
+    months = []
+    day = start
+
+    while day < end:
+        date = datetime.fromtimestamp(day, timezone.utc)
+
+        if date.day == 1 and _next_month(day) <= end:
+            months.append(day)
+            day = _next_month(day)
+        else:
+            days.append(day)
+            day += DAY
+
+    return days, months
+
+
+class TrendAPI:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.router = APIRouter()
+
+        self._setup_trend_routes()
+
+    def _setup_trend_routes(self) -> None:
+        self.router.add_api_route(
+            "/trends",
+            self.read_trends,
+            methods=["GET"],
+            tags=["Trends"],
+            description="Gets the verdict counts and sentiment of the analysed submissions "
+            "created in each day, week or month of a range, oldest first",
+        )
+
+        self.router.add_api_route(
+            "/trends/words",
+            self.read_word_trend,
+            methods=["GET"],
+            tags=["Trends"],
+            description="Gets the most frequent words in the comments of the submissions "
+            "created in a range of days, and their total NRC emotion scores",
+            responses={status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": Message}},
+        )
+
+    class _Unit(str, Enum):
+        day = "day"
+        week = "week"
+        month = "month"
+
+    def read_trends(
+        self,
+        unit: _Unit = Query(default=_Unit.month),
+        start: float = Query(
+            default=None,
+            description="Unix timestamp, the first bucket starts at or after it",
+        ),
+        end: float = Query(
+            default=None, description="Unix timestamp, the last bucket starts before it"
+        ),
+        limit: int = Query(default=366, le=3660),
+    ) -> List[TrendPoint]:
+        statement = select(TrendBucket).where(TrendBucket.unit == unit.value)
+
+        if start is not None:
+            statement = statement.where(TrendBucket.bucket >= start)
+        if end is not None:
+            statement = statement.where(TrendBucket.bucket < end)
+
+        with Session(self.engine) as session:
+            buckets = session.exec(
+                statement.order_by(TrendBucket.bucket).limit(limit)
+            ).all()
+
+        return [
+            TrendPoint(
+                **bucket.model_dump(exclude={"unit"}),
+                afinn_mean=(
+                    bucket.afinn_sum / bucket.submissions
+                    if bucket.submissions > 0
+                    else None
+                ),
+            )
+            for bucket in buckets
+        ]
+
+    # Longest range accepted, answered from at most 60 days and 120 months
+    MAX_RANGE_DAYS = 3660
+
+    def read_word_trend(
+        self,
+        start: float = Query(
+            default=None,
+            description="Unix timestamp, the range starts with its day. Defaults to 30 days before end",
+        ),
+        end: float = Query(
+            default=None,
+            description="Unix timestamp, the range ends before its day. Defaults to tomorrow",
+        ),
+        limit: int = Query(default=20, ge=1, le=100),
+    ) -> WordTrend:
+        end_day = _day(end) if end is not None else _day(time.time()) + DAY
+        start_day = _day(start) if start is not None else end_day - 30 * DAY
+
+        if not 0 < end_day - start_day <= self.MAX_RANGE_DAYS * DAY:
+            raise HTTPException(
+                status_code=422,
+                detail=f"The range must cover between 1 and {self.MAX_RANGE_DAYS} days",
+            )
+
+        days, months = range_buckets(start_day, end_day)
+
+        def in_range(model):
+            return or_(
+                and_(model.unit == "day", model.bucket.in_(days)),
+                and_(model.unit == "month", model.bucket.in_(months)),
+            )
+
+        total = func.sum(WordBucket.count)
+
+        with Session(self.engine) as session:
+            words = session.exec(
+                select(WordBucket.word, total)
+                .where(in_range(WordBucket))
+                .group_by(WordBucket.word)
+                .order_by(desc(total), WordBucket.word)
+                .limit(limit)
+            ).all()
+
+            emotions = session.exec(
+                select(EmotionBucket.emotion, func.sum(EmotionBucket.total))
+                .where(in_range(EmotionBucket))
+                .group_by(EmotionBucket.emotion)
+            ).all()
+
+        return WordTrend(
+            start=start_day,
+            end=end_day,
+            words=[WordCount(word=word, count=count) for word, count in words],
+            emotions={emotion: total for emotion, total in emotions if total != 0},
+        )
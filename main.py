@@ -1,24 +1,28 @@
+import os
 from time import time
 
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_utilities import repeat_every
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
 
+from endpoints.breakdown_api import BreakdownAPI
 from endpoints.comment_api import CommentAPI
 from endpoints.database_config import DatabaseConfig
 from endpoints.health_api import HealthAPI
+from endpoints.metrics import Metrics, MetricsMiddleware
 from endpoints.openai_inference_api import OpenAIInferenceAPI
+from endpoints.pipeline_run_api import PipelineRunAPI
+from endpoints.rate_limiter import (
+    RateLimiter,
+    RateLimitExceeded,
+    rate_limit_exceeded_handler,
+)
+from endpoints.slow_query_log import SlowQueryLog
 from endpoints.submission_api import SubmissionAPI
+from endpoints.submission_detail_api import SubmissionDetailAPI
 from endpoints.summary_api import SummaryAPI
+from endpoints.trend_api import TrendAPI
 from models.rate_limit import RateLimit
-from utils.analytics import AnalyticsProcessor
-from utils.crawler import Crawler
-from utils.fts_processor import FTSProcessor
-from utils.process_openai import OpenAIProccessor
+from utils.work_queue import ANALYTICS_QUEUE, OPENAI_QUEUE, WorkQueue
 
 app = FastAPI(
     title="AITA API",
@@ -45,31 +49,72 @@ def setup_routes() -> None:
     openai_analysis_api = OpenAIInferenceAPI(engine)
     comment_api = CommentAPI(engine)
     summary_api = SummaryAPI(engine)
+    breakdown_api = BreakdownAPI(engine)
+    submission_detail_api = SubmissionDetailAPI(engine)
+    pipeline_run_api = PipelineRunAPI(engine)
+    trend_api = TrendAPI(engine)
+
+    # Loaded before the first autocomplete request, then refreshed in the background
+    app.add_event_handler("startup", submission_api.title_index.start)
+
+    metrics = Metrics()
+    metrics.register_cache("submission_detail", submission_detail_api.cache)
+    metrics.register_cache("comment_tree", comment_api.thread_cache)
+
     # Add routers
     app.include_router(
         prefix="/api/v2",
         router=health_api.router,
         responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
     )
     app.include_router(
         prefix="/api/v2",
         router=submission_api.router,
         responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
     )
     app.include_router(
         prefix="/api/v2",
         router=comment_api.router,
         responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
     )
     app.include_router(
         prefix="/api/v2",
         router=openai_analysis_api.router,
         responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
     )
     app.include_router(
         prefix="/api/v2",
         router=summary_api.router,
         responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
+    )
+    app.include_router(
+        prefix="/api/v2",
+        router=breakdown_api.router,
+        responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
+    )
+    app.include_router(
+        prefix="/api/v2",
+        router=submission_detail_api.router,
+        responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
+    )
+    app.include_router(
+        prefix="/api/v2",
+        router=pipeline_run_api.router,
+        responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
+    )
+    app.include_router(
+        prefix="/api/v2",
+        router=trend_api.router,
+        responses={status.HTTP_429_TOO_MANY_REQUESTS: {"model": RateLimit}},
+        dependencies=[Depends(app.state.limiter)],
     )
 
 
@@ -88,34 +133,10 @@ def setup_cors():
 
 
 def setup_limiter() -> None:
-    # Limiters
-    limiter = Limiter(
-        key_func=get_remote_address, headers_enabled=True, default_limits=["40/minute"]
-    )
+    # Limiters, applied to every router as a dependency in setup_routes
+    limiter = RateLimiter.from_env(prefix="/api/v2")
     app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-    app.add_middleware(SlowAPIMiddleware)
-
-
-def setup_startup_event() -> None:
-    @repeat_every(seconds=60 * 60)  # 1 hour
-    async def update_submissions() -> None:
-        print("Crawling")
-        crawler = Crawler(verbose=True)
-        await crawler.process()
-
-        ap = AnalyticsProcessor(verbose=False)
-        print("Processing submissions")
-        await ap.process()
-
-        oap = OpenAIProccessor(verbose=False)
-        await oap.process()
-
-        fts = FTSProcessor()
-
-        fts.process()
-
-    app.add_event_handler("startup", update_submissions)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
 
 def setup_process_time() -> None:
@@ -128,8 +149,36 @@ def setup_process_time() -> None:
         return response
 
 
-setup_routes()
+def setup_metrics() -> None:
+    metrics = Metrics()
+    metrics.instrument_engine(DatabaseConfig().get_engine())
+    metrics.register_rate_limiter(app.state.limiter)
+
+    for name in [ANALYTICS_QUEUE, OPENAI_QUEUE]:
+        metrics.register_work_queue(WorkQueue(name))
+
+    app.include_router(router=metrics.router)
+    # Added last so it is the outermost middleware and times the whole request
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+
+def setup_slow_query_log() -> None:
+    # Opt in, e.g. SLOW_QUERY_THRESHOLD_MS=50
+    threshold = os.environ.get("SLOW_QUERY_THRESHOLD_MS")
+
+    if threshold is None:
+        return
+
+    slow_query_log = SlowQueryLog(
+        DatabaseConfig().get_engine(), threshold_ms=float(threshold)
+    )
+
+    app.include_router(prefix="/api/v2", router=slow_query_log.router)
+
+
 setup_limiter()
+setup_routes()
 setup_cors()
-# setup_startup_event()
 setup_process_time()
+setup_metrics()
+setup_slow_query_log()
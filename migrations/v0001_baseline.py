@@ -0,0 +1,121 @@
+"""Creates the tables that existed before migrations were introduced"""
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+)
+
+# The schema as it stood when migrations were introduced, written out rather than taken
+# from the models, so a new database is created as every existing one was and later
+# migrations bring both up to date. submission_id is unique, the comment foreign key
+# cannot reference it otherwise on PostgreSQL.
+metadata = MetaData()
+
+Table(
+    "submission",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("submission_id", String, nullable=False, unique=True),
+    Column("title", String, nullable=False),
+    Column("selftext", String, nullable=False),
+    Column("created_utc", Float, nullable=False),
+    Column("permalink", String, nullable=False),
+    Column("score", Integer, nullable=False),
+    Index("ix_submission_created_utc", "created_utc"),
+)
+
+Table(
+    "comment",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column(
+        "submission_id",
+        String,
+        ForeignKey("submission.submission_id"),
+        nullable=False,
+    ),
+    Column("message", String, nullable=False),
+    Column("comment_id", String, nullable=False, unique=True),
+    Column("parent_id", String, nullable=False),
+    Column("created_utc", Integer, nullable=False),
+    Column("score", Integer, nullable=False),
+    Index("ix_comment_submission_id_created_utc", "submission_id", "created_utc"),
+    Index("ix_comment_submission_id_score", "submission_id", "score"),
+)
+
+Table(
+    "breakdown",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("nta", Integer, nullable=False),
+    Column("yta", Integer, nullable=False),
+    Column("esh", Integer, nullable=False),
+    Column("info", Integer, nullable=False),
+    Column("nah", Integer, nullable=False),
+)
+
+Table(
+    "summary",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("afinn", Float, nullable=False),
+    Column("emotion", JSON),
+    Column("word_freq", JSON),
+    Column("counts", JSON),
+)
+
+Table(
+    "openaianalysis",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("text", String, nullable=False),
+)
+
+Table(
+    "pipeline_run",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("run_id", String, nullable=False),
+    Column("stage", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("started_at", Float, nullable=False),
+    Column("finished_at", Float),
+    Column("duration", Float),
+    Column("items_in", Integer, nullable=False),
+    Column("items_out", Integer, nullable=False),
+    Column("errors", Integer, nullable=False),
+    Column("db_writes", Integer, nullable=False),
+    Column("bytes_fetched", Integer, nullable=False),
+    Index("ix_pipeline_run_stage", "stage"),
+    Index("ix_pipeline_run_run_id", "run_id"),
+)
+
+Table(
+    "work_item",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("queue", String, nullable=False),
+    Column("submission_id", Integer, nullable=False),
+    Column("status", String, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("available_at", Float, nullable=False),
+    Column("enqueued_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Column("last_error", String),
+    UniqueConstraint("queue", "submission_id"),
+    Index("ix_work_item_queue_status_available_at", "queue", "status", "available_at"),
+)
+
+
+def upgrade(migration) -> None:
+    # Tables that already exist are left as they are, later migrations bring them up to
+    # date, so this also adopts databases created by create_all
+    metadata.create_all(migration.engine)
@@ -0,0 +1,8 @@
+"""Indexes the comments of a submission by score and by creation time"""
+
+from models.comment import Comment
+
+
+def upgrade(migration) -> None:
+    migration.create_index(Comment, "ix_comment_submission_id_score")
+    migration.create_index(Comment, "ix_comment_submission_id_created_utc")
@@ -0,0 +1,7 @@
+"""Indexes submissions by creation time for date range queries"""
+
+from models.submission import Submission
+
+
+def upgrade(migration) -> None:
+    migration.create_index(Submission, "ix_submission_created_utc")
@@ -0,0 +1,9 @@
+"""Rebuilds the submission search index to match words case insensitively"""
+
+from sqlmodel import Session
+
+
+def upgrade(migration) -> None:
+    with Session(migration.engine) as session:
+        migration.backend.rebuild_search_index(session)
+        session.commit()
@@ -0,0 +1,5 @@
+"""Indexes comment messages for full text search, maintained as comments are written"""
+
+
+def upgrade(migration) -> None:
+    migration.backend.create_comment_search_index(migration.engine)
@@ -0,0 +1,7 @@
+"""Stores the precomputed nearest neighbors of every submission"""
+
+from models.similar_submission import SimilarSubmission
+
+
+def upgrade(migration) -> None:
+    migration.create_tables([SimilarSubmission])
@@ -0,0 +1,10 @@
+"""Links reposts to the submission they duplicate, through an index of MinHash bands"""
+
+from models.near_duplicate import MinHashBand, MinHashSignature
+from models.submission import Submission
+
+
+def upgrade(migration) -> None:
+    migration.add_column(Submission, "canonical_id")
+    migration.create_index(Submission, "ix_submission_canonical_id")
+    migration.create_tables([MinHashSignature, MinHashBand])
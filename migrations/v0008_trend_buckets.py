@@ -0,0 +1,10 @@
+"""Rolls verdict counts and sentiment up into day, week and month buckets"""
+
+from models.trend import TrendBucket
+from utils.trends import TrendRollup
+
+
+def upgrade(migration) -> None:
+    migration.create_tables([TrendBucket])
+
+    TrendRollup(migration.engine).rebuild()
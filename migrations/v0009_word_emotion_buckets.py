@@ -0,0 +1,12 @@
+"""Counts comment words and NRC emotions per day and month"""
+
+from models.trend import EmotionBucket, WordBucket, WordCountProgress
+from utils.trends import TrendRollup
+
+
+def upgrade(migration) -> None:
+    migration.create_tables([WordBucket, EmotionBucket, WordCountProgress])
+
+    # Emotions are summed from the summaries, words are counted as submissions are
+    # analysed again
+    TrendRollup(migration.engine).rebuild_emotions()
@@ -0,0 +1,58 @@
+"""Copies the number of replies, NRC emotion scores and verdict counts of summaries into
+indexed columns"""
+
+from sqlalchemy import bindparam, text, update
+from sqlmodel import Session, select
+
+from models.summary import EMOTIONS, VERDICT_COUNTS, Summary, metrics
+
+COLUMNS = ("no_of_replies", *EMOTIONS, *VERDICT_COUNTS)
+
+BATCH_SIZE = 5000
+
+
+def upgrade(migration) -> None:
+    for name in COLUMNS:
+        migration.add_column(Summary, name)
+
+    # The comments the analytics stage counted, the thread as crawled
+    replies = text(
+        "UPDATE summary SET no_of_replies = (SELECT COUNT(*) FROM comment "
+        "JOIN submission ON submission.submission_id = comment.submission_id "
+        "WHERE submission.id = summary.id) "
+        "WHERE summary.id > :first_id AND summary.id <= :last_id"
+    )
+    statement = (
+        update(Summary.__table__)
+        .where(Summary.__table__.c.id == bindparam("summary_id"))
+        .values({name: bindparam(name) for name in (*EMOTIONS, *VERDICT_COUNTS)})
+    )
+    last_id = 0
+
+    while True:
+        with Session(migration.engine) as session:
+            rows = session.exec(
+                select(Summary.id, Summary.emotion, Summary.counts)
+                .where(Summary.id > last_id)
+                .order_by(Summary.id)
+                .limit(BATCH_SIZE)
+            ).all()
+
+            if len(rows) == 0:
+                break
+
+            session.execute(replies, {"first_id": last_id, "last_id": rows[-1][0]})
+            session.execute(
+                statement,
+                [
+                    {"summary_id": id, **metrics(emotion, counts)}
+                    for id, emotion, counts in rows
+                ],
+            )
+            session.commit()
+
+        last_id = rows[-1][0]
+
+    # Indexes are built after the backfill, cheaper than updating them row by row
+    for name in ("afinn", *COLUMNS):
+        migration.create_index(Summary, f"ix_summary_{name}")
@@ -0,0 +1,65 @@
+"""Stores the total verdicts, controversy and creation time of breakdowns, indexed to sort
+submissions by"""
+
+from sqlalchemy import bindparam, text, update
+from sqlmodel import Session, select
+
+from models.breakdown import SORT_COLUMNS, Breakdown, metrics
+
+BATCH_SIZE = 5000
+
+
+def upgrade(migration) -> None:
+    for name in ("verdicts", "controversy", "created_utc"):
+        migration.add_column(Breakdown, name)
+
+    created_utc = text(
+        "UPDATE breakdown SET created_utc = (SELECT created_utc FROM submission "
+        "WHERE submission.id = breakdown.id) "
+        "WHERE breakdown.id > :first_id AND breakdown.id <= :last_id"
+    )
+
+    # Not all databases have a power function, the metrics are computed here
+    statement = (
+        update(Breakdown.__table__)
+        .where(Breakdown.__table__.c.id == bindparam("breakdown_id"))
+        .values(verdicts=bindparam("verdicts"), controversy=bindparam("controversy"))
+    )
+    last_id = 0
+
+    while True:
+        with Session(migration.engine) as session:
+            rows = session.exec(
+                select(
+                    Breakdown.id,
+                    Breakdown.nta,
+                    Breakdown.yta,
+                    Breakdown.esh,
+                    Breakdown.info,
+                    Breakdown.nah,
+                )
+                .where(Breakdown.id > last_id)
+                .order_by(Breakdown.id)
+                .limit(BATCH_SIZE)
+            ).all()
+
+            if len(rows) == 0:
+                break
+
+            session.execute(created_utc, {"first_id": last_id, "last_id": rows[-1][0]})
+            session.execute(
+                statement,
+                [
+                    {
+                        "breakdown_id": id,
+                        **metrics(*(count or 0 for count in counts)),
+                    }
+                    for id, *counts in rows
+                ],
+            )
+            session.commit()
+
+        last_id = rows[-1][0]
+
+    for column in SORT_COLUMNS:
+        migration.create_index(Breakdown, f"ix_breakdown_{column}_created_utc")
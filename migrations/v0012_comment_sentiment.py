@@ -0,0 +1,9 @@
+"""Stores the AFINN score and NRC emotion counts of each comment"""
+
+from models.comment_sentiment import CommentSentiment
+
+
+def upgrade(migration) -> None:
+    # Scoring needs the lexicons of the worker image, comments analysed before are scored
+    # with python -m utils.lexicon
+    migration.create_tables([CommentSentiment])
@@ -0,0 +1,40 @@
+"""Stores the mean AFINN score of the comments of summaries in an indexed column"""
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from models.summary import Summary
+
+BATCH_SIZE = 5000
+
+
+def upgrade(migration) -> None:
+    migration.add_column(Summary, "afinn_mean")
+
+    # Computed from afinn and no_of_replies, which it leaves as they are, so an
+    # interrupted backfill can be run again
+    statement = text(
+        "UPDATE summary SET afinn_mean = CASE WHEN no_of_replies > 0 "
+        "THEN afinn / no_of_replies ELSE 0 END "
+        "WHERE id > :first_id AND id <= :last_id"
+    )
+    last_id = 0
+
+    while True:
+        with Session(migration.engine) as session:
+            ids = session.exec(
+                select(Summary.id)
+                .where(Summary.id > last_id)
+                .order_by(Summary.id)
+                .limit(BATCH_SIZE)
+            ).all()
+
+            if len(ids) == 0:
+                break
+
+            session.execute(statement, {"first_id": last_id, "last_id": ids[-1]})
+            session.commit()
+
+        last_id = ids[-1]
+
+    migration.create_index(Summary, "ix_summary_afinn_mean")
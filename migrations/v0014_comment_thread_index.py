@@ -0,0 +1,7 @@
+"""Indexes comments by submission, score and id for reading comment trees"""
+
+from models.comment import Comment
+
+
+def upgrade(migration) -> None:
+    migration.create_index(Comment, "ix_comment_submission_id_score_id")
@@ -1,12 +1,68 @@
-from typing import Optional
+from typing import Dict, Optional
 
+from sqlalchemy import Index, event, select
 from sqlmodel import Field, SQLModel
 
+from models.submission import Submission
+
+# Columns submissions can be sorted by, each indexed with created_utc so a page over a range
+# of creation times is read in order from the index
+SORT_COLUMNS = ("nta", "yta", "esh", "info", "nah", "verdicts", "controversy")
+
+
+def controversy(nta: int, yta: int) -> float:
+    """
+    Returns how controversial a split of NTA and YTA verdicts is, ranked as Reddit ranks
+    controversial comments: their number to the power of the balance between them. Even
+    splits rank above one sided ones, and large threads above small ones.
+    """
+    if nta <= 0 or yta <= 0:
+        return 0.0
+
+    return float((nta + yta) ** (min(nta, yta) / max(nta, yta)))
+
+
+def metrics(nta: int, yta: int, esh: int, info: int, nah: int) -> Dict:
+    """Returns the columns computed from the verdict counts of a breakdown"""
+    return {
+        "verdicts": nta + yta + esh + info + nah,
+        "controversy": controversy(nta, yta),
+    }
+
 
 class Breakdown(SQLModel, table=True):
+    __table_args__ = tuple(
+        Index(f"ix_breakdown_{column}_created_utc", column, "created_utc")
+        for column in SORT_COLUMNS
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     nta: int = Field(ge=0, title="Not the asshole")
     yta: int = Field(ge=0, title="You are the asshole")
     esh: int = Field(ge=0, title="Everyone is asshole here")
     info: int = Field(ge=0, title="Not enough info")
     nah: int = Field(ge=0, title="No assholes here")
+
+    # Computed when the breakdown is written
+    verdicts: int = Field(default=0, title="Total verdicts")
+    controversy: float = Field(default=0, title="How evenly split NTA and YTA are")
+    created_utc: Optional[float] = Field(
+        default=None, title="Copied from the submission, to filter sorted pages on"
+    )
+
+
+@event.listens_for(Breakdown, "before_insert")
+@event.listens_for(Breakdown, "before_update")
+def _compute_metrics(mapper, connection, breakdown: Breakdown) -> None:
+    for name, value in metrics(
+        *(
+            getattr(breakdown, verdict) or 0
+            for verdict in ("nta", "yta", "esh", "info", "nah")
+        )
+    ).items():
+        setattr(breakdown, name, value)
+
+    if breakdown.created_utc is None:
+        breakdown.created_utc = connection.scalar(
+            select(Submission.created_utc).where(Submission.id == breakdown.id)
+        )
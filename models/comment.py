@@ -1,9 +1,19 @@
 from typing import Optional
 
+from sqlalchemy import Index, desc
 from sqlmodel import Field, SQLModel
 
 
 class Comment(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_comment_submission_id_score", "submission_id", "score"),
+        # Covers the version of a thread and reads it in the order of its replies
+        Index(
+            "ix_comment_submission_id_score_id", "submission_id", desc("score"), "id"
+        ),
+        Index("ix_comment_submission_id_created_utc", "submission_id", "created_utc"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     submission_id: str = Field(default=None, foreign_key="submission.submission_id")
     message: str
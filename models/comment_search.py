@@ -0,0 +1,22 @@
+from typing import List
+
+from sqlmodel import Field, SQLModel
+
+
+class CommentHit(SQLModel, table=False):
+    id: int
+    comment_id: str
+    parent_id: str
+    created_utc: int
+    score: int
+    rank: float = Field(title="Relevance, higher is better")
+    snippet: str = Field(title="The matching part of the message, matches in **")
+
+
+class CommentSearchGroup(SQLModel, table=False):
+    """The comments of a submission matching a search, best match first"""
+
+    submission_id: str
+    hits: int = Field(title="Matching comments, including those past the cap")
+    rank: float = Field(title="Relevance of the best matching comment")
+    comments: List[CommentHit]
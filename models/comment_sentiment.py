@@ -0,0 +1,39 @@
+from typing import Dict, Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class CommentSentiment(SQLModel, table=True):
+    """AFINN score and NRC emotion counts of a comment, stored by the analytics stage"""
+
+    __tablename__ = "comment_sentiment"
+    __table_args__ = (
+        Index("ix_comment_sentiment_submission_id_afinn", "submission_id", "afinn"),
+    )
+
+    id: int = Field(primary_key=True, title="Comment.id")
+    submission_id: int = Field(title="Submission.id")
+    afinn: float
+    words: int = Field(title="Number of words")
+    anger: int = 0
+    anticipation: int = 0
+    disgust: int = 0
+    fear: int = 0
+    joy: int = 0
+    negative: int = 0
+    positive: int = 0
+    sadness: int = 0
+    surprise: int = 0
+    trust: int = 0
+
+
+class SubmissionSentiment(SQLModel):
+    comments: int = Field(title="Number of comments scored")
+    afinn_mean: Optional[float] = None
+    afinn_median: Optional[float] = None
+    distribution: Dict[str, int] = Field(
+        title="Number of comments by AFINN score, very negative is -5 or less, very "
+        "positive 5 or more"
+    )
+    emotions: Dict[str, int] = Field(title="NRC emotion counts over every comment")
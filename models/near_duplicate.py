@@ -0,0 +1,25 @@
+from sqlalchemy import BigInteger, Index, LargeBinary
+from sqlmodel import Field, SQLModel
+
+
+class MinHashSignature(SQLModel, table=True):
+    """The MinHash signature of the selftext of a submission"""
+
+    __tablename__ = "minhash_signature"
+
+    id: int = Field(primary_key=True, title="Submission.id")
+    signature: bytes = Field(sa_type=LargeBinary, title="Minimum hashes, uint32 each")
+
+
+class MinHashBand(SQLModel, table=True):
+    """
+    A band of a MinHash signature. Submissions sharing the hash of a band are candidate
+    near duplicates.
+    """
+
+    __tablename__ = "minhash_band"
+    __table_args__ = (Index("ix_minhash_band_submission_id", "submission_id"),)
+
+    band: int = Field(primary_key=True)
+    hash: int = Field(primary_key=True, sa_type=BigInteger)
+    submission_id: int = Field(primary_key=True, title="Submission.id")
@@ -0,0 +1,26 @@
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class PipelineRun(SQLModel, table=True):
+    """Timing and throughput of one stage of an ingestion run"""
+
+    __tablename__ = "pipeline_run"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: str = Field(index=True, title="Shared by every stage of the same run")
+    stage: str = Field(index=True, title="crawl, analytics, openai or fts")
+    status: str = Field(
+        default="running", title="running, completed, failed or skipped"
+    )
+    started_at: float
+    finished_at: Optional[float] = Field(default=None)
+    duration: Optional[float] = Field(default=None, title="Duration in seconds")
+    items_in: int = Field(default=0, title="Items the stage read")
+    items_out: int = Field(default=0, title="Items the stage produced")
+    errors: int = Field(default=0)
+    db_writes: int = Field(default=0, title="Rows inserted or updated")
+    bytes_fetched: int = Field(
+        default=0, title="Bytes of text fetched from Reddit or OpenAI"
+    )
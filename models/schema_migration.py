@@ -0,0 +1,12 @@
+from sqlmodel import Field, SQLModel
+
+
+class SchemaMigration(SQLModel, table=True):
+    """A migration that has been applied to the database"""
+
+    __tablename__ = "schema_migration"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: float
+    duration: float = Field(title="Duration in seconds")
@@ -0,0 +1,20 @@
+from sqlmodel import Field, SQLModel
+
+
+class SimilarSubmission(SQLModel, table=True):
+    """A nearest neighbor of a submission, precomputed by the similarity stage"""
+
+    __tablename__ = "similar_submission"
+
+    submission_id: int = Field(primary_key=True, title="Submission.id")
+    rank: int = Field(primary_key=True, title="0 for the most similar")
+    similar_id: int = Field(title="Submission.id of the neighbor")
+    similarity: float = Field(title="Cosine similarity of the TF-IDF vectors")
+
+
+class SimilarSubmissionRead(SQLModel):
+    id: int
+    title: str
+    permalink: str
+    score: int
+    similarity: float
@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class SlowQuery(SQLModel, table=False):
+    statement: str
+    parameters: str = Field(title="The bound parameters")
+    duration_ms: float
+    endpoint: Optional[str] = Field(
+        default=None, title="Route template of the request that ran the statement"
+    )
+    plan: List[str] = Field(default=[], title="EXPLAIN QUERY PLAN output")
+    full_scan: bool = Field(default=False, title="The plan scans a whole table")
+    timestamp: datetime
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from sqlmodel import Field, SQLModel
 
 
@@ -12,12 +14,18 @@ class Submission(SQLModel, table=True):
     )
     submission_id: str = Field(
         max_length=10,
+        unique=True,
         title="The Id obtained from the Reddit Crawler, actual Id used on Reddit",
     )
     title: str = Field(
         title="The title of the submission",
     )
     selftext: str
-    created_utc: float
+    created_utc: float = Field(index=True)
     permalink: str
     score: int = Field(title="The score")
+    canonical_id: Optional[int] = Field(
+        default=None,
+        index=True,
+        title="The Id of the submission this one is a near duplicate of, if any",
+    )
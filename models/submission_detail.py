@@ -0,0 +1,14 @@
+from typing import Dict, List, Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class SubmissionDetail(SQLModel, table=False):
+    """Submission together with its breakdown, summary, OpenAI analysis and top comments"""
+
+    id: int
+    submission: Optional[Dict] = Field(default=None)
+    breakdown: Optional[Dict] = Field(default=None)
+    summary: Optional[Dict] = Field(default=None)
+    openai_analysis: Optional[Dict] = Field(default=None)
+    comments: Optional[List[Dict]] = Field(default=None)
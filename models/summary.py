@@ -1,10 +1,78 @@
 from typing import Dict, Optional
+from sqlalchemy import event
 from sqlmodel import Field, Column, SQLModel, JSON
 
+# NRC emotion scores and verdict counts stored as columns, so they can be filtered and
+# sorted on through an index
+EMOTIONS = (
+    "anger",
+    "anticipation",
+    "disgust",
+    "fear",
+    "joy",
+    "negative",
+    "positive",
+    "sadness",
+    "surprise",
+    "trust",
+)
+VERDICT_COUNTS = ("nta_count", "yta_count", "esh_count", "info_count", "nah_count")
+
+
+def metrics(emotion: Optional[Dict], counts: Optional[Dict]) -> Dict[str, int]:
+    """Returns the columns of the emotion scores and verdict counts of a summary"""
+    emotion = emotion or {}
+    counts = counts or {}
+
+    return {
+        **{name: emotion.get(name) or 0 for name in EMOTIONS},
+        **{name: counts.get(name) or 0 for name in VERDICT_COUNTS},
+    }
+
+
+def afinn_mean(afinn: Optional[float], no_of_replies: Optional[int]) -> float:
+    """Returns the mean AFINN score of the comments of a summary, given their sum"""
+    return (afinn or 0) / no_of_replies if no_of_replies else 0.0
+
 
 class Summary(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    afinn: float
+    afinn: float = Field(index=True, title="Sum of the AFINN scores of the comments")
     emotion: Dict = Field(default={}, sa_column=Column(JSON))
     word_freq: Dict = Field(default={}, sa_column=Column(JSON))
     counts: Dict = Field(default={}, sa_column=Column(JSON))
+    no_of_replies: int = Field(default=0, index=True, title="Number of comments")
+
+    # Computed from afinn and no_of_replies when the summary is written, long threads
+    # do not outweigh short ones
+    afinn_mean: float = Field(
+        default=0, index=True, title="Mean AFINN score of the comments"
+    )
+
+    # Copied from emotion and counts when the summary is written
+    anger: int = Field(default=0, index=True)
+    anticipation: int = Field(default=0, index=True)
+    disgust: int = Field(default=0, index=True)
+    fear: int = Field(default=0, index=True)
+    joy: int = Field(default=0, index=True)
+    negative: int = Field(default=0, index=True)
+    positive: int = Field(default=0, index=True)
+    sadness: int = Field(default=0, index=True)
+    surprise: int = Field(default=0, index=True)
+    trust: int = Field(default=0, index=True)
+    nta_count: int = Field(default=0, index=True)
+    yta_count: int = Field(default=0, index=True)
+    esh_count: int = Field(default=0, index=True)
+    info_count: int = Field(default=0, index=True)
+    nah_count: int = Field(default=0, index=True)
+
+
+@event.listens_for(Summary, "before_insert")
+@event.listens_for(Summary, "before_update")
+def _copy_metrics(mapper, connection, summary: Summary) -> None:
+    # Keeps the columns in line with the JSON whichever way a summary is written, the
+    # analytics stage or the API
+    for name, value in metrics(summary.emotion, summary.counts).items():
+        setattr(summary, name, value)
+
+    summary.afinn_mean = afinn_mean(summary.afinn, summary.no_of_replies)
@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel
+
+
+class TitleSuggestion(SQLModel, table=False):
+    id: int
+    title: str
+    score: int
@@ -0,0 +1,81 @@
+from typing import Dict, List, Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class TrendBucket(SQLModel, table=True):
+    """
+    Verdict and sentiment totals of the analysed submissions created in a day, week or
+    month, kept up to date by the analytics stage
+    """
+
+    __tablename__ = "trend_bucket"
+
+    unit: str = Field(primary_key=True, title="day, week or month")
+    bucket: int = Field(primary_key=True, title="Start of the bucket, unix timestamp")
+    submissions: int = Field(default=0, title="Analysed submissions")
+    nta: int = Field(default=0)
+    yta: int = Field(default=0)
+    esh: int = Field(default=0)
+    info: int = Field(default=0)
+    nah: int = Field(default=0)
+    afinn_sum: float = Field(default=0, title="Sum of the AFINN score of submissions")
+
+
+class TrendPoint(SQLModel):
+    bucket: int = Field(title="Start of the bucket, unix timestamp")
+    submissions: int
+    nta: int
+    yta: int
+    esh: int
+    info: int
+    nah: int
+    afinn_sum: float
+    afinn_mean: Optional[float] = Field(
+        default=None, title="Mean AFINN score of a submission"
+    )
+
+
+class WordBucket(SQLModel, table=True):
+    """Occurrences of a word in the comments of the submissions created in a day or month"""
+
+    __tablename__ = "word_bucket"
+
+    unit: str = Field(primary_key=True, title="day or month")
+    bucket: int = Field(primary_key=True, title="Start of the bucket, unix timestamp")
+    word: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+
+class EmotionBucket(SQLModel, table=True):
+    """NRC emotion scores of the submissions created in a day or month"""
+
+    __tablename__ = "emotion_bucket"
+
+    unit: str = Field(primary_key=True, title="day or month")
+    bucket: int = Field(primary_key=True, title="Start of the bucket, unix timestamp")
+    emotion: str = Field(primary_key=True)
+    total: int = Field(default=0)
+
+
+class WordCountProgress(SQLModel, table=True):
+    """The last comment of a submission whose words were added to its buckets"""
+
+    __tablename__ = "word_count_progress"
+
+    submission_id: int = Field(primary_key=True, title="Submission.id")
+    last_comment_id: int = Field(title="Comment.id, comments are only ever added")
+
+
+class WordCount(SQLModel):
+    word: str
+    count: int
+
+
+class WordTrend(SQLModel):
+    start: int = Field(title="Start of the first day of the range, unix timestamp")
+    end: int = Field(title="Start of the day after the range, unix timestamp")
+    words: List[WordCount] = Field(
+        title="Most frequent words in comments, stop words excluded"
+    )
+    emotions: Dict[str, int] = Field(title="Total NRC emotion scores")
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import Field, SQLModel
+
+
+class WorkItem(SQLModel, table=True):
+    """A submission waiting to be processed by a pipeline stage"""
+
+    __tablename__ = "work_item"
+    __table_args__ = (
+        UniqueConstraint("queue", "submission_id"),
+        Index(
+            "ix_work_item_queue_status_available_at", "queue", "status", "available_at"
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    queue: str = Field(title="analytics or openai")
+    submission_id: int = Field(title="Submission.id to process")
+    status: str = Field(default="pending", title="pending, in_flight, done or dead")
+    attempts: int = Field(default=0, title="Times the item has been dequeued")
+    available_at: float = Field(
+        title="When a pending item becomes visible, or an in flight lease expires"
+    )
+    enqueued_at: float
+    updated_at: float
+    last_error: Optional[str] = Field(default=None)
+
+
+class QueueDepth(SQLModel):
+    queue: str
+    pending: int = 0
+    in_flight: int = 0
+    done: int = 0
+    dead: int = 0
+    oldest_pending_age: Optional[float] = Field(
+        default=None, title="Seconds the oldest pending item has waited"
+    )
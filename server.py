@@ -0,0 +1,35 @@
+# Runs the read only API with uvicorn, tuned for concurrency
+# Usage: python server.py
+#
+# Ingestion runs in its own process, see utils/scheduler.py
+import os
+
+import uvicorn
+from dotenv import find_dotenv, load_dotenv
+
+
+def default_workers() -> int:
+    # The CPUs this process may run on, which respects container CPU sets
+    return len(os.sched_getaffinity(0))
+
+
+def main() -> None:
+    load_dotenv(find_dotenv())
+
+    uvicorn.run(
+        "main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", 8000)),
+        workers=int(os.environ.get("WEB_CONCURRENCY", default_workers())),
+        # Longer than the idle timeout of the proxy in front, so it never reuses a
+        # connection the server is closing
+        timeout_keep_alive=int(os.environ.get("KEEP_ALIVE", 75)),
+        backlog=int(os.environ.get("BACKLOG", 2048)),
+        root_path=os.environ.get("ROOT_PATH", ""),
+        proxy_headers=True,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from endpoints.comment_api import CommentAPI
+from models.comment import Comment
+from models.submission import Submission
+
+
+@pytest.fixture
+def client(engine):
+    with Session(engine) as session:
+        for id in (1, 2):
+            session.add(
+                Submission(
+                    id=id,
+                    submission_id=f"s{id}",
+                    title="AITA",
+                    selftext="",
+                    created_utc=1700000000,
+                    permalink="",
+                    score=0,
+                )
+            )
+
+        session.commit()
+
+        # s1: c1 and c2 reply to the submission, c3 to c1
+        for id, parent_id, score in ((1, "t3_s1", 5), (2, "t3_s1", 9), (3, "t1_c1", 1)):
+            session.add(
+                Comment(
+                    id=id,
+                    submission_id="s1",
+                    message=f"Comment {id}",
+                    comment_id=f"c{id}",
+                    parent_id=parent_id,
+                    created_utc=1700000000 + id,
+                    score=score,
+                )
+            )
+
+        session.commit()
+
+    app = FastAPI()
+    app.include_router(CommentAPI(engine).router)
+
+    return TestClient(app)
+
+
+def test_comment_tree(client):
+    tree = client.get("/comments/tree", params={"submission_id": "s1"}).json()
+
+    assert [node["comment_id"] for node in tree["replies"]] == ["c2", "c1"]
+    assert [node["comment_id"] for node in tree["replies"][1]["replies"]] == ["c3"]
+
+
+def test_comment_tree_of_unknown_submission(client):
+    response = client.get("/comments/tree", params={"submission_id": "missing"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Submission not found"}
+
+    # A submission without comments has an empty tree
+    response = client.get("/comments/tree", params={"submission_id": "s2"})
+
+    assert response.status_code == 200
+    assert response.json()["replies"] == []
+
+
+def _plan(engine, query: str) -> str:
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}").all()
+
+        return "\n".join(row[3] for row in rows)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # Index only scans need the visibility map, the planner prefers scans of the
+        # whole table of a few rows
+        connection.exec_driver_sql("VACUUM ANALYZE comment")
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        connection.exec_driver_sql("SET enable_bitmapscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {query}").all()
+
+    return "\n".join(row[0] for row in rows)
+
+
+def test_threads_are_read_from_the_index(engine):
+    version = _plan(
+        engine, "SELECT count(id), max(id) FROM comment WHERE submission_id = 's1'"
+    )
+    thread = _plan(
+        engine,
+        "SELECT * FROM comment WHERE submission_id = 's1' ORDER BY score DESC, id",
+    )
+
+    if engine.dialect.name == "sqlite":
+        # Every SQLite index holds the rowid, the version is read from any of them
+        assert "COVERING INDEX" in version
+        assert thread == (
+            "SEARCH comment USING INDEX ix_comment_submission_id_score_id "
+            "(submission_id=?)"
+        )
+    else:
+        assert "Index Only Scan using ix_comment_submission_id_score_id" in version
+        assert "Index Scan using ix_comment_submission_id_score_id" in thread
+        assert "Sort" not in thread
@@ -0,0 +1,109 @@
+import importlib
+import pathlib
+
+from sqlalchemy import Column, Index, Integer, MetaData, Table, event, inspect, text
+from sqlmodel import SQLModel
+
+from endpoints.database_backend import backend_for
+from endpoints.database_config import DatabaseConfig
+from utils.migrator import Migrator
+
+# Every model, so the metadata holds the indexes of every table
+for path in sorted((pathlib.Path(__file__).parents[1] / "models").glob("*.py")):
+    importlib.import_module(f"models.{path.stem}")
+
+
+def test_upgrade_creates_every_index_once(engine, tmp_path):
+    backend = backend_for(engine.url)
+    database = inspect(engine)
+
+    for table in SQLModel.metadata.sorted_tables:
+        indexes = {index["name"] for index in database.get_indexes(table.name)}
+
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+    migrator = Migrator(engine, backend, lock_file=str(tmp_path / "migrate.lock"))
+
+    assert migrator.is_current()
+    assert migrator.upgrade() == []
+
+
+def test_upgrade_creates_every_column(engine):
+    # A new database is created by the baseline and every migration since, as existing
+    # ones were, not from the current models
+    database = inspect(engine)
+
+    for table in SQLModel.metadata.sorted_tables:
+        columns = {column["name"] for column in database.get_columns(table.name)}
+
+        assert columns == set(table.columns.keys()), table.name
+
+
+def test_postgres_leaves_no_invalid_index(postgres_engine):
+    with postgres_engine.connect() as connection:
+        invalid = connection.execute(
+            text(
+                "SELECT relname FROM pg_index JOIN pg_class ON pg_class.oid = indexrelid "
+                "WHERE NOT indisvalid"
+            )
+        ).all()
+
+    assert invalid == []
+
+
+def test_postgres_creates_indexes_concurrently(postgres_engine):
+    backend = backend_for(postgres_engine.url)
+    # On a table of its own metadata, the index is not added to the models
+    submission = Table(
+        "submission", MetaData(), Column("id", Integer), Column("score", Integer)
+    )
+    index = Index("ix_test_submission_score_id", submission.c.score, submission.c.id)
+    statements = []
+
+    @event.listens_for(postgres_engine, "before_cursor_execute")
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    backend.create_index_online(postgres_engine, index)
+
+    with postgres_engine.connect() as connection:
+        # A concurrent build that failed is left behind as an invalid index
+        connection.execute(
+            text(
+                "UPDATE pg_index SET indisvalid = false FROM pg_class "
+                "WHERE pg_class.oid = indexrelid AND relname = :name"
+            ),
+            {"name": index.name},
+        )
+        connection.commit()
+
+    backend.create_index_online(postgres_engine, index)
+    event.remove(postgres_engine, "before_cursor_execute", record)
+
+    creates = [s for s in statements if s.startswith("CREATE")]
+
+    assert len(creates) == 2
+    assert all(s.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS") for s in creates)
+    assert f"DROP INDEX CONCURRENTLY {index.name}" in statements
+
+    with postgres_engine.connect() as connection:
+        assert connection.execute(
+            text(
+                "SELECT indisvalid FROM pg_index JOIN pg_class "
+                "ON pg_class.oid = indexrelid WHERE relname = :name"
+            ),
+            {"name": index.name},
+        ).all() == [(True,)]
+
+
+def test_database_config_does_not_upgrade(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/behind.db")
+    monkeypatch.setattr(DatabaseConfig, "_instance", None)
+
+    engine = DatabaseConfig().get_engine()
+
+    assert "migrations are pending" in caplog.text
+    assert inspect(engine).get_table_names() == []
+
+    engine.dispose()
@@ -0,0 +1,39 @@
+import asyncio
+from contextlib import contextmanager
+
+from sqlmodel import Session, select
+
+from models.pipeline_run import PipelineRun
+from utils.pipeline_recorder import PipelineRecorder
+from utils.scheduler import Scheduler, Stage
+
+
+def test_stage_that_fails_before_it_is_recorded(database_config, tmp_path, monkeypatch):
+    stage = PipelineRecorder.stage
+
+    @contextmanager
+    def unavailable(self, name):
+        if name == "crawl":
+            raise ConnectionError("database is unavailable")
+
+        with stage(self, name) as run:
+            yield run
+
+    monkeypatch.setattr(PipelineRecorder, "stage", unavailable)
+
+    async def run(run: PipelineRun) -> None:
+        run.db_writes += 1
+
+    scheduler = Scheduler(
+        [Stage("crawl", run), Stage("fts", run, depends_on=["crawl"])],
+        lock_file=str(tmp_path / "ingestion.lock"),
+        status_file=str(tmp_path / "scheduler.json"),
+    )
+
+    assert asyncio.run(scheduler.run_once()) is not None
+
+    with Session(database_config.get_engine()) as session:
+        runs = session.exec(select(PipelineRun.stage, PipelineRun.status)).all()
+
+    assert runs == [("fts", "skipped")]
+    assert Scheduler.read_status(scheduler.status_file)["state"] == "idle"
@@ -0,0 +1,143 @@
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+
+from endpoints.database_backend import PostgreSQLBackend, backend_for
+from endpoints.search_query import parse_search_query
+from models.comment import Comment
+from models.submission import Submission
+
+SUBMISSIONS = [
+    ("AITA for skipping my sister's wedding", "I was asked to be the best man"),
+    ("WIBTA for leaving early", "My sister's wedding went on until 3 am"),
+    ("AITA for refusing to be a bridesmaid", "The bride picked the dresses"),
+    ("AITA for eating the cake", "It was not a wedding cake, man"),
+]
+
+COMMENTS = [
+    (1, "NTA, a wedding is not worth that"),
+    (1, "YTA, it is your sister's wedding"),
+    (1, "Why was he the best man"),
+    (2, "NTA, leaving a wedding early is fine"),
+    (3, "Nobody has to be a bridesmaid"),
+]
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        for id, (title, selftext) in enumerate(SUBMISSIONS, start=1):
+            session.add(
+                Submission(
+                    id=id,
+                    submission_id=f"s{id}",
+                    title=title,
+                    selftext=selftext,
+                    created_utc=1700000000 + id,
+                    permalink="",
+                    score=id,
+                )
+            )
+
+        session.commit()
+
+        for id, (submission, message) in enumerate(COMMENTS, start=1):
+            session.add(
+                Comment(
+                    id=id,
+                    submission_id=f"s{submission}",
+                    message=message,
+                    comment_id=f"c{id}",
+                    parent_id=f"t3_s{submission}",
+                    created_utc=1700000000 + id,
+                    score=id,
+                )
+            )
+
+        session.commit()
+
+        backend_for(engine.url).rebuild_search_index(session)
+        session.commit()
+
+        yield session
+
+
+def _search(session, query: str):
+    backend = backend_for(session.get_bind().url)
+
+    return backend.search_submission_ids(session, parse_search_query(query), 10)
+
+
+def test_every_term_must_match(session):
+    assert sorted(_search(session, "sister wedding")) == [1, 2]
+    assert _search(session, "sister bridesmaid") == []
+
+
+def test_title_matches_rank_first(session):
+    first, *rest = _search(session, "wedding")
+
+    assert first == 1
+    assert sorted(rest) == [2, 4]
+
+
+def test_phrase_prefix_and_column(session):
+    assert _search(session, '"best man"') == [1]
+    assert _search(session, '"man best"') == []
+    assert sorted(_search(session, "brid*")) == [3]
+    assert _search(session, "title:wedding") == [1]
+    assert sorted(_search(session, "selftext:wedding")) == [2, 4]
+
+
+def test_comment_search_groups_by_submission(session):
+    backend = backend_for(session.get_bind().url)
+
+    matches = backend.search_comments(session, parse_search_query("wedding"), 0, 10, 1)
+
+    # One comment per submission, the number of its matching comments and a snippet
+    assert sorted((submission, hits) for submission, hits, *_ in matches) == [
+        ("s1", 2),
+        ("s2", 1),
+    ]
+    assert all("**wedding**" in snippet for *_, snippet in matches)
+
+
+def _plan(session, statement: str, **params) -> str:
+    session.execute(text("SET LOCAL enable_seqscan = off"))
+
+    return "\n".join(
+        row[0] for row in session.execute(text(f"EXPLAIN {statement}"), params)
+    )
+
+
+def test_postgres_searches_read_the_gin_indexes(postgres_engine):
+    backend = PostgreSQLBackend(str(postgres_engine.url))
+
+    with Session(postgres_engine) as session:
+        backend.rebuild_search_index(session)
+        session.commit()
+
+        definitions = dict(
+            session.execute(
+                text(
+                    "SELECT indexname, indexdef FROM pg_indexes WHERE indexname IN "
+                    "('ix_submission_document', 'ix_comment_message_search')"
+                )
+            ).all()
+        )
+
+        assert "USING gin" in definitions["ix_submission_document"]
+        assert "USING gin" in definitions["ix_comment_message_search"]
+
+        # The expressions searched are the ones indexed, or the planner could not use them
+        assert "ix_submission_document" in _plan(
+            session,
+            f"SELECT id FROM submission WHERE {backend._DOCUMENT} "
+            "@@ to_tsquery('simple', :query)",
+            query="wedding",
+        )
+        assert "ix_comment_message_search" in _plan(
+            session,
+            f"SELECT id FROM comment WHERE {backend._MESSAGE} "
+            "@@ to_tsquery('simple', :query)",
+            query="wedding",
+        )
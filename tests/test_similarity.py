@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from sqlalchemy import event, insert
+from sqlmodel import Session, select
+
+from models.pipeline_run import PipelineRun
+from models.similar_submission import SimilarSubmission
+from models.submission import Submission
+from utils.similarity import SimilarityProcessor
+
+WORDS = ["sister", "wedding", "cake", "dog", "rent", "roommate", "car", "money", "job"]
+
+
+@pytest.fixture
+def processor(database_config, tmp_path, monkeypatch):
+    monkeypatch.setenv("SIMILARITY_STATE_FILE", str(tmp_path / "similarity.npz"))
+    monkeypatch.setattr(SimilarityProcessor, "_instance", None)
+
+    rng = random.Random(44)
+
+    with Session(database_config.get_engine()) as session:
+        for id in range(1, 41):
+            session.add(
+                Submission(
+                    id=id,
+                    submission_id=f"s{id}",
+                    title=" ".join(rng.choices(WORDS, k=4)),
+                    selftext=" ".join(rng.choices(WORDS, k=30)),
+                    created_utc=1700000000 + id,
+                    permalink="",
+                    score=0,
+                )
+            )
+
+        # Neighbors of a submission that is no longer there
+        session.execute(
+            insert(SimilarSubmission),
+            [{"submission_id": 99, "rank": 0, "similar_id": 1, "similarity": 0.5}],
+        )
+        session.commit()
+
+    return SimilarityProcessor()
+
+
+def _neighbors(engine) -> dict:
+    with Session(engine) as session:
+        rows = session.exec(
+            select(
+                SimilarSubmission.submission_id, SimilarSubmission.similar_id
+            ).order_by(SimilarSubmission.submission_id, SimilarSubmission.rank)
+        ).all()
+
+    neighbors = {}
+
+    for submission_id, similar_id in rows:
+        neighbors.setdefault(submission_id, []).append(similar_id)
+
+    return neighbors
+
+
+def test_build_commits_each_block(processor, monkeypatch):
+    engine = processor.engine
+    commits = []
+
+    def count(connection):
+        commits.append(connection)
+
+    processor._build(PipelineRun(started_at=0))
+    whole = _neighbors(engine)
+
+    # Blocks of a few rows
+    monkeypatch.setattr(SimilarityProcessor, "_BLOCK_BYTES", 16 * 40 * 8)
+    event.listen(engine, "commit", count)
+    processor._build(PipelineRun(started_at=0))
+    event.remove(engine, "commit", count)
+
+    assert len(commits) > 2
+    assert _neighbors(engine) == whole
+    assert sorted(whole) == list(range(1, 41))
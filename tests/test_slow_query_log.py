@@ -0,0 +1,34 @@
+from sqlalchemy import text
+from sqlmodel import Session
+
+from endpoints.slow_query_log import SlowQueryLog
+
+
+def test_slow_queries_are_recorded_with_their_plan(engine):
+    log = SlowQueryLog(engine, threshold_ms=0)
+
+    with Session(engine) as session:
+        session.execute(
+            text("SELECT id FROM submission WHERE score > :score"), {"score": 1}
+        )
+
+    (query,) = [
+        query for query in log.read_slow_queries() if "score >" in query.statement
+    ]
+
+    assert len(query.plan) > 0
+    assert not query.plan[0].startswith("EXPLAIN failed")
+
+
+def test_a_failed_explain_leaves_the_transaction_usable(engine):
+    log = SlowQueryLog(engine, threshold_ms=1000)
+
+    with Session(engine) as session:
+        session.execute(text("SELECT count(*) FROM submission"))
+        cursor = session.connection().connection.cursor()
+
+        # As recorded after a statement the backend cannot explain
+        log._record(cursor, "SELECT * FROM missing_table", {}, 1.0, False)
+
+        assert log.read_slow_queries()[0].plan[0].startswith("EXPLAIN failed")
+        assert session.execute(text("SELECT count(*) FROM submission")).scalar() == 0
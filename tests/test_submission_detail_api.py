@@ -0,0 +1,74 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from endpoints.submission_detail_api import SubmissionDetailAPI
+from models.breakdown import Breakdown
+from models.comment import Comment
+from models.submission import Submission
+
+
+@pytest.fixture
+def client(engine):
+    with Session(engine) as session:
+        session.add(
+            Submission(
+                id=1,
+                submission_id="s1",
+                title="AITA",
+                selftext="",
+                created_utc=1700000000,
+                permalink="",
+                score=0,
+            )
+        )
+        session.commit()
+
+    app = FastAPI()
+    app.include_router(SubmissionDetailAPI(engine).router)
+
+    return TestClient(app)
+
+
+def test_detail_cache_follows_writes(client, engine):
+    def read():
+        response = client.get("/submission/1/detail")
+
+        return response.headers["X-Cache"], response.json()
+
+    assert read()[0] == "MISS"
+    assert read()[0] == "HIT"
+
+    # Written as the pipeline does, outside of the API
+    with Session(engine) as session:
+        session.add(Breakdown(id=1, nta=3, yta=1, esh=0, info=0, nah=0))
+        session.commit()
+
+    cache, detail = read()
+
+    assert cache == "MISS"
+    assert detail["breakdown"]["nta"] == 3
+
+    with Session(engine) as session:
+        session.add(
+            Comment(
+                submission_id="s1",
+                message="NTA",
+                comment_id="c1",
+                parent_id="t3_s1",
+                created_utc=1700000001,
+                score=1,
+            )
+        )
+        session.commit()
+
+    cache, detail = read()
+
+    assert cache == "MISS"
+    assert [comment["comment_id"] for comment in detail["comments"]] == ["c1"]
+    assert read()[0] == "HIT"
+
+
+def test_detail_of_unknown_submission(client):
+    assert client.get("/submission/2/detail").status_code == 404
@@ -0,0 +1,158 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from models.breakdown import Breakdown
+from models.submission import Submission
+from models.summary import EMOTIONS, Summary
+from models.trend import TrendBucket
+from utils.analytics import AnalyticsProcessor
+from utils.trends import TOTALS, UNITS, VERDICTS, TrendRollup
+
+
+def _utc(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+# Creation times on both sides of the ends of days, weeks (Monday) and months
+CREATED = [
+    _utc(2023, 12, 31, 23, 59, 59),
+    _utc(2024, 1, 1),
+    _utc(2024, 1, 1, 0, 0, 1),
+    _utc(2024, 1, 7, 23, 59, 59, 500000),
+    _utc(2024, 1, 8),
+    _utc(2024, 1, 31, 12),
+    _utc(2024, 2, 1),
+    _utc(2024, 2, 29, 23, 59, 59),
+    _utc(2024, 3, 1, 0, 0, 0, 250000),
+    _utc(2024, 3, 4, 8),
+]
+
+
+def _bucket(created_utc: float, unit: str) -> int:
+    day = datetime.fromtimestamp(created_utc, timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+    match unit:
+        case "day":
+            start = day
+        case "week":
+            start = day - timedelta(days=day.weekday())
+        case "month":
+            start = day.replace(day=1)
+
+    return int(start.timestamp())
+
+
+def _analysis(rng: random.Random, id: int):
+    emotion = {name: rng.randint(0, 5) for name in rng.sample(EMOTIONS, 3)}
+    summary = Summary(
+        id=id,
+        afinn=rng.uniform(-20, 20),
+        emotion=emotion,
+        word_freq={},
+        counts={},
+        no_of_replies=rng.randint(1, 50),
+    )
+    breakdown = Breakdown(
+        id=id, **{verdict: rng.randint(0, 10) for verdict in VERDICTS}
+    )
+
+    return summary, breakdown
+
+
+def _expected(engine) -> dict:
+    """Buckets computed from the stored analyses, in Python rather than SQL"""
+    totals = {}
+
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Submission.created_utc, Summary, Breakdown)
+            .join(Summary, Summary.id == Submission.id)
+            .join(Breakdown, Breakdown.id == Submission.id)
+        ).all()
+
+    for created_utc, summary, breakdown in rows:
+        for unit in UNITS:
+            bucket = totals.setdefault((unit, _bucket(created_utc, unit)), Counter())
+            bucket["submissions"] += 1
+            bucket["afinn_sum"] += summary.afinn
+
+            for verdict in VERDICTS:
+                bucket[verdict] += getattr(breakdown, verdict)
+
+    return {
+        key: tuple(round(bucket[column], 6) for column in TOTALS)
+        for key, bucket in totals.items()
+    }
+
+
+def _stored(engine) -> dict:
+    with Session(engine) as session:
+        buckets = session.exec(select(TrendBucket)).all()
+
+    return {
+        (bucket.unit, bucket.bucket): tuple(
+            round(getattr(bucket, column), 6) for column in TOTALS
+        )
+        for bucket in buckets
+        if any(getattr(bucket, column) for column in TOTALS)
+    }
+
+
+@pytest.fixture
+def processor(database_config, monkeypatch):
+    monkeypatch.setattr(AnalyticsProcessor, "_instance", None)
+
+    with Session(database_config.get_engine()) as session:
+        for id, created_utc in enumerate(CREATED, start=1):
+            session.add(
+                Submission(
+                    id=id,
+                    submission_id=f"s{id}",
+                    title=f"Submission {id}",
+                    selftext="",
+                    created_utc=created_utc,
+                    permalink="",
+                    score=0,
+                )
+            )
+
+        # Never analysed, in no bucket
+        session.add(
+            Submission(
+                id=len(CREATED) + 1,
+                submission_id="unseen",
+                title="Unseen",
+                selftext="",
+                created_utc=CREATED[0],
+                permalink="",
+                score=0,
+            )
+        )
+        session.commit()
+
+    return AnalyticsProcessor()
+
+
+def test_incremental_buckets_match_a_recompute(processor):
+    rng = random.Random(46)
+    engine = processor.engine
+
+    ids = list(range(1, len(CREATED) + 1))
+
+    # Every submission is analysed, then some again as comments and verdicts change
+    for attempt, analysed in enumerate([ids, *(rng.sample(ids, 4) for _ in range(3))]):
+        for id in analysed:
+            processor._store(id, *_analysis(rng, id))
+
+        expected = _expected(engine)
+
+        assert _stored(engine) == expected, f"after analysis {attempt}"
+
+    assert {unit for unit, _ in expected} == set(UNITS)
+    assert TrendRollup(engine).differences() == []
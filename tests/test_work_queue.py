@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from models.work_item import WorkItem
+from utils.work_queue import WorkQueue
+
+
+def test_enqueue_dequeue_ack(engine):
+    queue = WorkQueue("test", engine)
+
+    assert queue.enqueue([1, 2, 3]) == 3
+    # Pending items are left as they are
+    assert queue.enqueue([1]) == 0
+
+    items = queue.dequeue(2)
+
+    assert len(items) == 2
+    assert all(item.status == "in_flight" and item.attempts == 1 for item in items)
+    assert [item.submission_id for item in queue.dequeue(2)] == [
+        ({1, 2, 3} - {item.submission_id for item in items}).pop()
+    ]
+    assert queue.dequeue() == []
+
+    assert queue.ack(items[0]) is True
+    assert queue.depth().done == 1
+    assert queue.depth().in_flight == 2
+
+    # Done items are queued again
+    assert queue.enqueue([items[0].submission_id]) == 1
+
+
+def test_failed_items_back_off_then_dead_letter(engine):
+    queue = WorkQueue("test", engine, max_attempts=2, backoff=0)
+    queue.enqueue([1])
+
+    (item,) = queue.dequeue()
+    assert queue.fail(item, "first") is True
+
+    (item,) = queue.dequeue()
+    assert item.attempts == 2
+    assert item.last_error == "first"
+    assert queue.fail(item, "second") is True
+
+    assert queue.dequeue() == []
+    assert queue.depth().dead == 1
+
+    queue = WorkQueue("test", engine, backoff=3600)
+    queue.enqueue([2])
+
+    (item,) = queue.dequeue()
+    queue.fail(item, "later")
+
+    assert queue.ready() == 0
+    assert queue.dequeue() == []
+
+
+def test_expired_leases_are_taken_over(engine):
+    queue = WorkQueue("test", engine, visibility_timeout=0, max_attempts=2)
+    queue.enqueue([1])
+
+    (stale,) = queue.dequeue()
+    (item,) = queue.dequeue()
+
+    assert item.attempts == 2
+    # The worker whose lease expired can no longer change the item
+    assert queue.ack(stale) is False
+    assert queue.fail(stale, "late") is False
+
+    # A lease that expires on the last attempt is dead lettered
+    assert queue.dequeue() == []
+    assert queue.depth().dead == 1
+
+
+def test_concurrent_workers_lease_each_item_once(engine):
+    queue = WorkQueue("test", engine)
+    queue.enqueue(range(200))
+
+    def work():
+        leased = []
+
+        while items := queue.dequeue(7):
+            leased.extend(item.submission_id for item in items)
+
+        return leased
+
+    with ThreadPoolExecutor(4) as executor:
+        leased = [
+            submission_id
+            for worker in [executor.submit(work) for _ in range(4)]
+            for submission_id in worker.result()
+        ]
+
+    assert sorted(leased) == list(range(200))
+
+
+def test_postgres_skips_locked_items(postgres_engine):
+    queue = WorkQueue("test", postgres_engine)
+    queue.enqueue([1, 2, 3])
+
+    with Session(postgres_engine) as session:
+        # Another worker in the middle of leasing the oldest item
+        locked = session.exec(
+            text(
+                "SELECT id FROM work_item ORDER BY available_at, id LIMIT 1 FOR UPDATE"
+            )
+        ).one()[0]
+
+        leased = []
+        worker = threading.Thread(target=lambda: leased.extend(queue.dequeue(3)))
+        worker.start()
+        worker.join(timeout=10)
+
+        assert not worker.is_alive(), "dequeue waited for the locked item"
+        assert len(leased) == 2
+        assert locked not in {item.id for item in leased}
+
+        session.rollback()
+
+    (item,) = queue.dequeue()
+    assert item.id == locked
+    assert isinstance(item, WorkItem)
@@ -1,14 +1,14 @@
 # Perform sentiment analysis and then create JSON files that will be used for application
-import calendar
+import os
 import re
-from datetime import datetime, timedelta
-from threading import Thread
+from typing import Dict, List, Tuple
 
-from afinn import Afinn
+from dotenv import find_dotenv, load_dotenv
 from nltk.corpus import stopwords
 from nltk.probability import FreqDist
 from nltk.tokenize import word_tokenize
-from nrclex import NRCLex
+from sqlalchemy import insert
+from sqlmodel import Session
 
 from endpoints.breakdown_api import BreakdownAPI
 from endpoints.comment_api import CommentAPI
@@ -16,7 +16,12 @@ from endpoints.database_config import DatabaseConfig
 from endpoints.submission_api import SubmissionAPI
 from endpoints.summary_api import SummaryAPI
 from models.breakdown import Breakdown
-from models.summary import Summary
+from models.comment_sentiment import CommentSentiment
+from models.pipeline_run import PipelineRun
+from models.summary import EMOTIONS, Summary
+from utils.lexicon import LexiconScorer, sentiment_rows
+from utils.trends import TrendRollup
+from utils.work_queue import ANALYTICS_QUEUE, WorkQueue
 
 
 class AnalyticsProcessor:
@@ -29,125 +34,169 @@ class AnalyticsProcessor:
         self.summary_api = SummaryAPI(self.engine)
         self.breakdown_api = BreakdownAPI(self.engine)
         self.comment_api = CommentAPI(self.engine)
+        self.queue = WorkQueue(ANALYTICS_QUEUE, self.engine)
+        self.trends = TrendRollup(self.engine)
+        self.lexicon = LexiconScorer()
+
+        load_dotenv(find_dotenv())
+        self.workers = int(os.environ.get("ANALYTICS_WORKERS", 1))
 
     def __new__(cls, verbose: bool = False):
         if cls._instance is None:
             cls._instance = super(AnalyticsProcessor, cls).__new__(cls)
             cls._instance._configure_processor()
             cls._instance._verbose = verbose
-            cls._instance._function_thread = Thread()
 
         return cls._instance
 
-    async def process(self):
-        if self._function_thread.is_alive():
-            return
+    async def process(self, run: PipelineRun = None):
+        if run is None:
+            run = PipelineRun(started_at=0)
 
-        try:
-            self._function_thread = Thread(target=self._process)
-            self._function_thread.start()
-        except RuntimeError as e:
-            self._verbose is True and print(e)
+        def analyse(id: int):
+            self._analyse_submission(self._get_submission(id))
+            run.db_writes += 2
 
-    def _process(self):
-        afinn = Afinn()
+        # Runs are kept from overlapping by the scheduler's lock, see utils/scheduler.py
+        await self.queue.drain(
+            analyse, run, workers=self.workers, verbose=self._verbose
+        )
 
-        submissions = self._get_submissions()
+        self._verbose is True and print(
+            f"Processing of {run.items_out} analytics completed",
+            flush=True,
+        )
 
-        for submission in submissions:
-            result = {"id": 0, "afinn": 0, "emotion": 0, "word_freq": 0, "counts": 0}
+    def _analyse_submission(self, submission: dict):
+        result = {"id": 0, "afinn": 0, "emotion": 0, "word_freq": 0, "counts": 0}
 
-            replies = ""
+        replies = ""
 
-            self._verbose is True and print(
-                f"Creating analysis for {str(submission['id'])} {submission['title']}",
-                flush=True,
-            )
+        self._verbose is True and print(
+            f"Creating analysis for {str(submission['id'])} {submission['title']}",
+            flush=True,
+        )
 
-            for reply in submission["replies"]:
-                replies = replies + reply
-
-            result["id"] = submission["id"]
-            result["afinn"] = afinn.score(replies)
-            result["emotion"] = NRCLex(replies).raw_emotion_scores
-            frequencies = self._word_frequency(replies)
-            result["word_freq"] = frequencies[0]
-            result["no_of_replies"] = len(submission["replies"])
-            result["counts"] = frequencies[1]
-
-            summary: Summary = Summary()
-
-            summary.id = result["id"]
-            summary.afinn = result["afinn"]
-            summary.counts = result["counts"]
-            summary.emotion = result["emotion"]
-            summary.word_freq = result["word_freq"]
-
-            nta_count = summary.counts.get("nta_count")
-            yta_count = summary.counts.get("yta_count")
-            esh_count = summary.counts.get("esh_count")
-            info_count = summary.counts.get("info_count")
-            nah_count = summary.counts.get("nah_count")
-
-            breakdown = Breakdown(
-                id=result["id"],
-                nta=nta_count,
-                yta=yta_count,
-                esh=esh_count,
-                info=info_count,
-                nah=nah_count,
-            )
+        for reply in submission["replies"]:
+            replies = replies + reply
 
-            id = result["id"]
+        # Each reply is scored on its own, the submission's scores are their sums
+        scores = self.lexicon.score(submission["replies"])
+        afinn, emotions, _ = scores
 
-            self.summary_api.upsert_summary(id, summary)
-            self.breakdown_api.upsert_breakdown(id, breakdown)
+        result["id"] = submission["id"]
+        result["afinn"] = float(afinn.sum())
+        result["emotion"] = {
+            emotion: total
+            for emotion, total in zip(EMOTIONS, emotions.sum(axis=0).tolist())
+            if total > 0
+        }
+        frequencies = self._word_frequency(replies)
+        result["word_freq"] = frequencies[0]
+        result["no_of_replies"] = len(submission["replies"])
+        result["counts"] = frequencies[1]
+
+        summary: Summary = Summary()
+
+        summary.id = result["id"]
+        summary.afinn = result["afinn"]
+        summary.counts = result["counts"]
+        summary.emotion = result["emotion"]
+        summary.word_freq = result["word_freq"]
+        summary.no_of_replies = result["no_of_replies"]
+
+        nta_count = summary.counts.get("nta_count")
+        yta_count = summary.counts.get("yta_count")
+        esh_count = summary.counts.get("esh_count")
+        info_count = summary.counts.get("info_count")
+        nah_count = summary.counts.get("nah_count")
+
+        breakdown = Breakdown(
+            id=result["id"],
+            nta=nta_count,
+            yta=yta_count,
+            esh=esh_count,
+            info=info_count,
+            nah=nah_count,
+        )
 
-        self._verbose is True and print(
-            f"Processing of {len(submissions)} analytics completed",
-            flush=True,
+        self._store(
+            result["id"],
+            summary,
+            breakdown,
+            list(zip(submission["reply_ids"], submission["replies"])),
+            sentiment_rows(
+                [(reply_id, result["id"]) for reply_id in submission["reply_ids"]],
+                scores,
+            ),
         )
 
-    def _get_submissions(self):
-        today = datetime.today()
-        start = datetime(today.year, today.month, today.day) + timedelta(1)
-        yesterday = start - timedelta(2)
+    def _store(
+        self,
+        id: int,
+        summary: Summary,
+        breakdown: Breakdown,
+        replies: List[Tuple[int, str]] = (),
+        sentiments: List[Dict] = (),
+    ) -> None:
+        """
+        Upserts the summary and breakdown of a submission and adds the change to its trend
+        buckets, with the words and sentiment of the replies not counted yet, in one
+        transaction so the buckets always match the stored analyses.
+        """
+        with Session(self.engine) as session:
+            self.trends.record(
+                session,
+                id,
+                previous=(session.get(Summary, id), session.get(Breakdown, id)),
+                current=(summary, breakdown),
+            )
 
-        # Convert time to UTC time
-        start_utc = calendar.timegm(start.timetuple())
-        yesterday_utc = calendar.timegm(yesterday.timetuple())
+            counted = self.trends.last_counted_comment(session, id)
+            new_replies = [
+                (reply_id, reply) for reply_id, reply in replies if reply_id > counted
+            ]
 
-        submissions = self.submission_api.search_submission(
-            start_utc=yesterday_utc, end_utc=start_utc, limit=10000
-        )
+            if len(new_replies) > 0:
+                words = self._words(" ".join(reply for _, reply in new_replies))
 
-        submissions_json = []
+                self.trends.record_words(
+                    session,
+                    id,
+                    FreqDist(words),
+                    max(reply_id for reply_id, _ in new_replies),
+                )
 
-        self._verbose is True and print(f"Total submissions is {str(len(submissions))}")
+            new_sentiments = [row for row in sentiments if row["id"] > counted]
 
-        for submission in submissions:
-            comments = self.comment_api.search_comments(
-                submission_id=submission.submission_id
-            )
+            if len(new_sentiments) > 0:
+                session.execute(insert(CommentSentiment), new_sentiments)
 
-            submission_dict = submission.__dict__
+            session.merge(summary)
+            session.merge(breakdown)
+            session.commit()
 
-            replies = []
-            for reply in comments:
-                replies.append(reply.message)
-            submission_dict["replies"] = replies
+    def _get_submission(self, id: int) -> dict:
+        submission = self.submission_api.read_submission(id)
+        comments = self.comment_api.read_comments_by_submission_id(
+            submission.submission_id
+        )
 
-            submissions_json.append(submission_dict)
+        submission_dict = submission.__dict__
+        submission_dict["replies"] = [reply.message for reply in comments]
+        submission_dict["reply_ids"] = [reply.id for reply in comments]
 
-        return submissions_json
+        return submission_dict
 
-    def _word_frequency(self, text):
+    def _words(self, text: str) -> List[str]:
         text = text.lower().replace(".", " ")
         text = re.sub("\\W+", " ", text)
         text = word_tokenize(text)
-        text = self._remove_stop_words(text)
 
-        fdist = FreqDist(text)  # .most_common(10)
+        return self._remove_stop_words(text)
+
+    def _word_frequency(self, text):
+        fdist = FreqDist(self._words(text))  # .most_common(10)
 
         freq = dict(fdist)
         nta_count = 0
@@ -1,4 +1,5 @@
 import os
+from typing import Tuple
 
 import asyncpraw
 from asyncpraw.models import MoreComments
@@ -9,7 +10,10 @@ from endpoints.comment_api import CommentAPI
 from endpoints.database_config import DatabaseConfig
 from endpoints.submission_api import SubmissionAPI
 from models.comment import Comment
+from models.pipeline_run import PipelineRun
 from models.submission import Submission
+from utils.near_duplicates import NearDuplicateIndex
+from utils.work_queue import ANALYTICS_QUEUE, OPENAI_QUEUE, WorkQueue
 
 
 class Crawler:
@@ -40,7 +44,10 @@ class Crawler:
 
         return cls._instance
 
-    async def process(self) -> None:
+    async def process(self, run: PipelineRun = None) -> None:
+        if run is None:
+            run = PipelineRun(started_at=0)
+
         async with asyncpraw.Reddit(
             client_id=self.client_id,
             client_secret=self.client_secret,
@@ -55,6 +62,10 @@ class Crawler:
             submission_api = SubmissionAPI(engine)
             comment_api = CommentAPI(engine)
 
+            analytics_queue = WorkQueue(ANALYTICS_QUEUE, engine)
+            openai_queue = WorkQueue(OPENAI_QUEUE, engine)
+            duplicates = NearDuplicateIndex(engine)
+
             self._verbose is True and print("Creating/Updating submission")
 
             subreddit = await reddit.subreddit(self.subreddit_name, fetch=True)
@@ -70,31 +81,19 @@ class Crawler:
                 custom_submission.permalink = submission.permalink
                 custom_submission.score = submission.score
 
+                run.items_in += 1
+                run.bytes_fetched += len(submission.title.encode()) + len(
+                    submission.selftext.encode()
+                )
+
                 if submission.selftext == "[removed]":
                     continue
 
-                response = Response()
-
                 try:
-                    results = submission_api.search_submission(
-                        response=response,
-                        submission_id=custom_submission.submission_id,
-                        limit=1,
+                    custom_submission, changed = self._upsert_submission(
+                        submission_api, duplicates, openai_queue, custom_submission
                     )
-
-                    if len(results) == 0:
-                        self._verbose is True and print(
-                            f"Creating submission for {custom_submission.title}"
-                        )
-                        submission_api.create_submission(custom_submission)
-                    else:
-                        custom_submission.id = results[0].id
-                        self._verbose is True and print(
-                            f"Updating submission for {results[0].id} {custom_submission.title}"
-                        )
-                        submission_api.update_submission(
-                            results[0].id, custom_submission
-                        )
+                    run.db_writes += 1
 
                     comments = await submission.comments()
                     await comments.replace_more(limit=0)
@@ -112,12 +111,71 @@ class Crawler:
                         custom_comment.score = comment.score
                         custom_comment.comment_id = comment.id
 
-                        results = comment_api.search_comments(
-                            comment_id=custom_comment.comment_id
+                        run.bytes_fetched += len(comment.body.encode())
+
+                        results = comment_api.read_comment_by_comment_id(
+                            custom_comment.comment_id
                         )
 
                         if len(results) == 0:
                             comment_api.create_comment(custom_comment)
+                            run.db_writes += 1
+                            changed = True
+
+                    # Only submissions with new text or replies need to be analysed again
+                    if changed:
+                        analytics_queue.enqueue([custom_submission.id])
+
+                    run.items_out += 1
 
                 except Exception as error:
+                    run.errors += 1
                     self._verbose is True and print(error)
+
+    def _upsert_submission(
+        self,
+        submission_api: SubmissionAPI,
+        duplicates: NearDuplicateIndex,
+        openai_queue: WorkQueue,
+        submission: Submission,
+    ) -> Tuple[Submission, bool]:
+        """
+        Creates or updates a crawled submission and returns it with whether its text changed.
+        New submissions are queued for OpenAI, new and edited ones are checked for near
+        duplicates.
+        """
+        results = submission_api.search_submission(
+            response=Response(), submission_id=submission.submission_id, limit=1
+        )
+
+        if len(results) == 0:
+            self._verbose is True and print(
+                f"Creating submission for {submission.title}"
+            )
+            submission = submission_api.create_submission(submission)
+            self._link_duplicate(duplicates, submission)
+            openai_queue.enqueue([submission.id])
+
+            return submission, True
+
+        submission.id = results[0].id
+        changed = results[0].selftext != submission.selftext
+        self._verbose is True and print(
+            f"Updating submission for {results[0].id} {submission.title}"
+        )
+        submission_api.update_submission(results[0].id, submission)
+
+        if changed:
+            self._link_duplicate(duplicates, submission)
+
+        return submission, changed
+
+    def _link_duplicate(
+        self, duplicates: NearDuplicateIndex, submission: Submission
+    ) -> None:
+        canonical_id = duplicates.index(submission.id, submission.selftext)
+
+        if canonical_id is not None:
+            self._verbose is True and print(
+                f"Submission {submission.id} is a near duplicate of {canonical_id}"
+            )
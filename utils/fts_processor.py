@@ -1,8 +1,8 @@
-import sqlalchemy
 from dotenv import find_dotenv, load_dotenv
 from sqlmodel import Session
 
 from endpoints.database_config import DatabaseConfig
+from models.pipeline_run import PipelineRun
 
 
 class FTSProcessor:
@@ -14,6 +14,7 @@ class FTSProcessor:
 
         database_config = DatabaseConfig()
         self.engine = database_config.get_engine()
+        self.backend = database_config.get_backend()
 
     def __new__(cls, verbose: bool = False):
         if cls._instance is None:
@@ -23,39 +24,21 @@ class FTSProcessor:
 
         return cls._instance
 
-    def process(self) -> None:
+    def process(self, run: PipelineRun = None) -> None:
+        if run is None:
+            run = PipelineRun(started_at=0)
+
         try:
             with Session(self.engine) as session:
-                statement = """
-                    DROP TABLE IF EXISTS submission_fts;
-                """
-
-                sqlText = sqlalchemy.sql.text(statement)
-
-                session.exec(sqlText)
-
-                statement = """
-                    CREATE VIRTUAL TABLE submission_fts
-                    USING fts5(id, title, selftext, tokenize="trigram case_sensitive 1");
-                """
-
-                sqlText = sqlalchemy.sql.text(statement)
+                rows = self.backend.rebuild_search_index(session)
 
-                session.exec(sqlText)
-
-                statement = """
-                    INSERT INTO submission_fts SELECT id, title, selftext FROM submission;
-                """
-
-                sqlText = sqlalchemy.sql.text(statement)
-
-                session.exec(sqlText)
+                run.items_in = rows
+                run.items_out = rows
+                run.db_writes = rows
 
                 session.commit()
-
-                session.close()
-
         except Exception as e:
+            run.errors += 1
             print(e)
 
 
@@ -0,0 +1,192 @@
+# Scores the sentiment of comments with the AFINN and NRC emotion lexicons
+#
+# Every comment is tokenized once, and its words looked up in one hash map holding the words
+# of both lexicons, which gives an index into a matrix of their AFINN score and NRC emotions.
+# The scores of a batch of comments are one gather and one cumulative sum over that matrix.
+# AFINN phrases ("does not work", "self-confident") replace the scores of their words, as
+# the afinn package matches the longest phrase first.
+#
+# Comments are scored on their own, a reply no longer runs into the next as in the
+# concatenation scored before, and every word is lowercased for NRC as it is for AFINN.
+#
+# Usage: python -m utils.lexicon, scores the comments counted by the analytics stage before
+# comment sentiment was stored
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from afinn import Afinn
+from nrclex import NRCLex
+from sqlalchemy import Engine, insert
+from sqlmodel import Session, select
+
+from endpoints.database_config import DatabaseConfig
+from models.comment import Comment
+from models.comment_sentiment import CommentSentiment
+from models.submission import Submission
+from models.summary import EMOTIONS
+from models.trend import WordCountProgress
+
+# Words as the afinn package sees them, its patterns match between word boundaries
+_WORD = re.compile(r"\w+")
+
+
+class LexiconScorer:
+    def __init__(self):
+        afinn = Afinn()._dict
+        words = sorted(
+            {word for word in afinn if _WORD.fullmatch(word)} | set(NRCLex.lexicon)
+        )
+
+        # Id 0 is every word in neither lexicon
+        self._ids = {word: id for id, word in enumerate(words, start=1)}
+
+        # Column 0 is the AFINN score, then one column per emotion of EMOTIONS
+        self._weights = np.zeros((len(words) + 1, 1 + len(EMOTIONS)))
+
+        for word, id in self._ids.items():
+            self._weights[id, 0] = afinn.get(word, 0)
+
+            for emotion in NRCLex.lexicon.get(word, ()):
+                self._weights[id, 1 + EMOTIONS.index(emotion)] += 1
+
+        # Phrases and hyphenated words by their words, "can't stand" is (can, t, stand)
+        self._phrases = {}
+
+        for phrase, score in afinn.items():
+            if not _WORD.fullmatch(phrase):
+                self._phrases.setdefault(tuple(_WORD.findall(phrase)), score)
+
+        self._phrase_starts = {phrase[0] for phrase in self._phrases}
+        self._longest_phrase = max(len(phrase) for phrase in self._phrases)
+
+    def _phrase_correction(self, words: List[str], ids: List[int]) -> float:
+        """Returns what the AFINN phrases in words change in the sum of their word scores"""
+        correction = 0.0
+        position = 0
+
+        while position < len(words):
+            if words[position] in self._phrase_starts:
+                for length in range(self._longest_phrase, 1, -1):
+                    score = self._phrases.get(
+                        tuple(words[position : position + length])
+                    )
+
+                    if score is not None:
+                        correction += score - sum(
+                            self._weights[id, 0]
+                            for id in ids[position : position + length]
+                        )
+                        position += length - 1
+                        break
+
+            position += 1
+
+        return correction
+
+    def score(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the AFINN score, the NRC emotion counts in the order of EMOTIONS and the
+        number of words of each text
+        """
+        ids = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        corrections = np.zeros(len(texts))
+
+        for number, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            text_ids = [self._ids.get(word, 0) for word in words]
+
+            if not self._phrase_starts.isdisjoint(words):
+                corrections[number] = self._phrase_correction(words, text_ids)
+
+            ids.extend(text_ids)
+            lengths[number] = len(words)
+
+        # Sums of the rows of each text, as differences of the cumulative sum at its ends
+        sums = np.zeros((len(ids) + 1, self._weights.shape[1]))
+        np.cumsum(self._weights[np.array(ids, dtype=np.int64)], axis=0, out=sums[1:])
+        ends = np.cumsum(lengths)
+        totals = sums[ends] - sums[ends - lengths]
+
+        return totals[:, 0] + corrections, totals[:, 1:].astype(np.int64), lengths
+
+
+def sentiment_rows(
+    comments: Sequence[Tuple[int, int]],
+    scores: Tuple[np.ndarray, np.ndarray, np.ndarray],
+) -> List[Dict]:
+    """
+    Returns the CommentSentiment rows of (comment id, submission id) pairs, given the
+    scores of their texts
+    """
+    afinn, emotions, words = scores
+
+    return [
+        {
+            "id": comment_id,
+            "submission_id": submission_id,
+            "afinn": float(afinn[number]),
+            "words": int(words[number]),
+            **dict(zip(EMOTIONS, emotions[number].tolist())),
+        }
+        for number, (comment_id, submission_id) in enumerate(comments)
+    ]
+
+
+def score_counted_comments(
+    engine: Engine, batch_size: int = 5000, verbose: bool = False
+) -> int:
+    """
+    Stores the sentiment of the comments the analytics stage counted the words of, the
+    comments it has not seen yet are scored when it analyses their submission. Returns
+    the number of comments scored.
+    """
+    scorer = LexiconScorer()
+    scored = 0
+    last_id = 0
+
+    while True:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Comment.id, Submission.id, Comment.message)
+                .join(Submission, Submission.submission_id == Comment.submission_id)
+                .join(
+                    WordCountProgress, WordCountProgress.submission_id == Submission.id
+                )
+                .outerjoin(CommentSentiment, CommentSentiment.id == Comment.id)
+                .where(
+                    Comment.id > last_id,
+                    Comment.id <= WordCountProgress.last_comment_id,
+                    CommentSentiment.id.is_(None),
+                )
+                .order_by(Comment.id)
+                .limit(batch_size)
+            ).all()
+
+            if len(rows) == 0:
+                return scored
+
+            session.execute(
+                insert(CommentSentiment),
+                sentiment_rows(
+                    [
+                        (comment_id, submission_id)
+                        for comment_id, submission_id, _ in rows
+                    ],
+                    scorer.score([message for _, _, message in rows]),
+                ),
+            )
+            session.commit()
+
+        scored += len(rows)
+        last_id = rows[-1][0]
+
+        verbose is True and print(f"Scored {scored} comments", flush=True)
+
+
+if __name__ == "__main__":
+    print(
+        f"{score_counted_comments(DatabaseConfig().get_engine(), verbose=True)} "
+        "comments scored"
+    )
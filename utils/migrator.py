@@ -0,0 +1,228 @@
+# Versioned schema migrations
+#
+# Every module in migrations/ named v<version>_<name>.py is one migration, applied in order
+# of version. A migration defines upgrade(migration), which receives a Migration.
+#
+# Migrations that backfill existing rows commit one batch at a time, so the analytics stage
+# is not blocked by the whole table.
+#
+# Usage:
+#   python -m utils.migrator status
+#   python -m utils.migrator upgrade
+#   python -m utils.migrator history
+import argparse
+import fcntl
+import importlib
+import os
+import re
+import time
+from typing import List, Optional
+
+from sqlalchemy import Engine, inspect
+from sqlmodel import Session, SQLModel, func, select
+
+from endpoints.database_backend import DatabaseBackend
+from models.schema_migration import SchemaMigration
+
+MIGRATIONS_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"
+)
+LOCK_FILE = "database/migrate.lock"
+
+_MIGRATION_FILE = re.compile(r"^v(\d+)_(\w+)\.py$")
+
+
+class Migration:
+    """
+    The operations available to a migration. They are idempotent, so a migration that was
+    interrupted can be run again.
+    """
+
+    def __init__(self, engine: Engine, backend: DatabaseBackend, verbose: bool = False):
+        self.engine = engine
+        self.backend = backend
+        self._verbose = verbose
+
+    def create_tables(self, models: List[type]) -> None:
+        SQLModel.metadata.create_all(
+            self.engine, tables=[model.__table__ for model in models]
+        )
+
+    def create_index(self, model: type, name: str) -> None:
+        """
+        Creates an index declared on a model, without blocking writes for the whole build
+        where the backend supports it.
+        """
+        (index,) = [index for index in model.__table__.indexes if index.name == name]
+
+        start = time.perf_counter()
+        self.backend.create_index_online(self.engine, index)
+
+        self._verbose is True and print(
+            f"  index {name} in {time.perf_counter() - start:.2f}s", flush=True
+        )
+
+    def add_column(self, model: type, name: str) -> None:
+        table = model.__table__
+
+        existing = [
+            column["name"] for column in inspect(self.engine).get_columns(table.name)
+        ]
+
+        if name in existing:
+            return
+
+        column = table.c[name]
+        column_type = column.type.compile(dialect=self.engine.dialect)
+
+        self.execute(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+
+    def execute(self, statement: str) -> None:
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(statement)
+
+
+class Migrator:
+    def __init__(
+        self,
+        engine: Engine,
+        backend: DatabaseBackend,
+        directory: str = MIGRATIONS_DIRECTORY,
+        lock_file: str = LOCK_FILE,
+        verbose: bool = False,
+    ):
+        self.engine = engine
+        self.backend = backend
+        self.directory = directory
+        self.lock_file = lock_file
+        self._verbose = verbose
+
+    def migrations(self) -> List[tuple]:
+        """
+        Returns (version, name, module name) of every migration, in order of version.
+        """
+        migrations = []
+
+        for file_name in os.listdir(self.directory):
+            match = _MIGRATION_FILE.match(file_name)
+
+            if match is not None:
+                migrations.append(
+                    (int(match[1]), match[2], f"migrations.{file_name[:-3]}")
+                )
+
+        return sorted(migrations)
+
+    def current_version(self) -> Optional[int]:
+        if not inspect(self.engine).has_table(SchemaMigration.__tablename__):
+            return None
+
+        with Session(self.engine) as session:
+            return session.exec(select(func.max(SchemaMigration.version))).one()
+
+    def is_current(self) -> bool:
+        migrations = self.migrations()
+
+        return len(migrations) == 0 or self.current_version() == migrations[-1][0]
+
+    def pending(self) -> List[tuple]:
+        current = self.current_version() or 0
+
+        return [migration for migration in self.migrations() if migration[0] > current]
+
+    def upgrade(self) -> List[SchemaMigration]:
+        """
+        Applies the pending migrations and returns them. Processes on the same host wait
+        for each other, the first one applies them and the others find nothing pending.
+        """
+        applied = []
+
+        os.makedirs(os.path.dirname(self.lock_file), exist_ok=True)
+
+        with open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            SQLModel.metadata.create_all(
+                self.engine, tables=[SchemaMigration.__table__]
+            )
+
+            migration = Migration(self.engine, self.backend, verbose=self._verbose)
+
+            for version, name, module_name in self.pending():
+                self._verbose is True and print(
+                    f"Applying {version} {name}", flush=True
+                )
+
+                module = importlib.import_module(module_name)
+
+                started_at = time.time()
+                start = time.perf_counter()
+
+                module.upgrade(migration)
+
+                record = SchemaMigration(
+                    version=version,
+                    name=name,
+                    applied_at=started_at,
+                    duration=time.perf_counter() - start,
+                )
+
+                with Session(self.engine, expire_on_commit=False) as session:
+                    session.add(record)
+                    session.commit()
+
+                self._verbose is True and print(
+                    f"Applied {version} {name} in {record.duration:.2f}s", flush=True
+                )
+
+                applied.append(record)
+
+        return applied
+
+    def history(self) -> List[SchemaMigration]:
+        if self.current_version() is None:
+            return []
+
+        with Session(self.engine) as session:
+            return session.exec(
+                select(SchemaMigration).order_by(SchemaMigration.version)
+            ).all()
+
+
+def main() -> None:
+    from endpoints.database_backend import backend_for
+    from endpoints.database_config import DatabaseConfig
+
+    parser = argparse.ArgumentParser(description="AITA schema migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Prints the current and pending migrations")
+    subparsers.add_parser("upgrade", help="Applies the pending migrations")
+    subparsers.add_parser("history", help="Prints the applied migrations and timings")
+
+    args = parser.parse_args()
+
+    # DatabaseConfig would warn about the pending migrations, the CLI connects on its own
+    backend = backend_for(DatabaseConfig.database_url())
+    migrator = Migrator(backend.create_engine(), backend, verbose=True)
+
+    match args.command:
+        case "status":
+            print(f"Current version {migrator.current_version()}")
+
+            for version, name, _ in migrator.pending():
+                print(f"Pending {version} {name}")
+        case "upgrade":
+            applied = migrator.upgrade()
+            print(f"Applied {len(applied)} migrations")
+        case "history":
+            for record in migrator.history():
+                print(
+                    f"{record.version} {record.name} "
+                    f"applied at {time.ctime(record.applied_at)} "
+                    f"in {record.duration:.2f}s"
+                )
+
+
+if __name__ == "__main__":
+    main()
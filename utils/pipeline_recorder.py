@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from uuid import uuid4
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from endpoints.database_config import DatabaseConfig
+from models.pipeline_run import PipelineRun
+
+
+class PipelineRecorder:
+    """
+    Records a PipelineRun row for every stage of one ingestion run.
+
+    Usage:
+        recorder = PipelineRecorder()
+
+        with recorder.stage("crawl") as run:
+            await crawler.process(run)
+    """
+
+    def __init__(self, engine: Engine = None, verbose: bool = False):
+        self.engine = engine or DatabaseConfig().get_engine()
+        self.run_id = uuid4().hex
+        self._verbose = verbose
+
+    def _save(self, run: PipelineRun) -> None:
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add(run)
+            session.commit()
+
+    def skip(self, name: str) -> PipelineRun:
+        now = time.time()
+        run = PipelineRun(
+            run_id=self.run_id,
+            stage=name,
+            status="skipped",
+            started_at=now,
+            finished_at=now,
+            duration=0,
+        )
+        self._save(run)
+
+        return run
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[PipelineRun]:
+        run = PipelineRun(run_id=self.run_id, stage=name, started_at=time.time())
+        self._save(run)
+
+        try:
+            yield run
+            run.status = "completed"
+        except Exception:
+            run.status = "failed"
+            run.errors += 1
+            raise
+        finally:
+            run.finished_at = time.time()
+            run.duration = run.finished_at - run.started_at
+            self._save(run)
+
+            self._verbose is True and print(
+                f"{name} {run.status} in {run.duration:.2f}s, "
+                f"in {run.items_in} out {run.items_out} errors {run.errors} "
+                f"writes {run.db_writes} bytes {run.bytes_fetched}",
+                flush=True,
+            )
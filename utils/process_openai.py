@@ -1,6 +1,4 @@
-import calendar
 import os
-from datetime import datetime, timedelta
 
 from dotenv import find_dotenv, load_dotenv
 from fastapi import HTTPException
@@ -10,6 +8,8 @@ from endpoints.database_config import DatabaseConfig
 from endpoints.openai_inference_api import OpenAIInferenceAPI
 from endpoints.submission_api import SubmissionAPI
 from models.openai_analytics import OpenAIAnalysis
+from models.pipeline_run import PipelineRun
+from utils.work_queue import OPENAI_QUEUE, WorkQueue
 
 
 class OpenAIProccessor:
@@ -26,57 +26,80 @@ class OpenAIProccessor:
 
         self.client = AsyncOpenAI()
 
-        self._verbose: bool = verbose
-
-    async def process(self):
-        self._verbose is True and print("Creating/Updating OPENAI Analysis")
+        self.queue = WorkQueue(OPENAI_QUEUE, engine)
+        self.workers = int(os.environ.get("OPENAI_WORKERS", 4))
 
-        today = datetime.today()
-        start = datetime(today.year, today.month, today.day) + timedelta(1)
-        yesterday = start - timedelta(2)
-
-        # Convert time to UTC time
-        start_utc = calendar.timegm(start.timetuple())
-        yesterday_utc = calendar.timegm(yesterday.timetuple())
+        self._verbose: bool = verbose
 
-        submissions = self.submission_api.search_submission(
-            start_utc=yesterday_utc, end_utc=start_utc, limit=10000
-        )
+    async def process(self, run: PipelineRun = None):
+        if run is None:
+            run = PipelineRun(started_at=0)
 
-        self._verbose is True and print(
-            f"Number of OpenAI Submissions {len(submissions)}"
-        )
+        self._verbose is True and print("Creating/Updating OPENAI Analysis")
 
-        for sub in submissions:
+        async def analyse(id: int):
             try:
-                self.open_ai_analysis.read_openai_inference(sub.id)
+                self.open_ai_analysis.read_openai_inference(id)
                 self._verbose is True and print(
-                    f"OpenAI analysis exist for {sub.title} skipping"
+                    f"OpenAI analysis exist for {id} skipping"
                 )
-
+                return
             except HTTPException:
                 # Doesnt exist so process
-                print(f"Creating OpenAI Analysis for {sub.id} {sub.title}")
-                text = self.submission_api.read_submission(sub.id)
-                question = """
-                Based on the following context, is the author an asshole? {selftext}
-                """.format(
-                    selftext=text
-                )
+                pass
 
-                response = await self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    response_format={"type": "text"},
-                    messages=[
-                        {"role": "user", "content": question},
-                    ],
-                )
+            sub = self.submission_api.read_submission(id)
 
-                entry = OpenAIAnalysis()
+            if sub.canonical_id is not None and self._reuse_canonical(sub):
+                run.db_writes += 1
+                return
 
-                entry.id = sub.id
-                entry.text = response.choices[0].message.content
+            print(f"Creating OpenAI Analysis for {sub.id} {sub.title}")
+            question = """
+            Based on the following context, is the author an asshole? {selftext}
+            """.format(
+                selftext=sub
+            )
 
-                self.open_ai_analysis.create_opeai_analysis(entry)
+            response = await self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                response_format={"type": "text"},
+                messages=[
+                    {"role": "user", "content": question},
+                ],
+            )
+
+            entry = OpenAIAnalysis()
+
+            entry.id = sub.id
+            entry.text = response.choices[0].message.content
+
+            self.open_ai_analysis.create_opeai_analysis(entry)
+
+            run.db_writes += 1
+            run.bytes_fetched += len(entry.text.encode())
+
+        await self.queue.drain(
+            analyse, run, workers=self.workers, verbose=self._verbose
+        )
 
         self._verbose is True and print("OpenAI analysis completed.")
+
+    def _reuse_canonical(self, sub) -> bool:
+        """
+        Copies the analysis of the submission a repost duplicates, if it has one, instead
+        of asking OpenAI again.
+        """
+        try:
+            canonical = self.open_ai_analysis.read_openai_inference(sub.canonical_id)
+        except HTTPException:
+            return False
+
+        self._verbose is True and print(
+            f"Reusing the OpenAI analysis of {sub.canonical_id} for {sub.id}"
+        )
+        self.open_ai_analysis.create_opeai_analysis(
+            OpenAIAnalysis(id=sub.id, text=canonical.text)
+        )
+
+        return True
@@ -0,0 +1,283 @@
+# Runs the ingestion pipeline outside of the API process
+#
+# Usage:
+#   python -m utils.scheduler run-once
+#   python -m utils.scheduler run --interval 3600
+#   python -m utils.scheduler status
+#   python -m utils.scheduler enqueue analytics --since 1700000000
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import time
+from graphlib import TopologicalSorter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dotenv import find_dotenv, load_dotenv
+from sqlmodel import Session, select
+
+from models.pipeline_run import PipelineRun
+from models.submission import Submission
+from utils.pipeline_recorder import PipelineRecorder
+from utils.work_queue import ANALYTICS_QUEUE, OPENAI_QUEUE, WorkQueue
+
+LOCK_FILE = "database/ingestion.lock"
+STATUS_FILE = "database/scheduler.json"
+
+
+class Stage:
+    """
+    A step of the pipeline.
+
+    A stage only runs once every stage it depends on has completed, and is skipped when
+    none of them wrote anything, as it would have no new input.
+
+    Stages fed by a work queue pass has_input instead. They run whenever their queue has
+    items, even if an upstream stage failed, so a backlog is still worked off.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[PipelineRun], Awaitable[None]],
+        depends_on: List[str] = [],
+        enabled: Callable[[], bool] = lambda: True,
+        has_input: Optional[Callable[[], bool]] = None,
+    ):
+        self.name = name
+        self.run = run
+        self.depends_on = depends_on
+        self.enabled = enabled
+        self.has_input = has_input
+
+
+async def _crawl(run: PipelineRun) -> None:
+    # Processors are imported lazily, their dependencies are only needed here
+    from utils.crawler import Crawler
+
+    await Crawler(verbose=True).process(run)
+
+
+async def _analytics(run: PipelineRun) -> None:
+    from utils.analytics import AnalyticsProcessor
+
+    await AnalyticsProcessor(verbose=True).process(run)
+
+
+async def _openai(run: PipelineRun) -> None:
+    from utils.process_openai import OpenAIProccessor
+
+    await OpenAIProccessor(verbose=True).process(run)
+
+
+async def _fts(run: PipelineRun) -> None:
+    from utils.fts_processor import FTSProcessor
+
+    await asyncio.to_thread(FTSProcessor().process, run)
+
+
+async def _similarity(run: PipelineRun) -> None:
+    from utils.similarity import SimilarityProcessor
+
+    await asyncio.to_thread(SimilarityProcessor(verbose=True).process, run)
+
+
+def default_stages() -> List[Stage]:
+    return [
+        Stage("crawl", _crawl),
+        Stage(
+            "analytics",
+            _analytics,
+            depends_on=["crawl"],
+            has_input=lambda: WorkQueue(ANALYTICS_QUEUE).ready() > 0,
+        ),
+        Stage(
+            "openai",
+            _openai,
+            depends_on=["crawl"],
+            enabled=lambda: os.environ.get("OPENAI_API_KEY") is not None,
+            has_input=lambda: WorkQueue(OPENAI_QUEUE).ready() > 0,
+        ),
+        Stage("fts", _fts, depends_on=["crawl"]),
+        Stage("similarity", _similarity, depends_on=["fts"]),
+    ]
+
+
+class Scheduler:
+    """
+    Runs the stages in dependency order.
+
+    A file lock makes runs single flight across processes, a run that finds the lock held
+    is skipped rather than queued, so slow runs never pile up.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage] = None,
+        lock_file: str = LOCK_FILE,
+        status_file: str = STATUS_FILE,
+        verbose: bool = False,
+    ):
+        self.stages: Dict[str, Stage] = {
+            stage.name: stage for stage in (stages or default_stages())
+        }
+        self.lock_file = lock_file
+        self.status_file = status_file
+        self._verbose = verbose
+        self._status = {"state": "idle", "run_id": None, "next_run_at": None}
+
+    def _write_status(self, **status) -> None:
+        self._status.update(status, pid=os.getpid(), updated_at=time.time())
+
+        temporary = f"{self.status_file}.tmp"
+
+        with open(temporary, "w") as file:
+            json.dump(self._status, file)
+
+        os.replace(temporary, self.status_file)
+
+    def _should_skip(self, stage: Stage, results: Dict[str, PipelineRun]) -> str:
+        if not stage.enabled():
+            return "disabled"
+
+        if stage.has_input is not None:
+            return "" if stage.has_input() else "no new input"
+
+        upstream = [results[name] for name in stage.depends_on]
+
+        if any(run.status != "completed" for run in upstream):
+            return "an upstream stage did not complete"
+
+        if len(upstream) > 0 and all(run.db_writes == 0 for run in upstream):
+            return "no new input"
+
+        return ""
+
+    async def run_once(self) -> Optional[str]:
+        """
+        Runs every stage once. Returns the run id, or None if another run holds the lock.
+        """
+        with open(self.lock_file, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._verbose is True and print("Another run is in progress, skipping")
+                return None
+
+            recorder = PipelineRecorder(verbose=self._verbose)
+            self._write_status(
+                state="running", run_id=recorder.run_id, next_run_at=None
+            )
+
+            graph = {name: stage.depends_on for name, stage in self.stages.items()}
+            results: Dict[str, PipelineRun] = {}
+
+            for name in TopologicalSorter(graph).static_order():
+                stage = self.stages[name]
+
+                try:
+                    reason = self._should_skip(stage, results)
+
+                    if reason:
+                        self._verbose is True and print(f"Skipping {name}, {reason}")
+                        results[name] = recorder.skip(name)
+                        continue
+
+                    with recorder.stage(name) as run:
+                        results[name] = run
+                        await stage.run(run)
+                except Exception as e:
+                    self._verbose is True and print(f"{name} failed: {e}")
+
+                    # A stage that failed before its run was recorded, e.g. as the
+                    # database was unavailable, still fails the stages that depend on it
+                    results.setdefault(
+                        name,
+                        PipelineRun(
+                            run_id=recorder.run_id,
+                            stage=name,
+                            status="failed",
+                            started_at=time.time(),
+                        ),
+                    )
+
+            self._write_status(state="idle")
+
+            return recorder.run_id
+
+    async def run_forever(self, interval: float) -> None:
+        while True:
+            started = time.monotonic()
+
+            await self.run_once()
+
+            # A run that overran the interval is followed immediately by the next one
+            delay = max(0, interval - (time.monotonic() - started))
+            self._write_status(next_run_at=time.time() + delay)
+
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def read_status(status_file: str = STATUS_FILE) -> Optional[Dict]:
+        try:
+            with open(status_file) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+def lower_priority() -> None:
+    """
+    Lowers the CPU priority of the ingestion process, so an API on the same host wins when
+    both are busy.
+    """
+    os.nice(int(os.environ.get("INGESTION_NICE", 10)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AITA ingestion scheduler")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("run-once", help="Runs the pipeline once")
+
+    run_parser = subparsers.add_parser("run", help="Runs the pipeline periodically")
+    run_parser.add_argument("--interval", type=float, default=60 * 60)
+
+    subparsers.add_parser("status", help="Prints the scheduler status")
+
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="Queues existing submissions, e.g. to backfill a stage"
+    )
+    enqueue_parser.add_argument("queue", choices=[ANALYTICS_QUEUE, OPENAI_QUEUE])
+    enqueue_parser.add_argument(
+        "--since", type=float, default=0, help="Minimum created_utc"
+    )
+
+    args = parser.parse_args()
+
+    load_dotenv(find_dotenv())
+    scheduler = Scheduler(verbose=True)
+
+    match args.command:
+        case "run-once":
+            lower_priority()
+            asyncio.run(scheduler.run_once())
+        case "run":
+            lower_priority()
+            asyncio.run(scheduler.run_forever(args.interval))
+        case "status":
+            print(json.dumps(Scheduler.read_status(), indent=2))
+        case "enqueue":
+            queue = WorkQueue(args.queue)
+
+            with Session(queue.engine) as session:
+                ids = session.exec(
+                    select(Submission.id).where(Submission.created_utc >= args.since)
+                ).all()
+
+            print(f"Queued {queue.enqueue(ids)} of {len(ids)} submissions")
+
+
+if __name__ == "__main__":
+    main()
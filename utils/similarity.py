@@ -0,0 +1,426 @@
+# Precomputes the nearest neighbors of every submission for "similar submissions"
+#
+# Submissions are TF-IDF vectors of their title and selftext. Words are hashed into a fixed
+# number of dimensions, so vectors need no vocabulary and new submissions are vectorized on
+# their own. Neighbors are found with matrix products, a block of rows at a time.
+import os
+import re
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import find_dotenv, load_dotenv
+from scipy import sparse
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
+from endpoints.database_config import DatabaseConfig
+from models.pipeline_run import PipelineRun
+from models.similar_submission import SimilarSubmission
+from models.submission import Submission
+
+STATE_FILE = "database/similarity.npz"
+
+# Hashed dimensions, large enough for collisions between words to be rare
+DIMENSIONS = 2**20
+
+_WORD = re.compile(r"[^\W\d_]{2,}")
+
+
+def _hashed_counts(title: str, selftext: str, title_weight: int) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+
+    for weight, text in ((title_weight, title), (1, selftext)):
+        for word in _WORD.findall(text.casefold()):
+            column = zlib.crc32(word.encode()) & (DIMENSIONS - 1)
+            counts[column] = counts.get(column, 0) + weight
+
+    return counts
+
+
+class SimilarityProcessor:
+    """
+    Keeps the similar_submission table up to date.
+
+    The first run vectorizes every submission and computes all neighbors. Later runs only
+    vectorize the new submissions, with the IDF of the last full build, compute their
+    neighbors and insert them into the lists of older submissions they are closer to than
+    the last neighbor. Once the corpus has grown by REBUILD_GROWTH since the last full
+    build the IDF is out of date and everything is computed again.
+
+    Only new ids are vectorized between full builds. A submission whose title or selftext
+    is edited after it was crawled keeps the vector and neighbors of its first text until
+    the next full build.
+
+    The vectors and IDF are kept in STATE_FILE between runs.
+    """
+
+    _instance = None
+    _verbose = False
+
+    # Neighbors stored per submission
+    K = 10
+
+    # Words of the title count as many times as this
+    TITLE_WEIGHT = 2
+
+    REBUILD_GROWTH = 0.25
+
+    # Size of the dense block of similarities computed at once
+    _BLOCK_BYTES = 256 * 1024 * 1024
+
+    def _configure_processor(self) -> None:
+        load_dotenv(find_dotenv())
+
+        self.engine = DatabaseConfig().get_engine()
+        self.state_file = os.environ.get("SIMILARITY_STATE_FILE", STATE_FILE)
+
+    def __new__(cls, verbose: bool = False):
+        if cls._instance is None:
+            cls._instance = super(SimilarityProcessor, cls).__new__(cls)
+            cls._instance._configure_processor()
+            cls._instance._verbose = verbose
+
+        return cls._instance
+
+    def process(self, run: PipelineRun = None) -> None:
+        if run is None:
+            run = PipelineRun(started_at=0)
+
+        state = self._load_state()
+        last_id = int(state["ids"][-1]) if state is not None else 0
+
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(Submission.id, Submission.title, Submission.selftext)
+                .where(Submission.id > last_id)
+                .order_by(Submission.id)
+            ).all()
+
+        run.items_in = len(rows)
+
+        if len(rows) == 0:
+            return
+
+        if state is None or len(rows) >= self.REBUILD_GROWTH * state["built_with"]:
+            self._build(run)
+        else:
+            self._add(state, rows, run)
+
+    def _term_counts(self, rows: List[tuple]) -> sparse.csr_matrix:
+        indptr = [0]
+        indices: List[int] = []
+        data: List[int] = []
+
+        for _, title, selftext in rows:
+            counts = _hashed_counts(title or "", selftext or "", self.TITLE_WEIGHT)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (
+                np.array(data, dtype=np.float32),
+                np.array(indices, dtype=np.int32),
+                np.array(indptr, dtype=np.int64),
+            ),
+            shape=(len(rows), DIMENSIONS),
+        )
+
+    @staticmethod
+    def _tf_idf(counts: sparse.csr_matrix, idf: np.ndarray) -> sparse.csr_matrix:
+        """
+        Returns the sublinear TF-IDF vectors of term counts, normalized to unit length so
+        their dot product is the cosine similarity.
+        """
+        vectors = counts.copy()
+        vectors.data = (1 + np.log(vectors.data)) * idf[vectors.indices]
+
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ vectors, dtype=np.float32)
+
+    def _blocks(
+        self, queries: sparse.csr_matrix, corpus: sparse.csr_matrix
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields the similarities of blocks of queries to the whole corpus, as (first query,
+        dense block), sized to keep the arrays of a block within _BLOCK_BYTES.
+
+        Similarities are dense, any two texts share a few common words. Multiplying the
+        corpus by the dense columns of the block the block uses is much faster than a
+        sparse product with a dense result.
+        """
+        words = np.count_nonzero(np.bincount(corpus.indices, minlength=DIMENSIONS))
+
+        # A row of the block takes 4 bytes a similarity, its transpose as many, and the
+        # 8 byte positions of argpartition, the dense queries 4 bytes a word
+        rows = max(1, self._BLOCK_BYTES // (16 * corpus.shape[0] + 4 * words))
+
+        for start in range(0, queries.shape[0], rows):
+            block = queries[start : start + rows]
+            used = np.unique(block.indices)
+
+            similarities = corpus[:, used] @ block[:, used].toarray().T
+
+            yield start, np.ascontiguousarray(similarities.T)
+
+    def _top_k(self, block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the column and similarity of the K largest similarities of each row of a
+        block, most similar first.
+        """
+        k = min(self.K, block.shape[1])
+        columns = np.argpartition(block, -k, axis=1)[:, -k:]
+        similarities = np.take_along_axis(block, columns, axis=1)
+
+        order = np.argsort(-similarities, axis=1, kind="stable")
+
+        return (
+            np.take_along_axis(columns, order, axis=1),
+            np.take_along_axis(similarities, order, axis=1),
+        )
+
+    def _neighbor_rows(
+        self, submission_id: int, neighbors: List[Tuple[int, float]]
+    ) -> List[Dict]:
+        return [
+            {
+                "submission_id": submission_id,
+                "rank": rank,
+                "similar_id": similar_id,
+                "similarity": similarity,
+            }
+            for rank, (similar_id, similarity) in enumerate(neighbors)
+        ]
+
+    def _write(
+        self, session: Session, neighbors: Dict[int, List[Tuple[int, float]]]
+    ) -> int:
+        ids = list(neighbors.keys())
+        rows = []
+
+        for submission_id, submission_neighbors in neighbors.items():
+            rows.extend(self._neighbor_rows(submission_id, submission_neighbors))
+
+        for start in range(0, len(ids), 500):
+            session.execute(
+                delete(SimilarSubmission).where(
+                    SimilarSubmission.submission_id.in_(ids[start : start + 500])
+                )
+            )
+
+        for start in range(0, len(rows), 5000):
+            session.execute(insert(SimilarSubmission), rows[start : start + 5000])
+
+        return len(rows)
+
+    def _block_neighbors(
+        self, ids: np.ndarray, block: np.ndarray, own_columns: np.ndarray
+    ) -> Tuple[List[List[Tuple[int, float]]], np.ndarray]:
+        """
+        Returns the neighbors of each row of a block, and the similarity of the last one,
+        0 if it has fewer than K. own_columns are the columns of the rows themselves.
+        """
+        block[np.arange(block.shape[0]), own_columns] = 0
+
+        columns, similarities = self._top_k(block)
+        neighbors = []
+        last = np.zeros(block.shape[0], dtype=np.float32)
+
+        for row in range(block.shape[0]):
+            found = [
+                (int(ids[column]), float(similarity))
+                for column, similarity in zip(columns[row], similarities[row])
+                if similarity > 0
+            ]
+            neighbors.append(found)
+
+            if len(found) == self.K:
+                last[row] = found[-1][1]
+
+        return neighbors, last
+
+    def _build(self, run: PipelineRun) -> None:
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(Submission.id, Submission.title, Submission.selftext).order_by(
+                    Submission.id
+                )
+            ).all()
+
+        self._verbose is True and print(
+            f"Computing the neighbors of {len(rows)} submissions", flush=True
+        )
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        counts = self._term_counts(rows)
+
+        document_frequency = np.bincount(counts.indices, minlength=DIMENSIONS)
+        idf = np.log((1 + len(rows)) / (1 + document_frequency)).astype(np.float32) + 1
+        vectors = self._tf_idf(counts, idf)
+
+        last = np.zeros(len(rows), dtype=np.float32)
+
+        # Each block replaces the neighbors of its submissions in a transaction of its own,
+        # the crawler and analytics stage wait for one block at most for SQLite's single
+        # writer, not for the whole build. A submission's neighbors are replaced at once,
+        # until its block is written it keeps those of the last build.
+        for start, block in self._blocks(vectors, vectors):
+            own = np.arange(start, start + block.shape[0])
+            neighbors, block_last = self._block_neighbors(ids, block, own)
+            last[own] = block_last
+
+            with Session(self.engine) as session:
+                run.db_writes += self._write(
+                    session,
+                    {int(ids[row]): found for row, found in zip(own, neighbors)},
+                )
+                session.commit()
+
+            run.items_out += block.shape[0]
+
+        self._delete_missing(ids)
+        self._save_state(ids, vectors, idf, last, built_with=len(rows))
+
+    def _delete_missing(self, ids: np.ndarray) -> None:
+        """Deletes the neighbors of submissions that are not in ids"""
+        with Session(self.engine) as session:
+            stored = session.exec(select(SimilarSubmission.submission_id).distinct())
+            missing = list(set(stored.all()) - set(ids.tolist()))
+
+            for start in range(0, len(missing), 500):
+                session.execute(
+                    delete(SimilarSubmission).where(
+                        SimilarSubmission.submission_id.in_(
+                            missing[start : start + 500]
+                        )
+                    )
+                )
+
+            session.commit()
+
+    def _add(self, state: Dict, rows: List[tuple], run: PipelineRun) -> None:
+        self._verbose is True and print(
+            f"Adding {len(rows)} submissions to {len(state['ids'])}", flush=True
+        )
+
+        new_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        new_vectors = self._tf_idf(self._term_counts(rows), state["idf"])
+
+        existing = len(state["ids"])
+        ids = np.concatenate([state["ids"], new_ids])
+        vectors = sparse.vstack([state["vectors"], new_vectors], format="csr")
+        last = np.concatenate([state["last"], np.zeros(len(rows), dtype=np.float32)])
+
+        neighbors: Dict[int, List[Tuple[int, float]]] = {}
+
+        # Older submissions a new one is closer to than their last neighbor
+        closer: Dict[int, List[Tuple[int, float]]] = {}
+
+        for start, block in self._blocks(new_vectors, vectors):
+            own = existing + np.arange(start, start + block.shape[0])
+            block_neighbors, block_last = self._block_neighbors(ids, block, own)
+            last[own] = block_last
+
+            for row, found in zip(own, block_neighbors):
+                neighbors[int(ids[row])] = found
+
+            rows_closer, columns = np.nonzero(
+                block[:, :existing] > state["last"][None, :]
+            )
+
+            for row, column in zip(rows_closer, columns):
+                closer.setdefault(int(column), []).append(
+                    (int(ids[own[row]]), float(block[row, column]))
+                )
+
+        with Session(self.engine) as session:
+            current = self._read_neighbors(
+                session, [int(ids[column]) for column in closer]
+            )
+
+            for column, candidates in closer.items():
+                id = int(ids[column])
+                merged = sorted(
+                    current.get(id, []) + candidates,
+                    key=lambda neighbor: neighbor[1],
+                    reverse=True,
+                )[: self.K]
+                neighbors[id] = merged
+
+                if len(merged) == self.K:
+                    last[column] = merged[-1][1]
+
+            run.db_writes += self._write(session, neighbors)
+            run.items_out = len(neighbors)
+
+            session.commit()
+
+        self._save_state(ids, vectors, state["idf"], last, state["built_with"])
+
+    def _read_neighbors(
+        self, session: Session, ids: List[int]
+    ) -> Dict[int, List[Tuple[int, float]]]:
+        neighbors: Dict[int, List[Tuple[int, float]]] = {}
+
+        for start in range(0, len(ids), 500):
+            rows = session.exec(
+                select(
+                    SimilarSubmission.submission_id,
+                    SimilarSubmission.similar_id,
+                    SimilarSubmission.similarity,
+                )
+                .where(SimilarSubmission.submission_id.in_(ids[start : start + 500]))
+                .order_by(SimilarSubmission.submission_id, SimilarSubmission.rank)
+            ).all()
+
+            for submission_id, similar_id, similarity in rows:
+                neighbors.setdefault(submission_id, []).append((similar_id, similarity))
+
+        return neighbors
+
+    def _load_state(self) -> Optional[Dict]:
+        try:
+            with np.load(self.state_file) as state:
+                return {
+                    "ids": state["ids"],
+                    "vectors": sparse.csr_matrix(
+                        (state["data"], state["indices"], state["indptr"]),
+                        shape=(len(state["ids"]), DIMENSIONS),
+                    ),
+                    "idf": state["idf"],
+                    "last": state["last"],
+                    "built_with": int(state["built_with"]),
+                }
+        except FileNotFoundError:
+            return None
+
+    def _save_state(
+        self,
+        ids: np.ndarray,
+        vectors: sparse.csr_matrix,
+        idf: np.ndarray,
+        last: np.ndarray,
+        built_with: int,
+    ) -> None:
+        temporary = f"{self.state_file}.tmp"
+
+        with open(temporary, "wb") as file:
+            np.savez(
+                file,
+                ids=ids,
+                data=vectors.data,
+                indices=vectors.indices,
+                indptr=vectors.indptr,
+                idf=idf,
+                last=last,
+                built_with=built_with,
+            )
+
+        os.replace(temporary, self.state_file)
+
+
+if __name__ == "__main__":
+    SimilarityProcessor(verbose=True).process()
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterable, List, Union
+
+from sqlalchemy import Engine, and_, func, update
+from sqlmodel import Session, select
+
+from endpoints.database_backend import backend_for
+from endpoints.database_config import DatabaseConfig
+from models.pipeline_run import PipelineRun
+from models.work_item import QueueDepth, WorkItem
+
+ANALYTICS_QUEUE = "analytics"
+OPENAI_QUEUE = "openai"
+
+
+class WorkQueue:
+    """
+    Durable queue of submission ids backed by the work_item table.
+
+    Dequeued items are leased for visibility_timeout seconds. An item that is neither
+    acknowledged nor failed within its lease, e.g. because its worker died, becomes visible
+    again. Failed items are retried with exponential backoff until max_attempts, after
+    which they are dead lettered and stay for inspection until they are enqueued again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        engine: Engine = None,
+        visibility_timeout: float = 300,
+        max_attempts: int = 5,
+        backoff: float = 30,
+    ):
+        self.name = name
+        self.engine = engine or DatabaseConfig().get_engine()
+        self.backend = backend_for(self.engine.url)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def enqueue(self, submission_ids: Iterable[int]) -> int:
+        """
+        Adds the submissions to the queue. Pending and in flight items are left as they are,
+        done and dead ones are queued again. Returns the number of items queued.
+        """
+        now = time.time()
+        rows = [
+            {
+                "queue": self.name,
+                "submission_id": submission_id,
+                "status": "pending",
+                "attempts": 0,
+                "available_at": now,
+                "enqueued_at": now,
+                "updated_at": now,
+            }
+            for submission_id in set(submission_ids)
+        ]
+
+        if len(rows) == 0:
+            return 0
+
+        statement = self.backend.insert(WorkItem).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["queue", "submission_id"],
+            set_={
+                "status": "pending",
+                "attempts": 0,
+                "available_at": now,
+                "enqueued_at": now,
+                "updated_at": now,
+                "last_error": None,
+            },
+            where=WorkItem.status.in_(["done", "dead"]),
+        )
+
+        # The rows returned are counted, psycopg forgets the rowcount of an insert
+        with Session(self.engine) as session:
+            queued = session.exec(statement.returning(WorkItem.id)).all()
+            session.commit()
+
+            return len(queued)
+
+    def _visible(self, now: float):
+        return and_(
+            WorkItem.queue == self.name,
+            WorkItem.status.in_(["pending", "in_flight"]),
+            WorkItem.available_at <= now,
+        )
+
+    def dequeue(self, batch_size: int = 10) -> List[WorkItem]:
+        """
+        Leases up to batch_size visible items, oldest first.
+        """
+        now = time.time()
+
+        with Session(self.engine, expire_on_commit=False) as session:
+            # Leases that expired on their last attempt are dead lettered, not retried
+            session.exec(
+                update(WorkItem)
+                .where(self._visible(now))
+                .where(WorkItem.status == "in_flight")
+                .where(WorkItem.attempts >= self.max_attempts)
+                .values(status="dead", updated_at=now, last_error="Lease expired")
+            )
+
+            # Workers skip the items another one is leasing instead of waiting for it. The
+            # ids are selected in a CTE, which Postgres runs once, as a subquery it could
+            # run again for every row of a nested loop and lease more than batch_size.
+            ids = self.backend.skip_locked(
+                select(WorkItem.id)
+                .where(self._visible(now))
+                .order_by(WorkItem.available_at, WorkItem.id)
+                .limit(batch_size)
+            ).cte("leased")
+
+            # Selecting and leasing in one statement keeps concurrent workers from
+            # claiming the same items. The items are checked again as visible, an item
+            # leased by a transaction that committed after the subquery read it is not
+            # leased twice.
+            items = session.exec(
+                update(WorkItem)
+                .where(WorkItem.id.in_(select(ids.c.id)))
+                .where(self._visible(now))
+                .values(
+                    status="in_flight",
+                    attempts=WorkItem.attempts + 1,
+                    available_at=now + self.visibility_timeout,
+                    updated_at=now,
+                )
+                .returning(WorkItem)
+            ).all()
+            session.commit()
+
+            return [item for (item,) in items]
+
+    def _finish(self, item: WorkItem, **values) -> bool:
+        # The lease is identified by the attempt, a worker whose lease expired and was taken
+        # over by another one can no longer change the item
+        with Session(self.engine) as session:
+            result = session.exec(
+                update(WorkItem)
+                .where(WorkItem.id == item.id)
+                .where(WorkItem.status == "in_flight")
+                .where(WorkItem.attempts == item.attempts)
+                .values(updated_at=time.time(), **values)
+            )
+            session.commit()
+
+            return result.rowcount == 1
+
+    def ack(self, item: WorkItem) -> bool:
+        return self._finish(item, status="done", last_error=None)
+
+    def fail(self, item: WorkItem, error: str) -> bool:
+        if item.attempts >= self.max_attempts:
+            return self._finish(item, status="dead", last_error=error)
+
+        delay = self.backoff * 2 ** (item.attempts - 1)
+
+        return self._finish(
+            item,
+            status="pending",
+            available_at=time.time() + delay,
+            last_error=error,
+        )
+
+    def ready(self) -> int:
+        """
+        Returns the number of items that can be dequeued now.
+        """
+        with Session(self.engine) as session:
+            return session.exec(
+                select(func.count(WorkItem.id)).where(self._visible(time.time()))
+            ).one()
+
+    def depth(self) -> QueueDepth:
+        with Session(self.engine) as session:
+            counts = session.exec(
+                select(WorkItem.status, func.count(WorkItem.id))
+                .where(WorkItem.queue == self.name)
+                .group_by(WorkItem.status)
+            ).all()
+
+            oldest = session.exec(
+                select(func.min(WorkItem.enqueued_at))
+                .where(WorkItem.queue == self.name)
+                .where(WorkItem.status == "pending")
+            ).one()
+
+        depth = QueueDepth(queue=self.name, **dict(counts))
+
+        if oldest is not None:
+            depth.oldest_pending_age = time.time() - oldest
+
+        return depth
+
+    async def drain(
+        self,
+        handle: Callable[[int], Union[None, Awaitable[None]]],
+        run: PipelineRun = None,
+        workers: int = 1,
+        batch_size: int = 10,
+        verbose: bool = False,
+    ) -> None:
+        """
+        Processes visible items with a pool of workers until none are left.
+
+        handle is called with the submission id and fails the item by raising. Coroutine
+        functions run concurrently on the event loop, plain functions in threads. Items that
+        are retried after a backoff are left for the next drain.
+        """
+        if run is None:
+            run = PipelineRun(started_at=0)
+
+        is_async = asyncio.iscoroutinefunction(handle)
+
+        async def work() -> None:
+            while True:
+                items = await asyncio.to_thread(self.dequeue, batch_size)
+
+                if len(items) == 0:
+                    return
+
+                for item in items:
+                    run.items_in += 1
+
+                    try:
+                        if is_async:
+                            await handle(item.submission_id)
+                        else:
+                            await asyncio.to_thread(handle, item.submission_id)
+
+                        await asyncio.to_thread(self.ack, item)
+                        run.items_out += 1
+                    except Exception as e:
+                        await asyncio.to_thread(self.fail, item, str(e))
+                        run.errors += 1
+                        verbose is True and print(
+                            f"{self.name} failed for {item.submission_id}: {e}"
+                        )
+
+        await asyncio.gather(*[work() for _ in range(workers)])